@@ -18,8 +18,9 @@ Exemplo de uso:
     vector_store = VectorStoreANTAQ(api_key)
     rag_system = RAGSystemANTAQ(api_key, vector_store)
     
-    # Fazer consulta
-    resposta = rag_system.query("Como funciona o licenciamento portuário?")
+    # Fazer consulta (cada conversa mantém seu próprio histórico)
+    historico = []
+    resposta = rag_system.query("Como funciona o licenciamento portuário?", history=historico)
 """
 
 __version__ = "1.0.0"
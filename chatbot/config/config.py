@@ -35,6 +35,15 @@ OPENAI_TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', '0.1'))
 # Máximo de tokens na resposta
 OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '1500'))
 
+# Orçamento de tokens para os documentos enviados ao modelo em cada pergunta
+MAX_CONTEXT_LENGTH = int(os.getenv('MAX_CONTEXT_LENGTH', '8000'))
+
+# Orçamento de tokens do histórico da conversa no prompt (interações antigas são resumidas)
+HISTORY_MAX_TOKENS = int(os.getenv('HISTORY_MAX_TOKENS', '2000'))
+
+# Modelo usado para resumir o histórico (vazio: o mesmo modelo da resposta)
+HISTORY_SUMMARY_MODEL = os.getenv('HISTORY_SUMMARY_MODEL') or None
+
 # ===============================
 # CONFIGURAÇÕES DO BANCO VETORIAL
 # ===============================
@@ -42,12 +51,58 @@ OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '1500'))
 # Diretório para persistir o banco ChromaDB
 CHROMA_PERSIST_DIRECTORY = Path(__file__).parent.parent.parent / 'chroma_db'
 
-# Nome da coleção no ChromaDB
+# Nome da coleção no ChromaDB (alias da versão ativa)
 COLLECTION_NAME = 'normas_antaq'
 
+# Tempo (segundos) que versões substituídas da coleção são mantidas após uma reconstrução
+COLLECTION_GC_GRACE_SECONDS = int(os.getenv('COLLECTION_GC_GRACE_SECONDS', '3600'))
+
 # Configurações de embedding
 EMBEDDING_MODEL = 'text-embedding-3-small'
 
+# Backend de embedding: 'openai', 'local' (sentence-transformers em CPU) ou 'hashing' (testes)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+
+# Modelo local e aceleração opcional ('int8' ou 'onnx') para o backend 'local'
+LOCAL_EMBEDDING_MODEL = os.getenv('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+LOCAL_EMBEDDING_ACCELERATION = os.getenv('LOCAL_EMBEDDING_ACCELERATION') or None
+
+# Dimensão reduzida dos embeddings (vazio = dimensão nativa do modelo).
+# Gravada nos metadados da coleção; alterá-la exige reconstruir a coleção.
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS') or 0) or None
+
+# Parâmetros do backend selecionado
+EMBEDDING_BACKEND_OPTIONS = {
+    'openai': {'model': EMBEDDING_MODEL, 'dimensions': EMBEDDING_DIMENSIONS},
+    'local': {'model_name': LOCAL_EMBEDDING_MODEL, 'acceleration': LOCAL_EMBEDDING_ACCELERATION, 'dimensions': EMBEDDING_DIMENSIONS},
+    'hashing': {'dimensions': EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {},
+}.get(EMBEDDING_BACKEND, {})
+
+# Cópia dos vetores em NumPy para busca exata em memória: '' (desativada), 'float32', 'float16' ou 'int8'
+VECTOR_SIDECAR_DTYPE = os.getenv('VECTOR_SIDECAR_DTYPE') or None
+
+# Backend de busca: 'chroma' (HNSW) ou 'exact' (produto interno sobre a cópia em NumPy)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'chroma')
+
+# Modo de busca: 'dense' (vetorial), 'lexical' (BM25) ou 'hybrid' (ambas, combinadas por RRF)
+RETRIEVAL_MODE = os.getenv('RETRIEVAL_MODE', 'hybrid')
+
+# Busca em dois estágios: normas selecionadas pelo vetor da norma antes de buscar os chunks (0 desativa)
+FIRST_STAGE_NORMAS = int(os.getenv('FIRST_STAGE_NORMAS', '30'))
+
+# Máximo de chunks por requisição de embeddings (a API aceita até 2048)
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '256'))
+
+# Máximo de tokens por requisição de embeddings
+EMBEDDING_BATCH_TOKENS = int(os.getenv('EMBEDDING_BATCH_TOKENS', '100000'))
+
+# Threads gerando embeddings em paralelo durante a vetorização
+EMBEDDING_WORKERS = int(os.getenv('EMBEDDING_WORKERS', '4'))
+
+# Limites da API de embeddings (requisições e tokens por minuto)
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv('EMBEDDING_REQUESTS_PER_MINUTE', '3000'))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv('EMBEDDING_TOKENS_PER_MINUTE', '1000000'))
+
 # Caminho para o arquivo de dados
 DATA_PATH = Path(__file__).parent.parent.parent / 'shared' / 'data' / 'normas_antaq_completo.parquet'
 
@@ -61,6 +116,12 @@ CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '800'))
 # Sobreposição entre chunks
 CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '150'))
 
+# Processos usados para dividir as normas em chunks (1 = sem pool de processos)
+CHUNK_PROCESSES = int(os.getenv('CHUNK_PROCESSES', '1'))
+
+# Chunks alinhados aos artigos da norma (false = janelas de tokens sem considerar a estrutura)
+STRUCTURE_AWARE_CHUNKING = os.getenv('STRUCTURE_AWARE_CHUNKING', 'true').lower() == 'true'
+
 # Número máximo de resultados na busca
 MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', '15'))
 
@@ -93,6 +154,22 @@ ENABLE_CACHE = os.getenv('ENABLE_CACHE', 'true').lower() == 'true'
 # Tempo de vida do cache (segundos)
 CACHE_TTL = int(os.getenv('CACHE_TTL', '3600'))
 
+# Tamanho máximo do cache de respostas (MB)
+ANSWER_CACHE_SIZE_MB = int(os.getenv('ANSWER_CACHE_SIZE_MB', '256'))
+
+# Similaridade mínima para reutilizar a resposta de uma pergunta parecida (vazio: apenas perguntas idênticas)
+ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY')) if os.getenv('ANSWER_CACHE_SIMILARITY') else None
+
+# Habilitar cache persistente de embeddings (chave: modelo + hash do texto)
+ENABLE_EMBEDDING_CACHE = os.getenv('ENABLE_EMBEDDING_CACHE', 'true').lower() == 'true'
+
+# Tamanho máximo do cache de embeddings (MB)
+EMBEDDING_CACHE_SIZE_MB = int(os.getenv('EMBEDDING_CACHE_SIZE_MB', '1024'))
+
+# Cache em memória de embeddings de consultas (número de consultas e tempo de vida em segundos)
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '1024'))
+QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', str(CACHE_TTL)))
+
 # ===============================
 # CONFIGURAÇÕES DE LOGGING
 # ===============================
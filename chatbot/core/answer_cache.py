@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Cache de respostas para o Chatbot ANTAQ
+Evita chamar o LLM novamente para perguntas já respondidas sobre a
+mesma versão da coleção
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Sequence, Callable
+
+import diskcache
+import numpy as np
+
+from .embedding_cache import QueryEmbeddingCache
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """
+    Cache em disco de respostas do LLM, em dois níveis
+
+    • Exato: chave formada pela consulta normalizada, pelo modelo, pelos
+      parâmetros da busca e pelo contexto da conversa; como a recuperação
+      é determinada por eles e pela versão da coleção, é consultado antes
+      da busca e um acerto dispensa também a recuperação
+    • Semântico (opcional): vizinho mais próximo do embedding da consulta,
+      aceito acima de um limiar de similaridade de cosseno
+
+    As entradas expiram após o TTL, as menos usadas são removidas quando o
+    tamanho máximo é atingido e as chaves incluem a versão da coleção, de
+    modo que uma nova versão nunca reaproveita respostas da anterior (que
+    são descartadas do disco na primeira consulta após a troca).
+    """
+
+    VERSION_KEY = '__collection_version__'
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: int = 3600,
+        size_limit_mb: int = 256,
+        similarity_threshold: Optional[float] = None,
+        max_semantic_entries: int = 5000
+    ):
+        """
+        Inicializa o cache de respostas
+
+        Args:
+            directory: Diretório onde o cache é persistido
+            ttl: Tempo de vida de cada resposta (segundos)
+            size_limit_mb: Tamanho máximo do cache em MB (entradas menos usadas são removidas)
+            similarity_threshold: Similaridade mínima para o nível semântico (None desativa)
+            max_semantic_entries: Número máximo de consultas no índice semântico de cada escopo
+        """
+
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_semantic_entries = max(1, max_semantic_entries)
+        self.cache = diskcache.Cache(
+            str(self.directory),
+            size_limit=size_limit_mb * 1024 * 1024,
+            eviction_policy='least-recently-used',
+            tag_index=True
+        )
+
+        # Índices semânticos carregados em memória: escopo -> (chaves, matriz normalizada)
+        self._semantic: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        logger.info(f"Cache de respostas em: {self.directory}")
+
+    @staticmethod
+    def _digest(*parts: Any) -> str:
+        """Hash estável de uma sequência de valores serializáveis em JSON"""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def make_key(
+        self,
+        query: str,
+        model: str,
+        context: Sequence[Tuple[str, str]] = (),
+        **params: Any
+    ) -> str:
+        """
+        Gera a chave do nível exato
+
+        Args:
+            query: Consulta do usuário
+            model: Modelo e parâmetros de geração
+            context: Mensagens (papel, conteúdo) enviadas ao LLM antes da consulta
+            **params: Parâmetros da busca (número de resultados, filtros, modo)
+
+        Returns:
+            Chave da resposta
+        """
+        return 'answer:' + self._digest(
+            QueryEmbeddingCache.normalize_query(query),
+            model,
+            [[role, content] for role, content in context],
+            params
+        )
+
+    def make_scope(self, model: str, **params: Any) -> str:
+        """Escopo do índice semântico: consultas só são comparadas com parâmetros iguais"""
+        return self._digest(model, params)[:16]
+
+    def _sync_version(self, version: str) -> None:
+        """Descarta as entradas de versões anteriores da coleção"""
+
+        if version == self._version:
+            return
+
+        with self._lock:
+            previous = self.cache.get(self.VERSION_KEY)
+            if previous != version:
+                if previous is not None:
+                    removed = self.cache.evict(str(previous))
+                    logger.info(f"🔄 Coleção mudou ({previous} -> {version}); {removed} respostas descartadas do cache")
+                self.cache.set(self.VERSION_KEY, version)
+            self._semantic = {}
+            self._version = version
+
+    def lookup(
+        self,
+        key: str,
+        version: str,
+        scope: Optional[str] = None,
+        embed: Optional[Callable[[], List[float]]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[List[float]]]:
+        """
+        Busca uma resposta no nível exato e, se não houver, no semântico
+
+        Args:
+            key: Chave gerada por make_key
+            version: Versão atual da coleção
+            scope: Escopo do índice semântico (None dispensa o nível semântico)
+            embed: Função que gera o embedding da consulta (chamada só se o nível exato falhar)
+
+        Returns:
+            Tupla (resposta ou None, 'exact'/'semantic' ou None, embedding gerado ou None)
+        """
+
+        value = self.get(key, version)
+        if value is not None:
+            return value, 'exact', None
+
+        embedding = None
+        if self.similarity_threshold is not None and scope is not None and embed is not None:
+            embedding = embed()
+            value = self.get_similar(embedding, scope, version)
+            if value is not None:
+                return value, 'semantic', embedding
+
+        with self._lock:
+            self.misses += 1
+        return None, None, embedding
+
+    def get(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca uma resposta pelo nível exato
+
+        Args:
+            key: Chave gerada por make_key
+            version: Versão atual da coleção
+
+        Returns:
+            Resposta armazenada ou None
+        """
+
+        self._sync_version(version)
+        value = self.cache.get(f'{version}:{key}')
+
+        if value is not None:
+            with self._lock:
+                self.exact_hits += 1
+
+        return value
+
+    def get_similar(self, embedding: List[float], scope: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca a resposta da consulta mais parecida (nível semântico)
+
+        Args:
+            embedding: Embedding da consulta
+            scope: Escopo gerado por make_scope
+            version: Versão atual da coleção
+
+        Returns:
+            Resposta armazenada (com 'similarity') ou None se nenhuma superar o limiar
+        """
+
+        if self.similarity_threshold is None:
+            return None
+
+        self._sync_version(version)
+        keys, matrix = self._load_semantic(f'semantic:{version}:{scope}')
+        if not keys:
+            return None
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+
+        value = self.cache.get(keys[best]) if similarity >= self.similarity_threshold else None
+
+        if value is None:
+            return None
+
+        with self._lock:
+            self.semantic_hits += 1
+
+        return {**value, 'similarity': similarity}
+
+    def _load_semantic(self, index_key: str) -> Tuple[List[str], np.ndarray]:
+        """Carrega um índice semântico, descartando respostas já expiradas"""
+
+        with self._lock:
+            if index_key in self._semantic:
+                return self._semantic[index_key]
+
+        entries = [
+            (key, vector) for key, vector in self.cache.get(index_key, [])
+            if key in self.cache
+        ]
+        keys = [key for key, _ in entries]
+        matrix = (
+            np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector in entries])
+            if entries else np.empty((0, 0), dtype=np.float32)
+        )
+
+        with self._lock:
+            self._semantic[index_key] = (keys, matrix)
+        return keys, matrix
+
+    def set(
+        self,
+        key: str,
+        value: Dict[str, Any],
+        version: str,
+        embedding: Optional[List[float]] = None,
+        scope: Optional[str] = None
+    ) -> None:
+        """
+        Armazena uma resposta
+
+        Args:
+            key: Chave gerada por make_key
+            value: Resposta (texto, fontes e metadados)
+            version: Versão da coleção usada na resposta
+            embedding: Embedding da consulta, para o nível semântico
+            scope: Escopo do índice semântico
+        """
+
+        self._sync_version(version)
+        key = f'{version}:{key}'
+        self.cache.set(key, value, expire=self.ttl, tag=version)
+
+        if self.similarity_threshold is None or embedding is None or scope is None:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        index_key = f'semantic:{version}:{scope}'
+        with self._lock, self.cache.transact():
+            entries = [(k, v) for k, v in self.cache.get(index_key, []) if k != key]
+            entries = (entries + [(key, vector.tobytes())])[-self.max_semantic_entries:]
+            self.cache.set(index_key, entries, tag=version)
+            self._semantic.pop(index_key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso do cache"""
+
+        with self._lock:
+            exact_hits, semantic_hits, misses = self.exact_hits, self.semantic_hits, self.misses
+
+        hits = exact_hits + semantic_hits
+        total = hits + misses
+        return {
+            'exact_hits': exact_hits,
+            'semantic_hits': semantic_hits,
+            'misses': misses,
+            'hit_rate': hits / total if total > 0 else 0.0,
+            'entries': len(self.cache),
+            'size_bytes': self.cache.volume()
+        }
+
+    def clear(self) -> None:
+        """Remove todas as respostas do cache"""
+        self.cache.clear()
+        with self._lock:
+            self._semantic = {}
+            self._version = None
+            self.exact_hits = 0
+            self.semantic_hits = 0
+            self.misses = 0
+        logger.info("Cache de respostas limpo")
+
+    def close(self) -> None:
+        """Fecha o cache"""
+        self.cache.close()
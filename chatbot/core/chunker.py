@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Divisão de textos em chunks para o Chatbot ANTAQ
+Codifica cada documento uma única vez e corta janelas diretamente nos offsets de tokens,
+ou agrupa os dispositivos da norma (artigos, parágrafos, incisos e anexos)
+"""
+
+import re
+import logging
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, accumulate
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+
+import tiktoken
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pontuação que encerra uma sentença (cortes preferenciais)
+SENTENCE_ENDINGS = (b'.', b'!', b'?', b';', b':')
+
+# Abreviações comuns em normas que terminam em ponto mas não encerram sentença
+ABBREVIATIONS = ('art.', 'arts.', 'inc.', 'n.', 'nº.', 'núm.', 'fl.', 'fls.', 'p.', 'pág.', 'sr.', 'sra.')
+
+class TokenChunker:
+    """
+    Divide textos em janelas de tokens com sobreposição exata
+
+    O texto é codificado uma vez; as janelas são definidas por offsets no
+    vetor de tokens, preferindo terminar em fim de sentença, e só as janelas
+    finais são decodificadas.
+    """
+
+    def __init__(self, chunk_size: int = 600, chunk_overlap: int = 100, encoding_name: str = "cl100k_base"):
+        """
+        Inicializa o chunker
+
+        Args:
+            chunk_size: Tamanho máximo de cada chunk (tokens)
+            chunk_overlap: Sobreposição entre chunks consecutivos (tokens)
+            encoding_name: Codificação do tiktoken
+        """
+
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_overlap = max(0, min(chunk_overlap, self.chunk_size // 2))
+        self.encoding_name = encoding_name
+        self.tokenizer = tiktoken.get_encoding(encoding_name)
+
+        # Quanto recuar, no máximo, a partir do limite da janela para achar um fim de sentença
+        self.max_lookback = max(1, self.chunk_size // 4)
+
+        self._token_bytes: Dict[int, bytes] = {}
+
+    def _bytes(self, token: int) -> bytes:
+        """Retorna (com cache) os bytes de um token"""
+        value = self._token_bytes.get(token)
+        if value is None:
+            value = self.tokenizer.decode_single_token_bytes(token)
+            self._token_bytes[token] = value
+        return value
+
+    def _is_char_boundary(self, tokens: List[int], position: int) -> bool:
+        """Verifica se um corte na posição não divide um caractere UTF-8 entre tokens"""
+        if position <= 0 or position >= len(tokens):
+            return True
+        first_byte = self._bytes(tokens[position])[:1]
+        return not first_byte or (first_byte[0] & 0xC0) != 0x80
+
+    def _find_cut(self, tokens: List[int], start: int, end: int) -> int:
+        """
+        Escolhe onde terminar a janela [start, end)
+
+        Prefere o último fim de sentença dentro da margem de recuo; caso não
+        exista, corta no limite da janela (ajustado para não dividir caracteres).
+        """
+
+        lower = max(start + 1, end - self.max_lookback)
+
+        for position in range(end, lower - 1, -1):
+            if self._bytes(tokens[position - 1]).rstrip().endswith(SENTENCE_ENDINGS) and self._is_char_boundary(tokens, position):
+                tail = self.tokenizer.decode(tokens[max(start, position - 4):position]).lower()
+                if not tail.split()[-1:] or tail.split()[-1] not in ABBREVIATIONS:
+                    return position
+
+        position = end
+        while position > start + 1 and not self._is_char_boundary(tokens, position):
+            position -= 1
+        return position
+
+    def _overlap_start(self, tokens: List[int], start: int, end: int) -> int:
+        """
+        Início do trecho seguinte a [start, end), recuando chunk_overlap tokens
+
+        A sobreposição é medida exatamente em tokens (avança só para não dividir caracteres).
+        """
+
+        next_start = max(end - self.chunk_overlap, start + 1)
+        while next_start < end and not self._is_char_boundary(tokens, next_start):
+            next_start += 1
+        return next_start
+
+    def _window_ranges(self, tokens: List[int], start: int, stop: int) -> List[Tuple[int, int]]:
+        """
+        Divide o trecho [start, stop) do vetor de tokens em janelas com sobreposição
+
+        Returns:
+            Lista de offsets (início, fim) das janelas
+        """
+
+        ranges = []
+
+        while start < stop:
+            end = min(start + self.chunk_size, stop)
+            if end < stop:
+                end = self._find_cut(tokens, start, end)
+
+            ranges.append((start, end))
+
+            if end >= stop:
+                break
+
+            start = self._overlap_start(tokens, start, end)
+
+        return ranges
+
+    def _windows(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Divide um texto já normalizado em janelas de tokens com sobreposição
+
+        Returns:
+            Lista de tuplas (texto da janela, tokens)
+        """
+
+        tokens = self.tokenizer.encode(text)
+
+        windows = []
+        for start, end in self._window_ranges(tokens, 0, len(tokens)):
+            window_text = self.tokenizer.decode(tokens[start:end]).strip()
+            if window_text:
+                windows.append((window_text, end - start))
+
+        return windows
+
+    def chunk(self, text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Divide um texto em chunks
+
+        Args:
+            text: Texto para dividir
+            metadata: Metadados do documento
+
+        Returns:
+            Lista de chunks com metadados
+        """
+
+        if not text or len(text.strip()) < 50:
+            return []
+
+        # Limpar e normalizar texto
+        text = re.sub(r'\s+', ' ', text.strip())
+
+        return [
+            {
+                'text': window_text,
+                'metadata': {
+                    **metadata,
+                    'chunk_index': chunk_index,
+                    'tokens': tokens
+                }
+            }
+            for chunk_index, (window_text, tokens) in enumerate(self._windows(text))
+        ]
+
+    def chunk_many(
+        self,
+        documents: Iterable[Tuple[str, Dict[str, Any]]],
+        processes: int = 1,
+        group_size: int = 64
+    ) -> Iterator[Tuple[Tuple[str, Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Divide vários documentos em chunks, opcionalmente em um pool de processos
+
+        Os documentos são consumidos em grupos, de modo que apenas um grupo
+        fique em memória por vez; os resultados mantêm a ordem de entrada.
+
+        Args:
+            documents: Iterável de tuplas (texto, metadados)
+            processes: Número de processos (1 = processa no processo atual)
+            group_size: Documentos enviados ao pool por vez
+
+        Yields:
+            Tuplas ((texto, metadados), chunks)
+        """
+
+        documents = iter(documents)
+
+        if processes <= 1:
+            for document in documents:
+                yield document, _chunk_safely(self, document)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(type(self), self.chunk_size, self.chunk_overlap, self.encoding_name)
+        ) as executor:
+            while True:
+                group = list(islice(documents, group_size * processes))
+                if not group:
+                    break
+                for document, chunks in zip(group, executor.map(_chunk_in_worker, group, chunksize=group_size)):
+                    yield document, chunks
+
+# Cabeçalho de artigo no início de um dispositivo ("Art. 5º", "Art. 10.", "Art. 10-A", "ARTIGO 3")
+ARTIGO_HEADING = re.compile(
+    r'(?:^|(?<=[.;:!?] ))(?:Art\.|ART\.|Artigo|ARTIGO) ?(\d+) ?(?:[º°o](?![a-zà-ú])|\.)?(?: ?- ?([A-Z])\b)?'
+)
+
+# Cabeçalho de anexo (só em maiúsculas, para não confundir com "conforme o Anexo I")
+ANEXO_HEADING = re.compile(r'(?:^|(?<= ))ANEXO(?: ([IVXLC]+|\d+|ÚNICO)\b)?')
+
+# Início de parágrafo, inciso ou alínea (cortes preferenciais dentro de um artigo longo)
+SUBDIVISAO = re.compile(r'(?<=[.;:] )(?=§ ?\d|Parágrafo único|PARÁGRAFO ÚNICO|[IVXLC]+ ?[-–] |[a-z]\) )')
+
+class LegalStructureChunker(TokenChunker):
+    """
+    Divide normas em chunks alinhados aos artigos
+
+    Artigos (e o preâmbulo e os anexos) consecutivos são agrupados enquanto
+    couberem em chunk_size tokens; um artigo maior que isso é dividido nos
+    parágrafos, incisos e alíneas e, só em último caso, em janelas de
+    tokens. Cada chunk leva o intervalo de artigos que contém.
+    """
+
+    def _segments(self, text: str) -> List[Tuple[Optional[str], Optional[str], int]]:
+        """
+        Localiza os dispositivos do texto
+
+        Citações a outros artigos ("nos termos do art. 5º") são descartadas:
+        o cabeçalho precisa iniciar uma sentença e a numeração não pode
+        retroceder (exceto ao entrar em um anexo).
+
+        Returns:
+            Lista de (artigo ou None, anexo ou None, posição inicial), em ordem
+        """
+
+        headings = []
+        for match in ARTIGO_HEADING.finditer(text):
+            artigo = match.group(1).lstrip('0') or '0'
+            if match.group(2):
+                artigo = f"{artigo}-{match.group(2)}"
+            headings.append((match.start(), 'artigo', artigo))
+        for match in ANEXO_HEADING.finditer(text):
+            headings.append((match.start(), 'anexo', match.group(1) or 'ÚNICO'))
+        headings.sort()
+
+        segments = [(None, None, 0)]
+        ultimo_numero = 0
+        anexo = None
+        corpo_iniciado = False
+
+        for position, kind, label in headings:
+            if kind == 'anexo':
+                # "ANEXO" antes do primeiro artigo faz parte do título ou da ementa
+                if not corpo_iniciado:
+                    continue
+                anexo, ultimo_numero = label, 0
+                segments.append((None, anexo, position))
+                continue
+            numero = int(label.split('-')[0])
+            if numero < ultimo_numero:
+                continue
+            ultimo_numero = numero
+            corpo_iniciado = True
+            segments.append((label, anexo, position))
+
+        # Descartar o preâmbulo vazio (texto que já começa com um dispositivo)
+        if len(segments) > 1 and segments[1][2] == 0:
+            segments.pop(0)
+
+        return segments
+
+    def _token_offsets(self, text: str, tokens: List[int], positions: List[int]) -> List[int]:
+        """
+        Converte posições de caracteres do texto em offsets no vetor de tokens
+
+        Uma posição no meio de um token (ex.: o token " Art" começa no espaço
+        antes do cabeçalho) é levada ao início desse token.
+
+        Args:
+            text: Texto codificado
+            tokens: Tokens do texto
+            positions: Posições de caracteres, em ordem crescente
+
+        Returns:
+            Offsets de tokens correspondentes
+        """
+
+        token_starts = list(accumulate((len(self._bytes(token)) for token in tokens), initial=0))
+
+        offsets = []
+        byte_position = 0
+        previous = 0
+        for position in positions:
+            byte_position += len(text[previous:position].encode('utf-8'))
+            previous = position
+
+            offset = min(bisect_right(token_starts, byte_position) - 1, len(tokens))
+            while offset > 0 and not self._is_char_boundary(tokens, offset):
+                offset -= 1
+            offsets.append(offset)
+
+        return offsets
+
+    def _split_long(self, text: str, tokens: List[int], start: int, end: int, char_start: int, char_end: int) -> List[Tuple[int, int]]:
+        """
+        Divide um artigo maior que chunk_size nos parágrafos, incisos e alíneas
+
+        Trechos consecutivos são agrupados até chunk_size tokens, cada parte a
+        partir da segunda recua chunk_overlap tokens sobre a anterior (como as
+        janelas do TokenChunker) e só um dispositivo que sozinho exceda
+        chunk_size é cortado em janelas.
+
+        Args:
+            text: Texto normalizado da norma
+            tokens: Tokens da norma
+            start, end: Offsets de tokens do artigo
+            char_start, char_end: Posições de caracteres do artigo
+
+        Returns:
+            Lista de offsets (início, fim) das partes do artigo
+        """
+
+        cuts = [match.start() for match in SUBDIVISAO.finditer(text, char_start, char_end)]
+        bounds = [start] + [o for o in self._token_offsets(text, tokens, cuts) if start < o < end] + [end]
+
+        # Trechos (início, fim): dispositivos ou janelas de um dispositivo longo
+        pieces = []
+        for piece_start, piece_end in zip(bounds, bounds[1:]):
+            if piece_end - piece_start > self.chunk_size:
+                pieces.extend(self._window_ranges(tokens, piece_start, piece_end))
+            elif piece_end > piece_start:
+                pieces.append((piece_start, piece_end))
+
+        parts: List[Tuple[int, int]] = []
+        for piece_start, piece_end in pieces:
+            if parts and piece_end - parts[-1][0] <= self.chunk_size:
+                parts[-1] = (parts[-1][0], max(parts[-1][1], piece_end))
+                continue
+            if parts and piece_end - piece_start < self.chunk_size:
+                # Sobreposição com a parte anterior, sem ultrapassar chunk_size
+                overlap_start = self._overlap_start(tokens, parts[-1][0], parts[-1][1])
+                piece_start = min(piece_start, max(overlap_start, piece_end - self.chunk_size))
+                while piece_start < piece_end and not self._is_char_boundary(tokens, piece_start):
+                    piece_start += 1
+            parts.append((piece_start, piece_end))
+
+        return parts
+
+    def chunk(self, text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Divide uma norma em chunks alinhados aos artigos
+
+        O texto é codificado uma única vez: os limites dos dispositivos são
+        convertidos em offsets de tokens e cada chunk é um trecho contíguo
+        desse vetor, decodificado só no final.
+
+        Args:
+            text: Texto para dividir
+            metadata: Metadados do documento
+
+        Returns:
+            Lista de chunks com metadados (artigo, artigo_fim, anexo e artigos, quando houver)
+        """
+
+        if not text or len(text.strip()) < 50:
+            return []
+
+        # Limpar e normalizar texto
+        text = re.sub(r'\s+', ' ', text.strip())
+        tokens = self.tokenizer.encode(text)
+
+        segments = self._segments(text)
+        char_bounds = [position for _, _, position in segments] + [len(text)]
+        token_bounds = self._token_offsets(text, tokens, char_bounds)
+
+        # Unidades (início, fim, artigo, anexo): artigos inteiros ou partes de um artigo longo
+        units = []
+        for i, (artigo, anexo, _) in enumerate(segments):
+            start, end = token_bounds[i], token_bounds[i + 1]
+            if end <= start:
+                continue
+            if end - start > self.chunk_size:
+                parts = self._split_long(text, tokens, start, end, char_bounds[i], char_bounds[i + 1])
+            else:
+                parts = [(start, end)]
+            units.extend((part_start, part_end, artigo, anexo) for part_start, part_end in parts)
+
+        # Agrupar unidades consecutivas do mesmo anexo (ou do corpo da norma)
+        groups: List[List[Tuple[int, int, Optional[str], Optional[str]]]] = []
+        for unit in units:
+            if groups and groups[-1][-1][3] == unit[3] and unit[1] - groups[-1][0][0] <= self.chunk_size:
+                groups[-1].append(unit)
+            else:
+                groups.append([unit])
+
+        chunks = []
+        for group in groups:
+            start, end = group[0][0], max(unit[1] for unit in group)
+            # Tokens só de espaço nas bordas não entram na contagem
+            while start < end and not self._bytes(tokens[start]).strip():
+                start += 1
+            while end > start and not self._bytes(tokens[end - 1]).strip():
+                end -= 1
+            chunk_text = self.tokenizer.decode(tokens[start:end]).strip()
+            if not chunk_text:
+                continue
+
+            chunk_metadata = {
+                **metadata,
+                'chunk_index': len(chunks),
+                'tokens': end - start
+            }
+
+            artigos = list(dict.fromkeys(unit[2] for unit in group if unit[2]))
+            if artigos:
+                chunk_metadata['artigos'] = artigos
+                chunk_metadata['artigo'] = int(artigos[0].split('-')[0])
+                chunk_metadata['artigo_fim'] = int(artigos[-1].split('-')[0])
+            if group[0][3]:
+                chunk_metadata['anexo'] = group[0][3]
+
+            chunks.append({'text': chunk_text, 'metadata': chunk_metadata})
+
+        return chunks
+
+# Chunker de cada processo do pool (o Encoding do tiktoken é criado no próprio processo)
+_worker_chunker: Optional[TokenChunker] = None
+
+def _init_worker(chunker_class: type, chunk_size: int, chunk_overlap: int, encoding_name: str) -> None:
+    """Inicializa o chunker de um processo do pool"""
+    global _worker_chunker
+    _worker_chunker = chunker_class(chunk_size, chunk_overlap, encoding_name)
+
+def _chunk_in_worker(document: Tuple[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Divide um documento usando o chunker do processo"""
+    return _chunk_safely(_worker_chunker, document)
+
+def _chunk_safely(chunker: TokenChunker, document: Tuple[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Divide um documento registrando (sem propagar) erros"""
+    text, metadata = document
+    try:
+        return chunker.chunk(text, metadata)
+    except Exception as e:
+        logger.error(f"❌ Erro ao dividir norma {metadata.get('codigo_registro', 'N/A')} em chunks: {e}")
+        return []
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Estatísticas agregadas da coleção de normas ANTAQ
+Mantidas incrementalmente a cada inserção/remoção de chunks e persistidas em disco
+"""
+
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Tuple
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tipos de norma reconhecidos no título (a primeira ocorrência vence)
+TIPOS_NORMA = [
+    ('RESOLUÇÃO', 'Resolução'),
+    ('PORTARIA', 'Portaria'),
+    ('TERMO DE AUTORIZAÇÃO', 'Termo de Autorização'),
+    ('INSTRUÇÃO NORMATIVA', 'Instrução Normativa'),
+    ('DELIBERAÇÃO', 'Deliberação'),
+    ('ACÓRDÃO', 'Acórdão'),
+]
+
+def classificar_tipo_norma(titulo: str) -> str:
+    """Classifica o tipo da norma a partir do título"""
+    titulo_upper = (titulo or '').upper()
+    for padrao, tipo in TIPOS_NORMA:
+        if padrao in titulo_upper:
+            return tipo
+    return 'Outros'
+
+class CollectionStats:
+    """
+    Agregados da coleção (por autor, assunto, ano, tipo e situação, além das
+    normas distintas), atualizados a cada inserção ou remoção de chunks
+
+    As contagens são por chunk, como na análise completa dos metadados;
+    as normas distintas são mantidas como contagem de chunks por
+    codigo_registro para que remoções possam ser aplicadas.
+    """
+
+    FIELDS = ['autores', 'assuntos', 'anos', 'tipos_normas', 'situacoes', 'normas']
+
+    def __init__(self, path: str):
+        """
+        Inicializa as estatísticas, carregando o arquivo persistido se existir
+
+        Args:
+            path: Caminho do arquivo JSON das estatísticas
+        """
+
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.reset()
+        self.loaded = self._load()
+
+    def reset(self) -> None:
+        """Zera todos os agregados"""
+        with self._lock:
+            self.total_chunks = 0
+            self.counters: Dict[str, Dict[str, int]] = {field: {} for field in self.FIELDS}
+
+    def _load(self) -> bool:
+        """Carrega os agregados persistidos"""
+
+        if not self.path.exists():
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.total_chunks = int(data['total_chunks'])
+            self.counters = {field: dict(data['counters'].get(field, {})) for field in self.FIELDS}
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Estatísticas da coleção ilegíveis em {self.path}: {e}")
+            self.reset()
+            return False
+
+    def save(self) -> None:
+        """Persiste os agregados (escrita atômica)"""
+
+        with self._lock:
+            data = {'total_chunks': self.total_chunks, 'counters': self.counters}
+
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.loaded = True
+
+    @staticmethod
+    def _keys(meta: Dict[str, Any]) -> Dict[str, str]:
+        """Extrai de um metadado de chunk a chave de cada agregado"""
+
+        keys = {
+            'autores': meta.get('autor', 'Desconhecido'),
+            'assuntos': meta.get('assunto', 'Desconhecido'),
+            'situacoes': meta.get('situacao', 'Desconhecida'),
+        }
+
+        codigo_registro = meta.get('codigo_registro', '')
+        if codigo_registro:
+            keys['normas'] = codigo_registro
+
+        ano = str(meta.get('assinatura') or '')[:4]
+        if ano.isdigit():
+            keys['anos'] = ano
+
+        if meta.get('titulo'):
+            keys['tipos_normas'] = classificar_tipo_norma(meta['titulo'])
+
+        return keys
+
+    def _apply(self, metadatas: Iterable[Dict[str, Any]], delta: int) -> None:
+        """Soma (ou subtrai) os chunks informados dos agregados"""
+
+        with self._lock:
+            for meta in metadatas:
+                self.total_chunks += delta
+                for field, key in self._keys(meta).items():
+                    counter = self.counters[field]
+                    value = counter.get(key, 0) + delta
+                    if value > 0:
+                        counter[key] = value
+                    else:
+                        counter.pop(key, None)
+
+            self.total_chunks = max(0, self.total_chunks)
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Registra chunks inseridos na coleção"""
+        self._apply(metadatas, 1)
+
+    def remove(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Registra chunks removidos da coleção"""
+        self._apply(metadatas, -1)
+
+    def add_normas(self, normas: Iterable[Tuple[Dict[str, Any], int]]) -> None:
+        """
+        Registra normas inteiras, sem ler os metadados de cada chunk
+
+        Args:
+            normas: Tuplas (metadados da norma, número de chunks)
+        """
+        for meta, chunks in normas:
+            self._apply([meta], chunks)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Retorna os agregados no formato de VectorStoreANTAQ.get_collection_stats"""
+
+        with self._lock:
+            counters = {field: dict(counter) for field, counter in self.counters.items()}
+            total_chunks = self.total_chunks
+
+        def top(counter: Dict[str, int], n: int) -> Dict[str, int]:
+            return dict(sorted(counter.items(), key=lambda x: x[1], reverse=True)[:n])
+
+        return {
+            'total_chunks': total_chunks,
+            'total_normas_unicas': len(counters['normas']),
+            'top_autores': top(counters['autores'], 10),
+            'top_assuntos': top(counters['assuntos'], 10),
+            'distribuicao_anos': dict(sorted(counters['anos'].items())),
+            'tipos_normas': top(counters['tipos_normas'], len(counters['tipos_normas'])),
+            'situacoes': top(counters['situacoes'], len(counters['situacoes']))
+        }
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Armazenamento de metadados por norma para o Chatbot ANTAQ
+Os campos da norma (título, autor, assunto, link...) são gravados uma única
+vez em SQLite; os chunks no ChromaDB levam apenas os campos de filtro.
+Mantém também o índice (norma, artigo) -> chunks
+"""
+
+import re
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Campos mantidos nos metadados de cada chunk (usados em filtros where)
+CHUNK_METADATA_FIELDS = (
+    'codigo_registro', 'chunk_index', 'tokens', 'assinatura', 'situacao', 'tipo_material',
+    'ano_assinatura', 'assinatura_ts', 'ano_publicacao', 'publicacao_ts',
+    'artigo', 'artigo_fim', 'anexo'
+)
+
+# Campos de filtro que também valem para a norma inteira (primeiro estágio da busca)
+NORMA_FILTER_FIELDS = tuple(
+    field for field in CHUNK_METADATA_FIELDS
+    if field not in ('chunk_index', 'tokens', 'artigo', 'artigo_fim', 'anexo')
+)
+
+# Operadores do formato where do ChromaDB traduzidos em SQL (find_codigos)
+_SQL_OPERATORS = {'$eq': '=', '$ne': '!=', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+
+def chunk_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduz os metadados de um chunk aos campos de filtro"""
+    return {field: metadata[field] for field in CHUNK_METADATA_FIELDS if field in metadata}
+
+class NormaDocumentStore:
+    """
+    Metadados das normas indexados por codigo_registro, persistidos em SQLite
+
+    Guarda também o número de chunks de cada norma, o que permite
+    recalcular as estatísticas da coleção sem ler os metadados dos chunks.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            db_path: Caminho do arquivo SQLite
+        """
+
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão com o banco, aberta (e o esquema criado) no primeiro uso"""
+
+        if self._connection is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS normas (
+                        codigo_registro TEXT PRIMARY KEY,
+                        metadata TEXT NOT NULL,
+                        chunks INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS artigos (
+                        codigo_registro TEXT NOT NULL,
+                        artigo TEXT NOT NULL,
+                        chunk_index INTEGER NOT NULL,
+                        PRIMARY KEY (codigo_registro, artigo, chunk_index)
+                    ) WITHOUT ROWID
+                """)
+            self._connection = conn
+        return self._connection
+
+    def upsert(self, normas: Iterable[Tuple[Dict[str, Any], int]]) -> None:
+        """
+        Grava (ou substitui) os metadados de normas
+
+        Args:
+            normas: Tuplas (metadados da norma, número de chunks)
+        """
+
+        rows = [
+            (str(meta['codigo_registro']), json.dumps(meta, ensure_ascii=False), int(chunks))
+            for meta, chunks in normas
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO normas (codigo_registro, metadata, chunks) VALUES (?, ?, ?)",
+                rows
+            )
+
+    def remove(self, codigos_registro: Iterable[str]) -> None:
+        """Remove normas do armazenamento"""
+
+        codigos = [str(codigo) for codigo in codigos_registro]
+        with self._lock, self._conn:
+            for start in range(0, len(codigos), 500):
+                lote = codigos[start:start + 500]
+                placeholders = ','.join('?' * len(lote))
+                self._conn.execute(f"DELETE FROM normas WHERE codigo_registro IN ({placeholders})", lote)
+                self._conn.execute(f"DELETE FROM artigos WHERE codigo_registro IN ({placeholders})", lote)
+
+    def clear(self) -> None:
+        """Remove todas as normas"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM normas")
+            self._conn.execute("DELETE FROM artigos")
+
+    def set_artigos(self, artigos: Dict[str, List[Tuple[str, int]]]) -> None:
+        """
+        Substitui o índice de artigos das normas informadas
+
+        Args:
+            artigos: codigo_registro -> lista de (artigo, chunk_index)
+        """
+
+        with self._lock, self._conn:
+            for codigo, entradas in artigos.items():
+                self._conn.execute("DELETE FROM artigos WHERE codigo_registro = ?", (str(codigo),))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO artigos (codigo_registro, artigo, chunk_index) VALUES (?, ?, ?)",
+                    [(str(codigo), artigo, int(chunk_index)) for artigo, chunk_index in entradas]
+                )
+
+    def find_artigos(self, codigos_registro: Iterable[str], artigos: Iterable[str]) -> List[Tuple[str, int]]:
+        """
+        Localiza os chunks que contêm os artigos informados
+
+        Args:
+            codigos_registro: Códigos das normas
+            artigos: Artigos ("5", "10-A")
+
+        Returns:
+            Lista de (codigo_registro, chunk_index), na ordem das normas e dos chunks
+        """
+
+        codigos = [str(codigo) for codigo in codigos_registro]
+        artigos = list(artigos)
+        if not codigos or not artigos:
+            return []
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT DISTINCT codigo_registro, chunk_index FROM artigos
+                WHERE codigo_registro IN ({','.join('?' * len(codigos))})
+                AND artigo IN ({','.join('?' * len(artigos))})
+                """,
+                codigos + artigos
+            ).fetchall()
+
+        ordem = {codigo: i for i, codigo in enumerate(codigos)}
+        return sorted(rows, key=lambda row: (ordem[row[0]], row[1]))
+
+    def count(self) -> int:
+        """Número de normas armazenadas"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM normas").fetchone()[0]
+
+    def total_chunks(self) -> int:
+        """Soma dos chunks de todas as normas armazenadas"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(chunks), 0) FROM normas").fetchone()[0]
+
+    def get_many(self, codigos_registro: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtém os metadados de várias normas
+
+        Args:
+            codigos_registro: Códigos das normas
+
+        Returns:
+            Dicionário codigo_registro -> metadados (normas ausentes são omitidas)
+        """
+
+        codigos = list(dict.fromkeys(str(codigo) for codigo in codigos_registro))
+        normas = {}
+
+        with self._lock:
+            for start in range(0, len(codigos), 500):
+                lote = codigos[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT codigo_registro, metadata FROM normas WHERE codigo_registro IN ({','.join('?' * len(lote))})",
+                    lote
+                ).fetchall()
+                normas.update((codigo, json.loads(metadata)) for codigo, metadata in rows)
+
+        return normas
+
+    def find_codigos(self, filters: Dict[str, Any]) -> List[str]:
+        """
+        Códigos das normas cujos metadados atendem aos filtros
+
+        Usado para filtros sobre campos que só existem na norma (autor,
+        assunto, título...), traduzidos em codigo_registro $in na busca.
+
+        Args:
+            filters: Campo -> valor ou {operador: valor}, no formato where
+                do ChromaDB ($eq, $ne, $gt, $gte, $lt, $lte, $in, $nin)
+
+        Returns:
+            Códigos das normas encontradas, em ordem
+        """
+
+        clauses, params = [], []
+        for field, condition in filters.items():
+            if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', field):
+                raise ValueError(f"Campo de filtro inválido: {field}")
+            column = f"json_extract(metadata, '$.{field}')"
+            operators = condition if isinstance(condition, dict) else {'$eq': condition}
+            for operator, operand in operators.items():
+                if operator in ('$in', '$nin'):
+                    values = list(operand)
+                    if not values:
+                        clauses.append('0' if operator == '$in' else '1')
+                        continue
+                    negation = 'NOT ' if operator == '$nin' else ''
+                    clauses.append(f"{column} {negation}IN ({','.join('?' * len(values))})")
+                    params.extend(values)
+                elif operator in _SQL_OPERATORS:
+                    clauses.append(f"{column} {_SQL_OPERATORS[operator]} ?")
+                    params.append(operand)
+                else:
+                    raise ValueError(f"Operador de filtro não suportado: {operator}")
+
+        where = ' AND '.join(clauses) or '1'
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT codigo_registro FROM normas WHERE {where} ORDER BY codigo_registro",
+                params
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def join(self, metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Completa metadados de chunks com os campos da norma
+
+        Chunks gravados antes do armazenamento por norma já trazem todos
+        os campos e são devolvidos sem alteração.
+
+        Args:
+            metadatas: Metadados de chunks (usa codigo_registro)
+
+        Returns:
+            Metadados completos, na mesma ordem
+        """
+
+        normas = self.get_many(meta.get('codigo_registro', '') for meta in metadatas if meta)
+        return [{**normas.get(str((meta or {}).get('codigo_registro', '')), {}), **(meta or {})} for meta in metadatas]
+
+    def iter_normas(self, page_size: int = 1000) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """
+        Percorre as normas armazenadas em páginas
+
+        Yields:
+            Tuplas (metadados da norma, número de chunks)
+        """
+
+        last = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT codigo_registro, metadata, chunks FROM normas WHERE codigo_registro > ? ORDER BY codigo_registro LIMIT ?",
+                    (last, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, metadata, chunks in rows:
+                yield json.loads(metadata), chunks
+            last = rows[-1][0]
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
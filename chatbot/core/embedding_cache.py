@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Caches de embeddings para o Chatbot ANTAQ
+Evita gerar novamente embeddings de textos e consultas já processados
+"""
+
+import hashlib
+import logging
+import re
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import diskcache
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Cache em disco de embeddings endereçado pelo conteúdo
+
+    A chave combina o modelo de embedding com o hash do texto normalizado,
+    de modo que o mesmo trecho gere sempre a mesma entrada, independente
+    da norma, do chunk ou dos metadados a que pertença.
+    """
+
+    def __init__(self, directory: str, size_limit_mb: int = 1024):
+        """
+        Inicializa o cache de embeddings
+
+        Args:
+            directory: Diretório onde o cache é persistido
+            size_limit_mb: Tamanho máximo do cache em MB (entradas menos usadas são removidas)
+        """
+
+        self.directory = Path(directory)
+        self.cache = diskcache.Cache(
+            str(self.directory),
+            size_limit=size_limit_mb * 1024 * 1024,
+            eviction_policy='least-recently-used'
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        logger.info(f"Cache de embeddings em: {self.directory}")
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normaliza o texto antes do cálculo da chave"""
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def _make_key(self, model: str, text: str) -> str:
+        """Gera a chave do cache para o par (modelo, texto)"""
+        digest = hashlib.sha256(self.normalize_text(text).encode('utf-8')).hexdigest()
+        return f"{model}:{digest}"
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Busca o embedding de um texto no cache
+
+        Args:
+            model: Identificador do modelo de embedding
+            text: Texto original
+
+        Returns:
+            Embedding armazenado ou None se não estiver no cache
+        """
+
+        value = self.cache.get(self._make_key(model, text))
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return np.frombuffer(value, dtype=np.float32).tolist()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Busca os embeddings de vários textos no cache"""
+        return [self.get(model, text) for text in texts]
+
+    def set(self, model: str, text: str, embedding: List[float]) -> None:
+        """
+        Armazena o embedding de um texto no cache
+
+        Args:
+            model: Identificador do modelo de embedding
+            text: Texto original
+            embedding: Embedding gerado
+        """
+
+        value = np.asarray(embedding, dtype=np.float32).tobytes()
+        self.cache.set(self._make_key(model, text), value)
+
+    def set_many(self, model: str, texts: List[str], embeddings: List[Optional[List[float]]]) -> None:
+        """Armazena vários embeddings no cache (entradas None são ignoradas)"""
+        for text, embedding in zip(texts, embeddings):
+            if embedding is not None:
+                self.set(model, text, embedding)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso do cache"""
+
+        with self._lock:
+            hits, misses = self.hits, self.misses
+
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total > 0 else 0.0,
+            'entries': len(self.cache),
+            'size_bytes': self.cache.volume()
+        }
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache"""
+        self.cache.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+        logger.info("Cache de embeddings limpo")
+
+    def close(self) -> None:
+        """Fecha o cache"""
+        self.cache.close()
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU em memória, com expiração, para embeddings de consultas
+
+    A chave é a forma normalizada da consulta (minúsculas, espaços e
+    pontuação final removidos), de modo que variações triviais de uma
+    mesma pergunta reutilizem o embedding.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: int = 3600):
+        """
+        Inicializa o cache de consultas
+
+        Args:
+            max_size: Número máximo de consultas armazenadas
+            ttl: Tempo de vida de cada entrada (segundos)
+        """
+
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self._miss_latency_total = 0.0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normaliza a consulta para uso como chave"""
+        return re.sub(r'\s+', ' ', query).strip().lower().rstrip('?!.;: ')
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """
+        Busca o embedding de uma consulta
+
+        Args:
+            query: Consulta do usuário
+
+        Returns:
+            Embedding armazenado ou None se ausente ou expirado
+        """
+
+        key = self.normalize_query(query)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, query: str, embedding: List[float], latency: float = 0.0) -> None:
+        """
+        Armazena o embedding de uma consulta
+
+        Args:
+            query: Consulta do usuário
+            embedding: Embedding gerado
+            latency: Tempo gasto para gerar o embedding (segundos), usado nas estatísticas
+        """
+
+        key = self.normalize_query(query)
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            self._miss_latency_total += latency
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso, incluindo a latência estimada economizada"""
+
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = len(self._entries)
+            avg_miss_latency = self._miss_latency_total / misses if misses > 0 else 0.0
+
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total > 0 else 0.0,
+            'entries': entries,
+            'avg_embedding_latency_ms': avg_miss_latency * 1000,
+            'estimated_saved_ms': hits * avg_miss_latency * 1000
+        }
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Backends de embedding para o Chatbot ANTAQ
+Permite gerar embeddings via OpenAI, localmente (sentence-transformers) ou
+de forma determinística para testes
+"""
+
+import re
+import hashlib
+import logging
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+import openai
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingBackend(ABC):
+    """
+    Interface dos backends de embedding
+
+    A identidade do backend (``identity``) é gravada nos metadados da coleção
+    e usada nas chaves do cache de embeddings: vetores de backends diferentes
+    nunca são misturados.
+    """
+
+    # Se as chamadas passam pelo limitador de taxa (APIs remotas)
+    remote: bool = False
+
+    # Dimensão dos vetores gerados (None se desconhecida)
+    dimensions: Optional[int] = None
+
+    @property
+    @abstractmethod
+    def identity(self) -> str:
+        """Identificador estável do backend (tipo, modelo e dimensão)"""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings para um lote de textos
+
+        Args:
+            texts: Textos do lote
+
+        Returns:
+            Embeddings na mesma ordem dos textos
+        """
+
+# Dimensão nativa dos modelos de embedding da OpenAI
+OPENAI_NATIVE_DIMENSIONS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536,
+}
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings via API da OpenAI"""
+
+    remote = True
+
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: Optional[int] = None):
+        """
+        Args:
+            model: Modelo de embedding da OpenAI
+            dimensions: Dimensão reduzida dos vetores (apenas modelos text-embedding-3-*);
+                None mantém a dimensão nativa do modelo
+        """
+        self.model = model
+        self.reduced_dimensions = dimensions
+        self.dimensions = dimensions or OPENAI_NATIVE_DIMENSIONS.get(model)
+
+    @property
+    def identity(self) -> str:
+        if self.reduced_dimensions:
+            return f"openai:{self.model}:{self.reduced_dimensions}"
+        return f"openai:{self.model}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        params = {}
+        if self.reduced_dimensions:
+            params['dimensions'] = self.reduced_dimensions
+
+        response = openai.embeddings.create(
+            model=self.model,
+            input=[text.replace("\n", " ") for text in texts],
+            **params
+        )
+
+        # A API informa o índice de cada vetor; não depender da ordem da resposta
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+
+        if any(embedding is None for embedding in embeddings):
+            raise ValueError(f"Resposta incompleta: {len(response.data)} embeddings para {len(texts)} textos")
+
+        return embeddings
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Embeddings locais em CPU com sentence-transformers
+
+    Opcionalmente acelerado com quantização int8 dinâmica (PyTorch) ou com
+    o backend ONNX do sentence-transformers.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        batch_size: int = 32,
+        device: str = "cpu",
+        acceleration: Optional[str] = None,
+        dimensions: Optional[int] = None
+    ):
+        """
+        Args:
+            model_name: Modelo do sentence-transformers (deve suportar português)
+            batch_size: Textos processados por passo de inferência
+            device: Dispositivo de execução
+            acceleration: None, 'int8' (quantização dinâmica) ou 'onnx'
+            dimensions: Trunca os vetores para esta dimensão (modelos Matryoshka)
+        """
+
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("sentence-transformers não instalado. Execute: pip install sentence-transformers")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.acceleration = acceleration
+
+        options = {'device': device}
+        if dimensions:
+            options['truncate_dim'] = dimensions
+        if acceleration == 'onnx':
+            options['backend'] = 'onnx'
+
+        self.model = SentenceTransformer(model_name, **options)
+
+        if acceleration == 'int8':
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        logger.info(f"Modelo de embedding local carregado: {model_name} ({self.dimensions} dimensões)")
+
+    @property
+    def identity(self) -> str:
+        suffix = f"+{self.acceleration}" if self.acceleration else ""
+        return f"local:{self.model_name}{suffix}:{self.dimensions}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return embeddings.astype(np.float32).tolist()
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeddings determinísticos por hashing de palavras (sem rede nem modelo)
+
+    Destinado a testes e ambientes offline: textos com palavras em comum
+    geram vetores próximos, mas não há semântica.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        """
+        Args:
+            dimensions: Dimensão dos vetores
+        """
+        self.dimensions = dimensions
+
+    @property
+    def identity(self) -> str:
+        return f"hashing:{self.dimensions}"
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        """Palavras em minúsculas e sem acentos"""
+        text = unicodedata.normalize('NFKD', text.lower())
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+        return re.findall(r'\w+', text)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for token in self._tokens(text):
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                embeddings[row, value % self.dimensions] += 1.0 if (value >> 63) & 1 else -1.0
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (embeddings / norms).tolist()
+
+def create_embedding_backend(name: str = "openai", **kwargs) -> EmbeddingBackend:
+    """
+    Cria um backend de embedding pelo nome
+
+    Args:
+        name: 'openai', 'local' ou 'hashing'
+        **kwargs: Parâmetros do backend
+
+    Returns:
+        Instância do backend
+    """
+
+    backends = {
+        'openai': OpenAIEmbeddingBackend,
+        'local': SentenceTransformerBackend,
+        'hashing': HashingEmbeddingBackend,
+    }
+
+    if name not in backends:
+        raise ValueError(f"Backend de embedding desconhecido: {name} (opções: {', '.join(backends)})")
+
+    return backends[name](**kwargs)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Gerenciamento do histórico da conversa para o Chatbot ANTAQ
+Mantém o histórico enviado ao LLM dentro de um orçamento de tokens,
+resumindo as interações mais antigas
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence
+
+import openai
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Você mantém o resumo de uma conversa entre um usuário e um assistente sobre normas da ANTAQ.
+Atualize o resumo com as novas mensagens, preservando as perguntas feitas, as normas citadas
+(título, número e código) e as conclusões das respostas. Seja conciso e escreva em português."""
+
+class ConversationHistoryManager:
+    """
+    Histórico da conversa limitado por tokens, com resumo acumulado
+
+    Enquanto o histórico couber no orçamento ele é enviado sem alterações.
+    Quando não couber, apenas a última interação (pergunta e resposta) é
+    mantida na íntegra e as anteriores são condensadas em um resumo,
+    gerado sob demanda e atualizado de forma incremental: o resumo de uma
+    conversa é guardado pelo hash das mensagens que resume, e a pergunta
+    seguinte só precisa acrescentar a interação que acabou de sair da janela.
+    """
+
+    # Mensagens resumidas de uma só vez quando não há resumo anterior
+    MAX_MESSAGES_PER_SUMMARY = 10
+
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int = 2000,
+        summary_max_tokens: int = 400,
+        summary_model: Optional[str] = None,
+        max_summaries: int = 1024
+    ):
+        """
+        Inicializa o gerenciador
+
+        Args:
+            tokenizer: Encoding do tiktoken usado na contagem
+            max_tokens: Orçamento de tokens do histórico no prompt
+            summary_max_tokens: Tamanho máximo do resumo (tokens)
+            summary_model: Modelo usado nos resumos (padrão: o modelo da consulta)
+            max_summaries: Número máximo de resumos mantidos em memória
+        """
+
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_model = summary_model
+        self.max_summaries = max(1, max_summaries)
+
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.summaries_generated = 0
+        self.summaries_reused = 0
+
+    @staticmethod
+    def _digest(messages: Sequence[Any]) -> str:
+        """Hash de uma sequência de mensagens (papel e conteúdo)"""
+        payload = json.dumps([(msg.role, msg.content) for msg in messages], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, text: str) -> int:
+        """Número de tokens de um texto"""
+        return len(self.tokenizer.encode(text))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Trunca um texto para no máximo max_tokens tokens"""
+        tokens = self.tokenizer.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.tokenizer.decode(tokens[:max(0, max_tokens - 3)]).rstrip() + " [...]"
+
+    def _cached_summary(self, key: str) -> Optional[str]:
+        """Resumo já gerado para as mensagens de hash key"""
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def _store_summary(self, key: str, summary: str) -> None:
+        """Guarda um resumo, descartando os menos usados"""
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+
+    def _generate_summary(self, previous: Optional[str], messages: Sequence[Any], model: str) -> str:
+        """
+        Pede ao LLM o resumo atualizado
+
+        Args:
+            previous: Resumo das mensagens anteriores (None se não houver)
+            messages: Mensagens a acrescentar ao resumo
+            model: Modelo usado no resumo
+
+        Returns:
+            Novo resumo
+        """
+
+        transcript = "\n\n".join(
+            f"{'Usuário' if msg.role == 'user' else 'Assistente'}: {self._truncate(msg.content, self.summary_max_tokens * 2)}"
+            for msg in messages
+        )
+        content = f"RESUMO ATUAL:\n{previous or '(vazio)'}\n\nNOVAS MENSAGENS:\n{transcript}"
+
+        response = openai.chat.completions.create(
+            model=self.summary_model or model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            temperature=0,
+            max_tokens=self.summary_max_tokens
+        )
+
+        with self._lock:
+            self.summaries_generated += 1
+        return response.choices[0].message.content.strip()
+
+    def _summarize(self, messages: Sequence[Any], model: str) -> Optional[str]:
+        """
+        Resumo acumulado de mensagens, reaproveitando o resumo da interação anterior
+
+        Returns:
+            Resumo ou None se não for possível gerá-lo
+        """
+
+        key = self._digest(messages)
+        summary = self._cached_summary(key)
+        if summary is not None:
+            with self._lock:
+                self.summaries_reused += 1
+            return summary
+
+        # Resumo da conversa até uma interação anterior (normalmente a última, já calculado);
+        # sem ele, resume apenas as mensagens mais recentes
+        previous, start = None, max(0, len(messages) - self.MAX_MESSAGES_PER_SUMMARY)
+        for size in range(len(messages) - 1, start, -1):
+            previous = self._cached_summary(self._digest(messages[:size]))
+            if previous is not None:
+                start = size
+                break
+
+        try:
+            summary = self._generate_summary(previous, messages[start:], model)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao resumir o histórico da conversa: {e}")
+            return previous
+
+        self._store_summary(key, summary)
+        return summary
+
+    def build_messages(self, history: Sequence[Any], model: str) -> List[Dict[str, str]]:
+        """
+        Monta as mensagens do histórico para o prompt
+
+        Args:
+            history: Mensagens anteriores à pergunta atual (ChatMessage), em ordem
+            model: Modelo da consulta (usado nos resumos se summary_model não for definido)
+
+        Returns:
+            Mensagens no formato da API, dentro de max_tokens tokens
+        """
+
+        history = [msg for msg in history if msg.role in ('user', 'assistant')]
+        if not history or self.max_tokens <= 0:
+            return []
+
+        verbatim = [{"role": msg.role, "content": msg.content} for msg in history]
+        if sum(self._count(msg['content']) for msg in verbatim) <= self.max_tokens:
+            return verbatim
+
+        # Última interação na íntegra; as anteriores viram resumo
+        last_user = max((i for i, msg in enumerate(history) if msg.role == 'user'), default=len(history) - 1)
+        older, recent = history[:last_user], history[last_user:]
+
+        messages = []
+        budget = self.max_tokens
+        if older:
+            summary = self._summarize(older, model)
+            if summary:
+                summary = self._truncate(summary, min(self.summary_max_tokens, budget // 2))
+                messages.append({"role": "system", "content": f"Resumo da conversa até aqui:\n{summary}"})
+                budget -= self._count(messages[0]['content'])
+
+        # Pergunta anterior completa; a resposta é truncada se necessário
+        for msg in recent:
+            content = self._truncate(msg.content, max(0, budget))
+            budget -= self._count(content)
+            if content:
+                messages.append({"role": msg.role, "content": content})
+
+        return messages
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso dos resumos"""
+        with self._lock:
+            entries = len(self._summaries)
+        return {
+            'summaries_generated': self.summaries_generated,
+            'summaries_reused': self.summaries_reused,
+            'entries': entries
+        }
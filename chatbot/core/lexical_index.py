@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Índice léxico (BM25) para o Chatbot ANTAQ
+Índice invertido persistido em SQLite sobre o texto dos chunks, com
+tokenização para português e remoção de acentos
+"""
+
+import re
+import math
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Palavras funcionais do português (já sem acentos), ignoradas na indexação
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em
+entre essa esse esta este isso isto ja la lhe mais mas me mesmo na nas nao nem no
+nos num numa o os ou para pela pelas pelo pelos por qual quais quando que quem se
+sem ser seu seus sua suas sobre tambem te tem ter um uma umas uns foi sao
+""".split())
+
+def fold_accents(text: str) -> str:
+    """Converte para minúsculas e remove acentos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokeniza um texto em português para o índice léxico
+
+    Números de normas ("2.240/2011") geram o token composto ("2240/2011")
+    e também suas partes ("2240", "2011"); separadores de milhar são
+    descartados.
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Lista de tokens (com repetições)
+    """
+
+    text = fold_accents(text)
+    tokens = []
+
+    for match in re.finditer(r'\d+(?:\.\d{3})*(?:/\d+)?|[a-z]+', text):
+        token = match.group().replace('.', '')
+        if token[0].isdigit():
+            tokens.append(token)
+            if '/' in token:
+                tokens.extend(token.split('/'))
+        elif len(token) > 1 and token not in STOPWORDS:
+            tokens.append(token)
+
+    return tokens
+
+class LexicalIndex:
+    """
+    Índice invertido BM25 persistido em SQLite
+
+    Atualizado incrementalmente a cada inserção/remoção de chunks; a busca
+    lê apenas as listas de postings dos termos da consulta, sem chamar a
+    API de embeddings. De cada termo são lidos no máximo
+    max_postings_per_term postings, os de maior frequência no chunk: termos
+    muito comuns ("resolucao", "antaq") não obrigam a percorrer a coleção.
+    """
+
+    def __init__(self, db_path: str, k1: float = 1.2, b: float = 0.75, max_postings_per_term: int = 2000):
+        """
+        Inicializa o índice
+
+        Args:
+            db_path: Caminho do arquivo SQLite
+            k1: Saturação da frequência do termo (BM25)
+            b: Normalização pelo tamanho do chunk (BM25)
+            max_postings_per_term: Postings lidos por termo da consulta (maiores tf primeiro)
+        """
+
+        self.db_path = Path(db_path)
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max(1, max_postings_per_term)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão com o banco, aberta (e o esquema criado) no primeiro uso"""
+
+        if self._connection is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema(conn)
+            self._connection = conn
+        return self._connection
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        """Cria as tabelas do índice, se ainda não existirem"""
+
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id TEXT NOT NULL UNIQUE,
+                    codigo_registro TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, chunk)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term_tf ON postings (term, tf DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_codigo ON chunks (codigo_registro)")
+
+    def _delete_chunks(self, chunk_ids: List[str]) -> None:
+        """Remove chunks e seus postings (chamado com o lock e a transação abertos)"""
+
+        for start in range(0, len(chunk_ids), 500):
+            lote = chunk_ids[start:start + 500]
+            placeholders = ','.join('?' * len(lote))
+            self._conn.execute(
+                f"DELETE FROM postings WHERE chunk IN (SELECT id FROM chunks WHERE chunk_id IN ({placeholders}))",
+                lote
+            )
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", lote)
+
+    def add(self, chunk_ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Indexa (ou reindexa) chunks
+
+        Args:
+            chunk_ids: Ids dos chunks no banco vetorial
+            documents: Texto dos chunks
+            metadatas: Metadados dos chunks (usa codigo_registro)
+        """
+
+        with self._lock, self._conn:
+            self._delete_chunks(list(chunk_ids))
+
+            for chunk_id, document, meta in zip(chunk_ids, documents, metadatas):
+                frequencies = Counter(tokenize(document))
+                cursor = self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, codigo_registro, length) VALUES (?, ?, ?)",
+                    (chunk_id, str((meta or {}).get('codigo_registro', '')), sum(frequencies.values()))
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk, tf) VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in frequencies.items()]
+                )
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        """Remove chunks do índice"""
+        with self._lock, self._conn:
+            self._delete_chunks(list(chunk_ids))
+
+    def clear(self) -> None:
+        """Remove todos os chunks do índice"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+
+    def count(self) -> int:
+        """Número de chunks indexados"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Busca BM25
+
+        Args:
+            query: Consulta do usuário
+            n_results: Número de resultados
+
+        Returns:
+            Lista de (id do chunk, score BM25), do maior para o menor
+        """
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        placeholders = ','.join('?' * len(terms))
+
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not total:
+                return []
+
+            # Frequência de cada termo contada só no índice, sem ler os chunks
+            document_frequency = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+                terms
+            ).fetchall())
+
+            # Postings de maior tf de cada termo (percorre idx_postings_term_tf)
+            rows = []
+            for term in document_frequency:
+                rows.extend(self._conn.execute(
+                    """
+                    SELECT p.term, p.chunk, p.tf, c.length
+                    FROM postings p JOIN chunks c ON c.id = p.chunk
+                    WHERE p.term = ?
+                    ORDER BY p.tf DESC
+                    LIMIT ?
+                    """,
+                    (term, self.max_postings_per_term)
+                ).fetchall())
+
+        avg_length = avg_length or 1.0
+
+        scores: Dict[int, float] = {}
+        for term, chunk, tf, length in rows:
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+            scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:n_results]
+        if not top:
+            return []
+
+        with self._lock:
+            ids = dict(self._conn.execute(
+                f"SELECT id, chunk_id FROM chunks WHERE id IN ({','.join('?' * len(top))})",
+                [chunk for chunk, _ in top]
+            ).fetchall())
+
+        return [(ids[chunk], score) for chunk, score in top if chunk in ids]
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Índice de referências de normas ANTAQ
+Mapeia identificadores normalizados (tipo, número, ano), extraídos do
+título, para o codigo_registro da norma
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tipos reconhecidos (forma sem acentos -> forma canônica); os mais longos primeiro
+TIPOS_REFERENCIA = [
+    ('resolucao normativa', 'Resolução Normativa'),
+    ('resolucao conjunta', 'Resolução Conjunta'),
+    ('instrucao normativa', 'Instrução Normativa'),
+    ('termo de autorizacao', 'Termo de Autorização'),
+    ('resolucao', 'Resolução'),
+    ('portaria', 'Portaria'),
+    ('deliberacao', 'Deliberação'),
+    ('acordao', 'Acórdão'),
+    ('decreto', 'Decreto'),
+    ('lei', 'Lei'),
+]
+
+_TIPOS = {folded: canonical for folded, canonical in TIPOS_REFERENCIA}
+
+_REFERENCIA = re.compile(
+    r'\b(' + '|'.join(folded.replace(' ', r'\s+') for folded, _ in TIPOS_REFERENCIA) + r')\b'
+    r'\s*(?:numero|n\s*[o°.]+)?\s*(\d[\d.]*)(?:\s*/\s*(\d{2,4})\b(?!\s*/\s*\d))?'
+)
+
+# Números "nº NNN/AAAA" sem tipo explícito; o "nº" é exigido para que datas
+# ("04/10/2011") não virem referências, e a barra seguinte descarta o resto de uma data
+_NUMERO_ANO = re.compile(r'\b(?:numero|n\s*[o°.]+)\s*(\d[\d.]*)\s*/\s*(\d{2,4})\b(?!\s*/\s*\d)')
+
+# Ano por extenso logo após o número ("-ANTAQ, DE 4 DE OUTUBRO DE 2011", "de 2011")
+_ANO_EXTENSO = re.compile(r'^(?:\s*-\s*antaq)?\s*,?\s*de\s+(?:\d{1,2}o?\s+de\s+[a-z]+\s+de\s+)?(\d{4})\b')
+
+def _fold(text: str) -> str:
+    """Minúsculas sem acentos"""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+def _normalizar_numero(numero: str) -> str:
+    """Remove separadores de milhar e zeros à esquerda"""
+    return numero.replace('.', '').lstrip('0') or '0'
+
+def _normalizar_ano(ano: Optional[str]) -> Optional[int]:
+    """Converte o ano para quatro dígitos (anos de dois dígitos > 50 são do século XX)"""
+    if not ano:
+        return None
+    valor = int(ano)
+    if valor < 100:
+        valor += 1900 if valor > 50 else 2000
+    return valor
+
+def extrair_referencias(texto: str) -> List[Tuple[Optional[str], str, Optional[int]]]:
+    """
+    Extrai referências a normas de um texto (título ou consulta)
+
+    Reconhece "Resolução nº 2.240/2011", "Portaria 5 de 2019",
+    "RESOLUÇÃO Nº 2240-ANTAQ, DE 4 DE OUTUBRO DE 2011" e números sem
+    tipo no formato "nº 2240/2011". Datas ("04/10/2011") são ignoradas.
+
+    Args:
+        texto: Texto original
+
+    Returns:
+        Lista de (tipo canônico ou None, número normalizado, ano ou None)
+    """
+
+    folded = _fold(texto)
+    referencias = []
+    ocupados = []
+
+    for match in _REFERENCIA.finditer(folded):
+        tipo = _TIPOS[re.sub(r'\s+', ' ', match.group(1))]
+        ano = match.group(3)
+        if not ano:
+            extenso = _ANO_EXTENSO.match(folded[match.end():match.end() + 60])
+            ano = extenso.group(1) if extenso else None
+        referencias.append((tipo, _normalizar_numero(match.group(2)), _normalizar_ano(ano)))
+        ocupados.append((match.start(), match.end()))
+
+    for match in _NUMERO_ANO.finditer(folded):
+        if any(inicio <= match.start() < fim for inicio, fim in ocupados):
+            continue
+        referencias.append((None, _normalizar_numero(match.group(1)), _normalizar_ano(match.group(2))))
+
+    return list(dict.fromkeys(referencias))
+
+# Artigos citados ("art. 5º", "artigo 10-A", "arts. 3º e 4º")
+_ARTIGO = re.compile(r'\bart(?:igo)?s?\.?\s*(\d+)\s*(?:[o°º](?![a-z]))?(?:\s*-\s*([a-z])\b)?((?:\s*(?:,|e)\s*\d+\s*(?:[o°º](?![a-z]))?)*)')
+
+def extrair_artigos(texto: str) -> List[str]:
+    """
+    Extrai os artigos citados em um texto
+
+    Args:
+        texto: Consulta do usuário
+
+    Returns:
+        Artigos normalizados ("5", "10-A"), sem repetição
+    """
+
+    artigos = []
+    for match in _ARTIGO.finditer(_fold(texto)):
+        artigo = _normalizar_numero(match.group(1))
+        artigos.append(f"{artigo}-{match.group(2).upper()}" if match.group(2) else artigo)
+        artigos.extend(_normalizar_numero(numero) for numero in re.findall(r'\d+', match.group(3)))
+    return list(dict.fromkeys(artigos))
+
+class NormaReferenceIndex:
+    """
+    Índice (tipo, número, ano) -> codigo_registro, persistido em JSON
+
+    Cada norma é indexada pela primeira referência do seu título; o ano
+    ausente no título é completado pela data de assinatura.
+    """
+
+    def __init__(self, path: str):
+        """
+        Inicializa o índice, carregando o arquivo persistido se existir
+
+        Args:
+            path: Caminho do arquivo JSON do índice
+        """
+
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.normas: Dict[str, Tuple[str, str, Optional[int]]] = {}
+        self._por_numero: Dict[str, List[str]] = {}
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        """Carrega o índice persistido"""
+
+        if not self.path.exists():
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.normas = {codigo: tuple(referencia) for codigo, referencia in data.items()}
+            self._reindexar()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Índice de referências ilegível em {self.path}: {e}")
+            self.normas = {}
+            self._reindexar()
+            return False
+
+    def _reindexar(self) -> None:
+        """Recria o mapa número -> normas"""
+        por_numero: Dict[str, List[str]] = {}
+        for codigo, (_, numero, _) in self.normas.items():
+            por_numero.setdefault(numero, []).append(codigo)
+        self._por_numero = por_numero
+
+    def save(self) -> None:
+        """Persiste o índice (escrita atômica)"""
+
+        with self._lock:
+            data = dict(self.normas)
+
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.loaded = True
+
+    def clear(self) -> None:
+        """Remove todas as normas do índice"""
+        with self._lock:
+            self.normas = {}
+            self._por_numero = {}
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Indexa as normas dos metadados de chunks informados
+
+        Args:
+            metadatas: Metadados de chunks (usa codigo_registro, titulo e assinatura)
+        """
+
+        with self._lock:
+            for meta in metadatas:
+                codigo = str(meta.get('codigo_registro', ''))
+                if not codigo or codigo in self.normas:
+                    continue
+
+                referencias = [r for r in extrair_referencias(meta.get('titulo', '')) if r[0]]
+                if not referencias:
+                    continue
+
+                tipo, numero, ano = referencias[0]
+                if ano is None and str(meta.get('assinatura', ''))[:4].isdigit():
+                    ano = int(str(meta['assinatura'])[:4])
+
+                self.normas[codigo] = (tipo, numero, ano)
+                self._por_numero.setdefault(numero, []).append(codigo)
+
+    def remove(self, codigos_registro: Iterable[str]) -> None:
+        """Remove normas do índice"""
+        with self._lock:
+            for codigo in codigos_registro:
+                self.normas.pop(str(codigo), None)
+            self._reindexar()
+
+    def lookup(self, tipo: Optional[str], numero: str, ano: Optional[int] = None) -> List[str]:
+        """
+        Busca normas por referência
+
+        O tipo "Resolução" também casa com "Resolução Normativa" e
+        "Resolução Conjunta"; tipo ou ano ausentes casam com qualquer valor.
+
+        Returns:
+            Códigos de registro das normas encontradas
+        """
+
+        with self._lock:
+            candidatos = list(self._por_numero.get(_normalizar_numero(numero), []))
+            normas = self.normas
+
+        encontrados = []
+        for codigo in candidatos:
+            tipo_norma, _, ano_norma = normas[codigo]
+            if tipo and not tipo_norma.startswith(tipo):
+                continue
+            if ano and ano_norma and ano != ano_norma:
+                continue
+            encontrados.append(codigo)
+
+        return encontrados
+
+    def resolve(self, texto: str) -> List[str]:
+        """
+        Resolve as referências a normas contidas em um texto
+
+        Uma referência sem ano só é resolvida se casar com uma única norma;
+        "Resolução 18" ambígua entre anos fica para a busca normal.
+
+        Args:
+            texto: Consulta do usuário
+
+        Returns:
+            Códigos de registro das normas referenciadas (sem repetição)
+        """
+
+        codigos = []
+        for tipo, numero, ano in extrair_referencias(texto):
+            encontrados = self.lookup(tipo, numero, ano)
+            if ano is None and len(encontrados) > 1:
+                continue
+            codigos.extend(encontrados)
+        return list(dict.fromkeys(codigos))
+
+    def __len__(self) -> int:
+        return len(self.normas)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Leitura em streaming do parquet de normas ANTAQ
+Lê primeiro apenas as colunas de filtro e depois o texto das normas
+selecionadas, lote a lote, mantendo o uso de memória constante
+"""
+
+import hashlib
+import logging
+from typing import List, Dict, Any, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class NormasParquetReader:
+    """
+    Leitor do parquet de normas com projeção de colunas e leitura em lotes
+    """
+
+    # Colunas lidas na varredura de filtros (além do tamanho de conteudo_pdf)
+    COLUNAS_FILTRO = ['codigo_registro', 'situacao', 'vetorizado', 'ultima_verificacao_vetorizacao']
+
+    # Colunas lidas para as normas selecionadas
+    COLUNAS_NORMA = [
+        'codigo_registro', 'titulo', 'autor', 'assunto', 'situacao', 'link_pdf',
+        'tipo_material', 'assinatura', 'publicacao', 'tamanho_pdf', 'paginas_extraidas',
+        'conteudo_pdf'
+    ]
+
+    # Colunas da impressão digital barata de cada norma (tudo menos o texto, substituído pelo tamanho)
+    COLUNAS_FINGERPRINT = [c for c in COLUNAS_NORMA if c != 'conteudo_pdf']
+
+    def __init__(self, parquet_path: str, batch_size: int = 256):
+        """
+        Inicializa o leitor
+
+        Args:
+            parquet_path: Caminho para o arquivo parquet
+            batch_size: Linhas lidas por lote
+        """
+
+        self.parquet_path = parquet_path
+        self.batch_size = batch_size
+        self.parquet_file = pq.ParquetFile(parquet_path)
+        self.columns = set(self.parquet_file.schema_arrow.names)
+
+    @classmethod
+    def content_hash(cls, row: Dict[str, Any]) -> str:
+        """
+        Hash do conteúdo de uma norma (texto e metadados lidos em COLUNAS_NORMA)
+
+        Args:
+            row: Valores da norma, como retornados por iter_normas
+
+        Returns:
+            Hash SHA-256 em hexadecimal
+        """
+
+        partes = [f"{c}={row[c]}" for c in cls.COLUNAS_NORMA if c in row]
+        return hashlib.sha256('\x1f'.join(partes).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def fingerprint(cls, row: Dict[str, Any], tamanho_conteudo: Optional[int] = None) -> str:
+        """
+        Impressão digital barata de uma norma: metadados e tamanho do texto
+
+        Serve para detectar, sem calcular o hash do texto, as normas que
+        certamente não mudaram; só as de impressão digital diferente têm o
+        conteúdo lido e o hash (content_hash) recalculado.
+
+        Args:
+            row: Valores da norma (ao menos COLUNAS_FINGERPRINT)
+            tamanho_conteudo: Tamanho de conteudo_pdf (padrão: calculado a partir de row)
+
+        Returns:
+            Hash SHA-256 em hexadecimal
+        """
+
+        if tamanho_conteudo is None:
+            tamanho_conteudo = len(row.get('conteudo_pdf') or '')
+        partes = [f"{c}={row[c]}" for c in cls.COLUNAS_FINGERPRINT if c in row]
+        partes.append(f"tamanho_conteudo={tamanho_conteudo}")
+        return hashlib.sha256('\x1f'.join(partes).encode('utf-8')).hexdigest()
+
+    def scan_filtros(self, com_fingerprint: bool = False) -> pd.DataFrame:
+        """
+        Lê apenas as colunas de filtro e o tamanho do conteúdo de cada norma
+
+        O texto de conteudo_pdf é lido lote a lote e descartado após o cálculo
+        do tamanho, de modo que nunca fique inteiro em memória.
+
+        Args:
+            com_fingerprint: Se deve calcular a impressão digital de cada norma ('fingerprint')
+
+        Returns:
+            DataFrame com as colunas de filtro, 'tamanho_conteudo' e a posição
+            da linha no arquivo ('_posicao')
+        """
+
+        colunas = [c for c in self.COLUNAS_FILTRO if c in self.columns]
+        ler_conteudo = 'conteudo_pdf' in self.columns
+        colunas_fingerprint = [c for c in self.COLUNAS_FINGERPRINT if c in self.columns] if com_fingerprint else []
+
+        colunas_lidas = list(dict.fromkeys(colunas + (['conteudo_pdf'] if ler_conteudo else []) + colunas_fingerprint))
+
+        partes = []
+        for batch in self.parquet_file.iter_batches(
+            batch_size=self.batch_size * 16,
+            columns=colunas_lidas
+        ):
+            parte = {c: batch.column(c) for c in colunas}
+            if ler_conteudo:
+                parte['tamanho_conteudo'] = pc.fill_null(pc.utf8_length(batch.column('conteudo_pdf')), 0)
+            else:
+                parte['tamanho_conteudo'] = pa.array(np.zeros(batch.num_rows, dtype=np.int64))
+            if com_fingerprint:
+                valores = [batch.column(c).to_pylist() for c in colunas_fingerprint]
+                tamanhos = parte['tamanho_conteudo'].to_pylist()
+                parte['fingerprint'] = pa.array([
+                    self.fingerprint(dict(zip(colunas_fingerprint, linha)), tamanho)
+                    for linha, tamanho in zip(zip(*valores), tamanhos)
+                ], type=pa.string())
+            partes.append(pa.table(parte))
+
+        if partes:
+            df = pa.concat_tables(partes).to_pandas()
+        else:
+            df = pd.DataFrame({c: [] for c in colunas + ['tamanho_conteudo'] + (['fingerprint'] if com_fingerprint else [])})
+
+        df['_posicao'] = np.arange(len(df), dtype=np.int64)
+        return df
+
+    def content_hashes(self, posicoes: Sequence[int]) -> Dict[str, str]:
+        """
+        Calcula o hash do conteúdo das linhas selecionadas (lendo o texto apenas delas)
+
+        Args:
+            posicoes: Posições das linhas (coluna '_posicao' de scan_filtros)
+
+        Returns:
+            Dicionário codigo_registro -> hash do conteúdo
+        """
+
+        return {
+            str(row['codigo_registro']): self.content_hash(row)
+            for row in self.iter_normas(posicoes)
+        }
+
+    def _row_groups_para(self, posicoes: np.ndarray) -> List[int]:
+        """Retorna os row groups que contêm alguma das posições selecionadas"""
+
+        row_groups = []
+        inicio = 0
+        for i in range(self.parquet_file.num_row_groups):
+            fim = inicio + self.parquet_file.metadata.row_group(i).num_rows
+            esquerda = np.searchsorted(posicoes, inicio, side='left')
+            if esquerda < len(posicoes) and posicoes[esquerda] < fim:
+                row_groups.append(i)
+            inicio = fim
+        return row_groups
+
+    def iter_normas(self, posicoes: Sequence[int], columns: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lê em streaming as linhas selecionadas, em ordem de arquivo
+
+        Args:
+            posicoes: Posições das linhas (coluna '_posicao' de scan_filtros)
+            columns: Colunas a ler (padrão: COLUNAS_NORMA presentes no arquivo)
+
+        Yields:
+            Dicionário com os valores de cada norma selecionada
+        """
+
+        posicoes = np.unique(np.asarray(posicoes, dtype=np.int64))
+        if len(posicoes) == 0:
+            return
+
+        columns = [c for c in (columns or self.COLUNAS_NORMA) if c in self.columns]
+        row_groups = self._row_groups_para(posicoes)
+
+        # Posição global da primeira linha de cada row group lido
+        inicios = np.cumsum([0] + [
+            self.parquet_file.metadata.row_group(i).num_rows
+            for i in range(self.parquet_file.num_row_groups)
+        ])
+
+        for row_group in row_groups:
+            offset = int(inicios[row_group])
+            for batch in self.parquet_file.iter_batches(
+                batch_size=self.batch_size,
+                row_groups=[row_group],
+                columns=columns
+            ):
+                fim = offset + batch.num_rows
+                esquerda = np.searchsorted(posicoes, offset, side='left')
+                direita = np.searchsorted(posicoes, fim, side='left')
+
+                if direita > esquerda:
+                    selecionadas = batch.take(pa.array(posicoes[esquerda:direita] - offset))
+                    for row in selecionadas.to_pylist():
+                        yield row
+
+                offset = fim
@@ -5,18 +5,32 @@ Integra busca semântica com geração de respostas via OpenAI
 """
 
 import openai
-from typing import List, Dict, Any, Optional, Tuple
-import json
+import tiktoken
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+import time
 import logging
 from datetime import datetime
 import re
 from dataclasses import dataclass
 from .vector_store import VectorStoreANTAQ
+from .norma_reference import extrair_artigos
+from .answer_cache import AnswerCache
+from .history_manager import ConversationHistoryManager
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Resposta quando nenhum documento relevante é encontrado
+NO_RESULTS_RESPONSE = """
+Desculpe, não encontrei documentos relevantes para sua consulta na base de normas da ANTAQ. 
+
+Algumas sugestões:
+• Tente reformular sua pergunta com termos mais específicos
+• Verifique se está perguntando sobre temas relacionados a transporte aquaviário
+• Use palavras-chave como: licenciamento, tarifas, portos, navegação, etc.
+""".strip()
+
 @dataclass
 class ChatMessage:
     """Representa uma mensagem no chat"""
@@ -34,15 +48,35 @@ class ChatMessage:
 class RAGSystemANTAQ:
     """
     Sistema RAG principal para consultas sobre normas ANTAQ
+    
+    Uma instância pode ser compartilhada por várias sessões: ela não guarda
+    conversas, e cada sessão passa seu próprio histórico (e, opcionalmente,
+    o modelo) a query()/query_stream().
     """
     
+    # Separador entre normas no contexto
+    CONTEXT_SEPARATOR = "\n\n---\n\n"
+    
+    # Marcador de trecho omitido (entre chunks não consecutivos e no fim de chunks truncados)
+    OMISSION_MARKER = "\n[...]\n"
+    
+    # Espaço mínimo (tokens) para incluir um chunk truncado no contexto
+    MIN_CONTEXT_CHUNK_TOKENS = 100
+    
     def __init__(
         self,
         openai_api_key: str,
         vector_store: VectorStoreANTAQ,
         model: str = "gpt-4",
         max_context_length: int = 8000,
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        enable_cache: bool = True,
+        cache_ttl: int = 3600,
+        cache_dir: Optional[str] = None,
+        cache_size_mb: int = 256,
+        cache_similarity_threshold: Optional[float] = None,
+        history_max_tokens: int = 2000,
+        history_summary_model: Optional[str] = None
     ):
         """
         Inicializa o sistema RAG
@@ -51,8 +85,16 @@ class RAGSystemANTAQ:
             openai_api_key: Chave da API OpenAI
             vector_store: Instância do banco vetorial
             model: Modelo GPT a usar
-            max_context_length: Comprimento máximo do contexto
+            max_context_length: Orçamento de tokens para os documentos do contexto
             temperature: Temperatura para geração
+            enable_cache: Se deve reutilizar respostas de perguntas repetidas
+            cache_ttl: Tempo de vida (segundos) das respostas no cache
+            cache_dir: Diretório do cache de respostas (padrão: <persist_directory>/answer_cache)
+            cache_size_mb: Tamanho máximo do cache de respostas em MB
+            cache_similarity_threshold: Similaridade mínima entre consultas para reutilizar
+                a resposta de uma pergunta parecida (None: apenas perguntas idênticas)
+            history_max_tokens: Orçamento de tokens do histórico da conversa no prompt
+            history_summary_model: Modelo usado para resumir interações antigas (padrão: o da consulta)
         """
         
         self.openai_api_key = openai_api_key
@@ -63,8 +105,28 @@ class RAGSystemANTAQ:
         self.max_context_length = max_context_length
         self.temperature = temperature
         
-        # Histórico da conversa
-        self.conversation_history: List[ChatMessage] = []
+        # Tokenizer do modelo, para respeitar max_context_length
+        try:
+            self.tokenizer = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        
+        # Histórico enviado ao LLM: limitado por tokens, com resumo das interações antigas
+        self.history_manager = ConversationHistoryManager(
+            self.tokenizer,
+            max_tokens=history_max_tokens,
+            summary_model=history_summary_model
+        )
+        
+        # Cache de respostas (invalidado quando a versão da coleção muda)
+        self.answer_cache = None
+        if enable_cache:
+            self.answer_cache = AnswerCache(
+                cache_dir or str(vector_store.persist_directory / "answer_cache"),
+                ttl=cache_ttl,
+                size_limit_mb=cache_size_mb,
+                similarity_threshold=cache_similarity_threshold
+            )
         
         logger.info(f"Sistema RAG inicializado com modelo: {model}")
     
@@ -140,10 +202,44 @@ Responda sempre em português brasileiro e seja preciso nas citações."""
         return {
             'categories': categories,
             'temporal_info': temporal_info,
+            'date_range': self._extract_date_range(query_lower),
             'query_type': self._classify_query_type(query_lower),
             'entities': self._extract_entities(query)
         }
     
+    def _extract_date_range(self, query: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """
+        Extrai da consulta o intervalo de anos de assinatura desejado
+        
+        Anos que fazem parte do número de uma norma ("2240/2011") são ignorados.
+        
+        Args:
+            query: Consulta do usuário (minúsculas)
+            
+        Returns:
+            Tupla (ano inicial, ano final), com None para limite aberto, ou None se não houver anos
+        """
+        
+        years = [int(year) for year in re.findall(r'(?<![\d/.])((?:19|20)\d{2})\b', query)]
+        if not years:
+            return None
+        
+        entre = re.search(r'\bentre\s+(?:[a-zç]+\s+)*?((?:19|20)\d{2})\s+e\s+((?:19|20)\d{2})\b', query)
+        if entre:
+            inicio, fim = sorted((int(entre.group(1)), int(entre.group(2))))
+            return inicio, fim
+        
+        limite = re.search(r'\b(a partir de|desde|após|apos|depois de|antes de|até|ate)\s+(?:o\s+ano\s+de\s+)?((?:19|20)\d{2})\b', query)
+        if limite:
+            year = int(limite.group(2))
+            return {
+                'a partir de': (year, None), 'desde': (year, None),
+                'após': (year + 1, None), 'apos': (year + 1, None), 'depois de': (year + 1, None),
+                'antes de': (None, year - 1), 'até': (None, year), 'ate': (None, year),
+            }[limite.group(1)]
+        
+        return min(years), max(years)
+    
     def _classify_query_type(self, query: str) -> str:
         """Classifica o tipo de consulta"""
         
@@ -244,48 +340,136 @@ Responda sempre em português brasileiro e seja preciso nas citações."""
         # Re-ordenar por relevância
         return sorted(results, key=lambda x: x['relevance_score'], reverse=True)
     
-    def _format_context(self, results: List[Dict[str, Any]]) -> str:
+    @staticmethod
+    def _merge_adjacent(previous: str, following: str) -> str:
         """
-        Formata o contexto para o prompt do LLM
+        Junta dois chunks consecutivos de uma norma sem repetir a sobreposição
         
         Args:
-            results: Resultados da busca
+            previous: Texto do chunk anterior
+            following: Texto do chunk seguinte
             
         Returns:
-            Contexto formatado
+            Texto combinado
+        """
+        
+        probe = following[:20]
+        position = previous.find(probe) if probe else -1
+        while position != -1:
+            if following.startswith(previous[position:]):
+                return previous + following[len(previous) - position:]
+            position = previous.find(probe, position + 1)
+        
+        return previous + "\n" + following
+    
+    def _format_header(self, metadata: Dict[str, Any]) -> str:
+        """Cabeçalho de uma norma no contexto (campos ausentes são omitidos)"""
+        
+        def field(name: str) -> Optional[str]:
+            value = metadata.get(name)
+            return str(value) if value not in (None, '', 'N/A') else None
+        
+        lines = [field('titulo') or 'Norma sem título']
+        lines.append(' | '.join(
+            f"{label}: {value}" for label, value in (
+                ('Código', field('codigo_registro')),
+                ('Assinatura', field('assinatura')),
+                ('Situação', field('situacao'))
+            ) if value
+        ))
+        if field('assunto'):
+            lines.append(f"Assunto: {field('assunto')}")
+        if field('link_pdf'):
+            lines.append(f"Link: {field('link_pdf')}")
+        
+        return '\n'.join(line for line in lines if line)
+    
+    def _format_context(self, results: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Formata o contexto para o prompt do LLM, dentro de max_context_length tokens
+        
+        Os chunks entram em ordem de relevância enquanto couberem no orçamento;
+        o primeiro que não couber é truncado (se sobrar espaço útil) e os
+        demais são descartados. Os chunks escolhidos são agrupados por norma,
+        com um único cabeçalho, e chunks consecutivos são unidos sem repetir
+        a sobreposição.
+        
+        Args:
+            results: Resultados da busca (já re-ranqueados)
+            
+        Returns:
+            Tupla (contexto formatado, estatísticas: tokens, chunks usados, truncados e descartados)
         """
         
         if not results:
-            return "Nenhum documento relevante encontrado."
+            return "Nenhum documento relevante encontrado.", {
+                'context_tokens': 0, 'context_chunks': 0, 'context_chunks_truncated': 0, 'context_chunks_dropped': 0
+            }
         
-        context_parts = []
+        ranked = sorted(results, key=lambda r: r.get('relevance_score', r['similarity']), reverse=True)
+        budget = self.max_context_length
+        separator_tokens = len(self.tokenizer.encode(self.CONTEXT_SEPARATOR))
+        marker_tokens = len(self.tokenizer.encode(self.OMISSION_MARKER))
         
-        for i, result in enumerate(results, 1):
+        normas: Dict[str, Dict[str, Any]] = {}
+        truncated = dropped = 0
+        
+        for result in ranked:
             metadata = result['metadata']
+            codigo = str(metadata.get('codigo_registro', result.get('id', '')))
             
-            context_part = f"""
-DOCUMENTO {i}:
-Título: {metadata.get('titulo', 'N/A')}
-Código: {metadata.get('codigo_registro', 'N/A')}
-Assunto: {metadata.get('assunto', 'N/A')}
-Data de Assinatura: {metadata.get('assinatura', 'N/A')}
-Situação: {metadata.get('situacao', 'N/A')}
-Link: {metadata.get('link_pdf', 'N/A')}
-Relevância: {result.get('relevance_score', result['similarity']):.3f}
-
-CONTEÚDO:
-{result['document']}
-            """.strip()
+            cost = marker_tokens
+            if codigo not in normas:
+                header = f"DOCUMENTO {len(normas) + 1}: {self._format_header(metadata)}\n\n"
+                cost += len(self.tokenizer.encode(header)) + separator_tokens
             
-            context_parts.append(context_part)
+            tokens = self.tokenizer.encode(result['document'])
+            text = result['document']
+            available = budget - cost
+            
+            if len(tokens) > available:
+                if available < self.MIN_CONTEXT_CHUNK_TOKENS:
+                    dropped += 1
+                    continue
+                tokens = tokens[:available - marker_tokens]
+                text = self.tokenizer.decode(tokens).rstrip() + self.OMISSION_MARKER.rstrip()
+                truncated += 1
+            
+            if codigo not in normas:
+                normas[codigo] = {'header': header, 'chunks': []}
+            normas[codigo]['chunks'].append((metadata.get('chunk_index', 0), text))
+            budget -= cost + len(tokens)
         
-        return "\n\n" + "="*80 + "\n\n".join(context_parts)
+        parts = []
+        for norma in normas.values():
+            sections = []
+            last_index = None
+            for chunk_index, text in sorted(norma['chunks'], key=lambda x: x[0]):
+                if last_index is not None and chunk_index == last_index + 1:
+                    sections[-1] = self._merge_adjacent(sections[-1], text)
+                else:
+                    sections.append(text)
+                last_index = chunk_index
+            
+            parts.append(norma['header'] + self.OMISSION_MARKER.join(sections))
+        
+        context = self.CONTEXT_SEPARATOR.join(parts)
+        stats = {
+            'context_tokens': len(self.tokenizer.encode(context)),
+            'context_chunks': sum(len(norma['chunks']) for norma in normas.values()),
+            'context_chunks_truncated': truncated,
+            'context_chunks_dropped': dropped
+        }
+        logger.info(f"📄 Contexto: {stats['context_tokens']} tokens, {stats['context_chunks']} chunks de {len(normas)} normas ({dropped} descartados)")
+        
+        return context, stats
     
     def _create_prompt(
         self, 
         query: str, 
         context: str, 
-        conversation_history: List[ChatMessage]
+        conversation_history: List[ChatMessage],
+        model: Optional[str] = None
     ) -> List[Dict[str, str]]:
         """
         Cria o prompt completo para o LLM
@@ -293,7 +477,8 @@ CONTEÚDO:
         Args:
             query: Consulta do usuário
             context: Contexto dos documentos relevantes
-            conversation_history: Histórico da conversa
+            conversation_history: Mensagens anteriores à pergunta atual
+            model: Modelo da consulta (usado no resumo do histórico)
             
         Returns:
             Lista de mensagens formatadas para a API
@@ -303,14 +488,8 @@ CONTEÚDO:
             {"role": "system", "content": self._create_system_prompt()}
         ]
         
-        # Adicionar histórico recente (últimas 3 interações)
-        recent_history = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
-        
-        for msg in recent_history:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        # Adicionar histórico dentro do orçamento de tokens (interações antigas resumidas)
+        messages.extend(self.history_manager.build_messages(conversation_history, model or self.model))
         
         # Adicionar contexto e consulta atual
         user_message = f"""
@@ -331,56 +510,278 @@ Cite sempre as fontes específicas (título e código do documento) ao elaborar
         
         return messages
     
+    def _retrieve(
+        self, 
+        user_query: str, 
+        n_results: int, 
+        filters: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Analisa a consulta e recupera os chunks relevantes
+        
+        Args:
+            user_query: Pergunta do usuário
+            n_results: Número de documentos para contexto
+            filters: Filtros para a busca
+            
+        Returns:
+            Dicionário com a intenção, os resultados e o caminho de recuperação usado
+        """
+        
+        # Analisar intenção da consulta
+        intent = self._extract_query_intent(user_query)
+        logger.info(f"Intenção detectada: {intent}")
+        
+        # Referência explícita a uma norma: buscar só dentro das normas citadas
+        referenced_normas = []
+        if intent['entities']:
+            referenced_normas = self.vector_store.find_normas_by_reference(user_query)
+        
+        search_results = []
+        referenced_articles = []
+        if referenced_normas:
+            logger.info(f"📌 Normas referenciadas na consulta: {referenced_normas}")
+            referenced_articles = extrair_artigos(user_query)
+            search_results = self.vector_store.search_normas(
+                user_query,
+                referenced_normas,
+                n_results=n_results,
+                filters=filters,
+                artigos=referenced_articles
+            )
+        retrieval_path = 'reference' if search_results else 'search'
+        
+        # Busca semântica, restrita ao período citado na consulta (se houver)
+        date_range = None
+        if not search_results:
+            if intent['date_range'] and not any(key.endswith('_ts') or key.startswith('ano_') for key in (filters or {})):
+                date_range = intent['date_range']
+                search_results = self.vector_store.search(
+                    query=user_query,
+                    n_results=n_results,
+                    filters={**(filters or {}), **self.vector_store.date_range_filter(*date_range)}
+                )
+                if not search_results:
+                    logger.info(f"📅 Nenhum resultado no período {date_range}; buscando sem filtro de data")
+                    date_range = None
+            
+            if not search_results:
+                search_results = self.vector_store.search(
+                    query=user_query,
+                    n_results=n_results,
+                    filters=filters
+                )
+        
+        return {
+            'intent': intent,
+            'results': search_results,
+            'retrieval_path': retrieval_path,
+            'date_range': date_range,
+            'referenced_normas': referenced_normas,
+            'referenced_articles': referenced_articles
+        }
+    
+    def _build_sources(self, reranked_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prepara a lista de fontes exibida com a resposta (top 5)"""
+        
+        sources = []
+        for result in reranked_results[:5]:  # Top 5 fontes
+            metadata = result['metadata']
+            sources.append({
+                'titulo': metadata.get('titulo', 'N/A'),
+                'codigo_registro': metadata.get('codigo_registro', 'N/A'),
+                'assunto': metadata.get('assunto', 'N/A'),
+                'situacao': metadata.get('situacao', 'N/A'),
+                'assinatura': metadata.get('assinatura', 'N/A'),
+                'link_pdf': metadata.get('link_pdf', 'N/A'),
+                'relevance_score': result.get('relevance_score', result['similarity'])
+            })
+        
+        return sources
+    
+    def _build_metadata(
+        self, 
+        retrieval: Dict[str, Any], 
+        reranked_results: List[Dict[str, Any]], 
+        context_stats: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Metadados da resposta (intenção, recuperação, contexto e modelo)"""
+        
+        return {
+            **(context_stats or {}),
+            'intent': retrieval['intent'],
+            'search_results_count': len(retrieval['results']),
+            'reranked_results_count': len(reranked_results),
+            'retrieval_path': retrieval['retrieval_path'],
+            'date_range': retrieval['date_range'],
+            'collection': self.vector_store.active_collection_name,
+            'referenced_normas': retrieval['referenced_normas'],
+            'referenced_articles': retrieval['referenced_articles'],
+            'model_used': model or self.model,
+            'temperature': self.temperature,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _cache_model(self, model: str) -> str:
+        """Modelo e parâmetros de geração que identificam uma resposta no cache"""
+        return f"{model}@{self.temperature}"
+    
+    def _lookup_cached_answer(
+        self,
+        user_query: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]],
+        history: List[ChatMessage],
+        model: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Consulta o cache de respostas, antes da recuperação
+        
+        O nível exato é chaveado pela consulta, pelo modelo, pelos parâmetros
+        da busca e pelo histórico enviado ao LLM (a versão da coleção entra
+        no cache). Perguntas parecidas só são comparadas no início da
+        conversa e sem números: referências a normas, artigos e anos mudam a
+        resposta mesmo quando os embeddings são quase idênticos.
+        
+        Args:
+            user_query: Pergunta do usuário
+            n_results: Número de documentos para contexto
+            filters: Filtros para a busca
+            history: Histórico enviado ao LLM (termina na pergunta atual)
+            model: Modelo GPT da consulta
+        
+        Returns:
+            Estado do cache ('version', 'key', 'embedding', 'scope', 'answer' e 'level') ou None se desativado
+        """
+        
+        if self.answer_cache is None:
+            return None
+        
+        try:
+            version = self.vector_store.get_collection_version()
+        except Exception as e:
+            logger.warning(f"⚠️ Versão da coleção indisponível; cache de respostas ignorado: {e}")
+            return None
+        
+        params = {'n_results': n_results, 'filters': filters, 'mode': self.vector_store.retrieval_mode}
+        state = {
+            'version': version,
+            'key': self.answer_cache.make_key(
+                user_query,
+                self._cache_model(model),
+                [(msg.role, msg.content) for msg in history[:-1]],
+                **params
+            ),
+            'scope': None
+        }
+        
+        if self.answer_cache.similarity_threshold is not None and len(history) <= 1 and not re.search(r'\d', user_query):
+            state['scope'] = self.answer_cache.make_scope(self._cache_model(model), **params)
+        
+        state['answer'], state['level'], state['embedding'] = self.answer_cache.lookup(
+            state['key'], version, state['scope'], lambda: self.vector_store.embed_query(user_query)
+        )
+        if state['level'] == 'exact':
+            logger.info("⚡ Resposta reutilizada do cache")
+        elif state['level'] == 'semantic':
+            logger.info(f"⚡ Resposta reutilizada de pergunta parecida (similaridade {state['answer']['similarity']:.3f})")
+        
+        return state
+    
+    def _cached_response(self, cached: Dict[str, Any], level: str) -> Dict[str, Any]:
+        """Monta a resposta a partir de uma entrada do cache"""
+        
+        metadata = {**cached['metadata'], 'cache': level, 'timestamp': datetime.now().isoformat()}
+        if 'similarity' in cached:
+            metadata['cache_similarity'] = cached['similarity']
+        
+        return {
+            'response': cached['response'],
+            'sources': cached['sources'],
+            'metadata': metadata
+        }
+    
+    def _store_answer(
+        self,
+        cache_state: Optional[Dict[str, Any]],
+        response: Dict[str, Any]
+    ) -> None:
+        """Grava uma resposta gerada pelo LLM no cache"""
+        
+        if cache_state is None:
+            return
+        
+        try:
+            self.answer_cache.set(
+                cache_state['key'],
+                response,
+                cache_state['version'],
+                embedding=cache_state['embedding'],
+                scope=cache_state['scope']
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao gravar resposta no cache: {e}")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Obtém estatísticas do cache de respostas (acertos por nível e tamanho)"""
+        if self.answer_cache is None:
+            return {'enabled': False}
+        
+        return {'enabled': True, **self.answer_cache.get_stats()}
+    
     def query(
         self, 
         user_query: str, 
+        history: List[ChatMessage],
         n_results: int = 8,
         filters: Optional[Dict[str, Any]] = None,
-        include_history: bool = True
+        include_history: bool = True,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Processa uma consulta do usuário
         
         Args:
             user_query: Pergunta do usuário
+            history: Histórico da sessão, lido e atualizado pela consulta ([] inicia uma conversa)
             n_results: Número de documentos para contexto
             filters: Filtros para a busca
             include_history: Se deve incluir histórico da conversa
+            model: Modelo GPT desta consulta (padrão: o da instância)
             
         Returns:
             Resposta estruturada com metadados
         """
         
+        model = model or self.model
+        conversation = history
+        
         try:
             # Adicionar mensagem do usuário ao histórico
             user_message = ChatMessage(role="user", content=user_query)
             if include_history:
-                self.conversation_history.append(user_message)
+                conversation.append(user_message)
+            prompt_history = conversation if include_history else [user_message]
             
-            # Analisar intenção da consulta
-            intent = self._extract_query_intent(user_query)
-            logger.info(f"Intenção detectada: {intent}")
+            # Pergunta já respondida (ou parecida): dispensa recuperação e LLM
+            cache_state = self._lookup_cached_answer(user_query, n_results, filters, prompt_history, model)
+            if cache_state and cache_state['answer'] is not None:
+                cached = self._cached_response(cache_state['answer'], cache_state['level'])
+                if include_history:
+                    conversation.append(ChatMessage(role="assistant", content=cached['response']))
+                return cached
             
-            # Busca semântica
-            search_results = self.vector_store.search(
-                query=user_query,
-                n_results=n_results,
-                filters=filters
-            )
+            retrieval = self._retrieve(user_query, n_results, filters)
+            intent = retrieval['intent']
+            search_results = retrieval['results']
             
             if not search_results:
-                response_content = """
-Desculpe, não encontrei documentos relevantes para sua consulta na base de normas da ANTAQ. 
-
-Algumas sugestões:
-• Tente reformular sua pergunta com termos mais específicos
-• Verifique se está perguntando sobre temas relacionados a transporte aquaviário
-• Use palavras-chave como: licenciamento, tarifas, portos, navegação, etc.
-                """.strip()
+                response_content = NO_RESULTS_RESPONSE
                 
                 assistant_message = ChatMessage(role="assistant", content=response_content)
                 if include_history:
-                    self.conversation_history.append(assistant_message)
+                    conversation.append(assistant_message)
                 
                 return {
                     'response': response_content,
@@ -388,7 +789,7 @@ Algumas sugestões:
                     'metadata': {
                         'intent': intent,
                         'search_results_count': 0,
-                        'model_used': self.model
+                        'model_used': model
                     }
                 }
             
@@ -396,18 +797,19 @@ Algumas sugestões:
             reranked_results = self._rerank_results(user_query, search_results, intent)
             
             # Preparar contexto
-            context = self._format_context(reranked_results)
+            context, context_stats = self._format_context(reranked_results)
             
             # Criar prompt
             messages = self._create_prompt(
                 user_query, 
                 context, 
-                self.conversation_history if include_history else []
+                prompt_history[:-1],
+                model
             )
             
             # Gerar resposta
             response = openai.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=messages,
                 temperature=self.temperature,
                 max_tokens=1500
@@ -426,34 +828,16 @@ Algumas sugestões:
             )
             
             if include_history:
-                self.conversation_history.append(assistant_message)
-            
-            # Preparar fontes
-            sources = []
-            for result in reranked_results[:5]:  # Top 5 fontes
-                metadata = result['metadata']
-                sources.append({
-                    'titulo': metadata.get('titulo', 'N/A'),
-                    'codigo_registro': metadata.get('codigo_registro', 'N/A'),
-                    'assunto': metadata.get('assunto', 'N/A'),
-                    'situacao': metadata.get('situacao', 'N/A'),
-                    'assinatura': metadata.get('assinatura', 'N/A'),
-                    'link_pdf': metadata.get('link_pdf', 'N/A'),
-                    'relevance_score': result.get('relevance_score', result['similarity'])
-                })
+                conversation.append(assistant_message)
             
-            return {
+            result = {
                 'response': response_content,
-                'sources': sources,
-                'metadata': {
-                    'intent': intent,
-                    'search_results_count': len(search_results),
-                    'reranked_results_count': len(reranked_results),
-                    'model_used': self.model,
-                    'temperature': self.temperature,
-                    'timestamp': datetime.now().isoformat()
-                }
+                'sources': self._build_sources(reranked_results),
+                'metadata': self._build_metadata(retrieval, reranked_results, context_stats, model)
             }
+            self._store_answer(cache_state, result)
+            
+            return result
             
         except Exception as e:
             logger.error(f"Erro ao processar consulta: {e}")
@@ -471,38 +855,170 @@ Algumas sugestões:
                 }
             }
     
-    def clear_history(self):
-        """Limpa o histórico da conversa"""
-        self.conversation_history = []
-        logger.info("Histórico da conversa limpo")
-    
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Retorna o histórico da conversa"""
-        return [
-            {
-                'role': msg.role,
-                'content': msg.content,
-                'timestamp': msg.timestamp.isoformat(),
-                'metadata': msg.metadata
-            }
-            for msg in self.conversation_history
-        ]
-    
-    def export_conversation(self, filepath: str):
-        """Exporta conversa para arquivo JSON"""
+    def query_stream(
+        self, 
+        user_query: str, 
+        history: List[ChatMessage],
+        n_results: int = 8,
+        filters: Optional[Dict[str, Any]] = None,
+        include_history: bool = True,
+        model: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Processa uma consulta do usuário transmitindo a resposta à medida que é gerada
+        
+        Eventos produzidos, em ordem:
+        • {'type': 'retrieval', 'sources': [...], 'search_results_count': N}
+        • {'type': 'token', 'content': '...'} para cada trecho da resposta
+        • {'type': 'done', 'response': '...', 'sources': [...], 'metadata': {...}}
+        
+        O evento final tem o mesmo formato do retorno de query(); em caso
+        de erro, ele traz metadata['error'].
+        
+        Args:
+            user_query: Pergunta do usuário
+            history: Histórico da sessão, lido e atualizado pela consulta ([] inicia uma conversa)
+            n_results: Número de documentos para contexto
+            filters: Filtros para a busca
+            include_history: Se deve incluir histórico da conversa
+            model: Modelo GPT desta consulta (padrão: o da instância)
+            
+        Yields:
+            Eventos da resposta
+        """
+        
+        start_time = time.perf_counter()
+        response_parts: List[str] = []
+        
+        model = model or self.model
+        conversation = history
+        
         try:
-            history = self.get_conversation_history()
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'conversation': history,
-                    'export_timestamp': datetime.now().isoformat(),
-                    'total_messages': len(history)
-                }, f, ensure_ascii=False, indent=2)
+            # Adicionar mensagem do usuário ao histórico
+            user_message = ChatMessage(role="user", content=user_query)
+            if include_history:
+                conversation.append(user_message)
+            prompt_history = conversation if include_history else [user_message]
+            
+            # Pergunta já respondida (ou parecida): dispensa recuperação e LLM
+            cache_state = self._lookup_cached_answer(user_query, n_results, filters, prompt_history, model)
+            if cache_state and cache_state['answer'] is not None:
+                yield from self._replay_cached(self._cached_response(cache_state['answer'], cache_state['level']), conversation if include_history else None)
+                return
+            
+            retrieval = self._retrieve(user_query, n_results, filters)
+            intent = retrieval['intent']
+            search_results = retrieval['results']
+            
+            if not search_results:
+                yield {'type': 'retrieval', 'sources': [], 'search_results_count': 0}
+                yield {'type': 'token', 'content': NO_RESULTS_RESPONSE}
+                
+                if include_history:
+                    conversation.append(ChatMessage(role="assistant", content=NO_RESULTS_RESPONSE))
+                
+                yield {
+                    'type': 'done',
+                    'response': NO_RESULTS_RESPONSE,
+                    'sources': [],
+                    'metadata': {
+                        'intent': intent,
+                        'search_results_count': 0,
+                        'model_used': model
+                    }
+                }
+                return
+            
+            # Re-ranquear resultados e anunciar as fontes antes da geração
+            reranked_results = self._rerank_results(user_query, search_results, intent)
+            sources = self._build_sources(reranked_results)
+            
+            yield {'type': 'retrieval', 'sources': sources, 'search_results_count': len(search_results)}
+            
+            context, context_stats = self._format_context(reranked_results)
+            messages = self._create_prompt(
+                user_query, 
+                context, 
+                prompt_history[:-1],
+                model
+            )
+            
+            # Gerar resposta em streaming
+            stream = openai.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=1500,
+                stream=True
+            )
             
-            logger.info(f"Conversa exportada para: {filepath}")
+            time_to_first_token = None
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start_time
+                response_parts.append(delta)
+                yield {'type': 'token', 'content': delta}
+            
+            response_content = ''.join(response_parts)
+            
+            if include_history:
+                conversation.append(ChatMessage(
+                    role="assistant", 
+                    content=response_content,
+                    metadata={
+                        'sources_used': len(reranked_results),
+                        'intent': intent
+                    }
+                ))
+            
+            metadata = self._build_metadata(retrieval, reranked_results, context_stats, model)
+            self._store_answer(cache_state, {'response': response_content, 'sources': sources, 'metadata': dict(metadata)})
+            metadata['time_to_first_token'] = time_to_first_token
+            metadata['total_time'] = time.perf_counter() - start_time
+            
+            yield {
+                'type': 'done',
+                'response': response_content,
+                'sources': sources,
+                'metadata': metadata
+            }
             
         except Exception as e:
-            logger.error(f"Erro ao exportar conversa: {e}")
+            logger.error(f"Erro ao processar consulta: {e}")
+            import traceback
+            traceback.print_exc()
+            
+            error_response = f"Desculpe, ocorreu um erro ao processar sua consulta: {str(e)}"
+            
+            yield {
+                'type': 'done',
+                'response': ''.join(response_parts) or error_response,
+                'sources': [],
+                'metadata': {
+                    'error': str(e),
+                    'timestamp': datetime.now().isoformat()
+                }
+            }
+    
+    def _replay_cached(
+        self, 
+        cached: Dict[str, Any], 
+        conversation: Optional[List[ChatMessage]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Emite uma resposta do cache como eventos de query_stream (um único trecho)"""
+        
+        if conversation is not None:
+            conversation.append(ChatMessage(role="assistant", content=cached['response']))
+        
+        cached['metadata']['time_to_first_token'] = 0.0
+        cached['metadata']['total_time'] = 0.0
+        
+        yield {'type': 'retrieval', 'sources': cached['sources'], 'search_results_count': cached['metadata'].get('search_results_count', 0)}
+        yield {'type': 'token', 'content': cached['response']}
+        yield {'type': 'done', **cached}
 
 if __name__ == "__main__":
     # Teste básico
@@ -524,7 +1040,7 @@ if __name__ == "__main__":
     test_query = "Como funciona o licenciamento de terminais portuários?"
     
     print(f"🔍 Testando consulta: {test_query}")
-    result = rag_system.query(test_query)
+    result = rag_system.query(test_query, history=[])
     
     print(f"\n📝 RESPOSTA:")
     print(result['response'])
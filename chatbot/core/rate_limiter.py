@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Limitador de taxa para chamadas à API de embeddings
+Controla requisições e tokens por minuto compartilhados entre threads
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Token bucket duplo (requisições/minuto e tokens/minuto) seguro para threads
+
+    Ao receber um erro 429 a taxa efetiva é reduzida pela metade e todas as
+    threads fazem uma pausa; a cada requisição bem-sucedida a taxa volta a
+    crescer gradualmente até o limite configurado.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 3000,
+        tokens_per_minute: int = 1000000,
+        min_rate_factor: float = 0.1,
+        max_backoff: float = 60.0
+    ):
+        """
+        Inicializa o limitador
+
+        Args:
+            requests_per_minute: Limite de requisições por minuto do provedor
+            tokens_per_minute: Limite de tokens por minuto do provedor
+            min_rate_factor: Fração mínima da taxa após reduções por 429
+            max_backoff: Pausa máxima (segundos) após um 429
+        """
+
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self.min_rate_factor = min_rate_factor
+        self.max_backoff = max_backoff
+
+        self._rate_factor = 1.0
+        self._available_requests = float(self.requests_per_minute)
+        self._available_tokens = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_limits = 0
+        self._total_limits = 0
+        self._condition = threading.Condition()
+
+    def _refill(self) -> None:
+        """Repõe os baldes de acordo com o tempo decorrido (chamado com o lock adquirido)"""
+
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        request_capacity = self.requests_per_minute * self._rate_factor
+        token_capacity = self.tokens_per_minute * self._rate_factor
+
+        self._available_requests = min(request_capacity, self._available_requests + elapsed * request_capacity / 60)
+        self._available_tokens = min(token_capacity, self._available_tokens + elapsed * token_capacity / 60)
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Bloqueia até haver cota para uma requisição com a quantidade de tokens informada
+
+        Args:
+            tokens: Tokens estimados da requisição
+        """
+
+        with self._condition:
+            while True:
+                self._refill()
+                now = time.monotonic()
+
+                if now < self._blocked_until:
+                    self._condition.wait(self._blocked_until - now)
+                    continue
+
+                # Uma requisição maior que o balde nunca caberia; limitar à capacidade atual
+                needed_tokens = min(tokens, self.tokens_per_minute * self._rate_factor)
+
+                if self._available_requests >= 1 and self._available_tokens >= needed_tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= needed_tokens
+                    return
+
+                request_rate = self.requests_per_minute * self._rate_factor / 60
+                token_rate = self.tokens_per_minute * self._rate_factor / 60
+                wait_requests = max(0.0, 1 - self._available_requests) / request_rate
+                wait_tokens = max(0.0, needed_tokens - self._available_tokens) / token_rate
+                self._condition.wait(max(wait_requests, wait_tokens, 0.01))
+
+    def report_rate_limit(self, retry_after: Optional[float] = None) -> float:
+        """
+        Registra um erro 429: reduz a taxa efetiva e pausa todas as threads
+
+        Args:
+            retry_after: Tempo de espera sugerido pelo provedor (segundos)
+
+        Returns:
+            Tempo de pausa aplicado (segundos)
+        """
+
+        with self._condition:
+            self._consecutive_limits += 1
+            self._total_limits += 1
+            self._rate_factor = max(self.min_rate_factor, self._rate_factor * 0.5)
+
+            if retry_after is None:
+                retry_after = min(self.max_backoff, 2 ** self._consecutive_limits) * (0.5 + random.random() / 2)
+
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+            # Descartar cota acumulada para não gerar nova rajada após a pausa
+            self._available_requests = min(self._available_requests, 0.0)
+            self._available_tokens = min(self._available_tokens, 0.0)
+
+            logger.warning(f"⚠️ Limite de taxa atingido. Pausando {retry_after:.1f}s (taxa efetiva: {self._rate_factor:.0%})")
+            self._condition.notify_all()
+
+            return retry_after
+
+    def report_success(self) -> None:
+        """Registra uma requisição bem-sucedida e recupera a taxa gradualmente"""
+
+        with self._condition:
+            self._consecutive_limits = 0
+            if self._rate_factor < 1.0:
+                self._rate_factor = min(1.0, self._rate_factor + 0.05)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna o estado atual do limitador"""
+
+        with self._condition:
+            return {
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'rate_factor': self._rate_factor,
+                'rate_limit_errors': self._total_limits
+            }
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Registro (ledger) do status de vetorização das normas ANTAQ
+Guarda o status em um SQLite ao lado do parquet, evitando reescrever o
+arquivo completo a cada norma processada
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import pandas as pd
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class VetorizacaoLedger:
+    """
+    Registro append-only do status de vetorização, indexado por codigo_registro
+
+    Cada atualização insere uma nova linha; o status vigente de uma norma é o
+    da linha mais recente. O parquet só é reescrito na compactação, uma vez
+    por execução, e de forma atômica (arquivo temporário + os.replace).
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Inicializa o ledger
+
+        Args:
+            db_path: Caminho do arquivo SQLite
+        """
+
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def path_for_parquet(parquet_path: str) -> Path:
+        """Retorna o caminho do ledger associado a um arquivo parquet"""
+        parquet_path = Path(parquet_path)
+        return parquet_path.with_name(f"{parquet_path.stem}.vetorizacao.db")
+
+    @classmethod
+    def for_parquet(cls, parquet_path: str) -> "VetorizacaoLedger":
+        """Abre (ou cria) o ledger associado a um arquivo parquet"""
+        return cls(str(cls.path_for_parquet(parquet_path)))
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão com o banco do ledger, aberta (e o esquema criado) no primeiro uso"""
+
+        if self._connection is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS status (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        codigo_registro TEXT NOT NULL,
+                        vetorizado INTEGER NOT NULL,
+                        timestamp TEXT NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_status_codigo ON status (codigo_registro)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS conteudo (
+                        codigo_registro TEXT PRIMARY KEY,
+                        content_hash TEXT NOT NULL,
+                        chunks INTEGER,
+                        timestamp TEXT NOT NULL,
+                        fingerprint TEXT
+                    )
+                """)
+                # Ledgers criados antes da impressão digital
+                colunas = {row[1] for row in conn.execute("PRAGMA table_info(conteudo)")}
+                if 'fingerprint' not in colunas:
+                    conn.execute("ALTER TABLE conteudo ADD COLUMN fingerprint TEXT")
+            self._connection = conn
+        return self._connection
+
+    def registrar(
+        self,
+        codigos_registro: Iterable[str],
+        vetorizado: bool = True,
+        timestamp: Optional[datetime] = None
+    ) -> None:
+        """
+        Registra o status de vetorização de um conjunto de normas
+
+        Args:
+            codigos_registro: Códigos das normas
+            vetorizado: Status a registrar
+            timestamp: Momento da verificação (padrão: agora)
+        """
+
+        timestamp = (timestamp or datetime.now()).isoformat()
+        rows = [(str(codigo), int(vetorizado), timestamp) for codigo in codigos_registro]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO status (codigo_registro, vetorizado, timestamp) VALUES (?, ?, ?)",
+                rows
+            )
+
+    def registrar_conteudo(
+        self,
+        conteudos: Dict[str, Tuple[str, Optional[int], Optional[str]]],
+        timestamp: Optional[datetime] = None
+    ) -> None:
+        """
+        Registra o hash do conteúdo vetorizado de cada norma
+
+        Args:
+            conteudos: codigo_registro -> (hash do conteúdo, número de chunks ou None, impressão digital ou None)
+            timestamp: Momento do registro (padrão: agora)
+        """
+
+        timestamp = (timestamp or datetime.now()).isoformat()
+        rows = [
+            (str(codigo), content_hash, chunks, timestamp, fingerprint)
+            for codigo, (content_hash, chunks, fingerprint) in conteudos.items()
+        ]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO conteudo (codigo_registro, content_hash, chunks, timestamp, fingerprint) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def atualizar_fingerprints(self, fingerprints: Dict[str, str]) -> None:
+        """
+        Atualiza a impressão digital de normas cujo conteúdo não mudou
+
+        Args:
+            fingerprints: codigo_registro -> impressão digital atual
+        """
+
+        rows = [(fingerprint, str(codigo)) for codigo, fingerprint in fingerprints.items()]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE conteudo SET fingerprint = ? WHERE codigo_registro = ?", rows)
+
+    def get_hashes(self) -> Dict[str, str]:
+        """
+        Retorna o hash do conteúdo vetorizado de cada norma
+
+        Returns:
+            Dicionário codigo_registro -> hash do conteúdo
+        """
+
+        with self._lock:
+            rows = self._conn.execute("SELECT codigo_registro, content_hash FROM conteudo").fetchall()
+
+        return dict(rows)
+
+    def get_fingerprints(self) -> Dict[str, str]:
+        """
+        Retorna a impressão digital registrada de cada norma
+
+        Returns:
+            Dicionário codigo_registro -> impressão digital (normas sem registro são omitidas)
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT codigo_registro, fingerprint FROM conteudo WHERE fingerprint IS NOT NULL"
+            ).fetchall()
+
+        return dict(rows)
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna o status vigente de cada norma registrada
+
+        Returns:
+            Dicionário codigo_registro -> {'vetorizado': bool, 'timestamp': datetime}
+        """
+
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT codigo_registro, vetorizado, timestamp FROM status
+                WHERE id IN (SELECT MAX(id) FROM status GROUP BY codigo_registro)
+            """).fetchall()
+
+        return {
+            codigo: {'vetorizado': bool(vetorizado), 'timestamp': datetime.fromisoformat(timestamp)}
+            for codigo, vetorizado, timestamp in rows
+        }
+
+    def aplicar_status(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Sobrepõe o status do ledger às colunas de vetorização de um DataFrame
+
+        Args:
+            df: DataFrame com a coluna codigo_registro
+
+        Returns:
+            DataFrame com as colunas 'vetorizado' e 'ultima_verificacao_vetorizacao' atualizadas
+        """
+
+        df = df.copy()
+        if 'vetorizado' not in df.columns:
+            df['vetorizado'] = False
+        if 'ultima_verificacao_vetorizacao' not in df.columns:
+            df['ultima_verificacao_vetorizacao'] = pd.NaT
+
+        df['vetorizado'] = df['vetorizado'].fillna(False).astype(bool)
+        df['ultima_verificacao_vetorizacao'] = pd.to_datetime(df['ultima_verificacao_vetorizacao'])
+
+        status = self.get_status()
+        if not status:
+            return df
+
+        codigos = df['codigo_registro'].astype(str)
+        mask = codigos.isin(status.keys())
+        df.loc[mask, 'vetorizado'] = codigos[mask].map(lambda c: status[c]['vetorizado'])
+        # Mesma unidade da coluna (ms/us/ns variam conforme o parquet); o pandas 3 não converte na atribuição
+        df.loc[mask, 'ultima_verificacao_vetorizacao'] = pd.to_datetime(
+            codigos[mask].map(lambda c: status[c]['timestamp'])
+        ).astype(df['ultima_verificacao_vetorizacao'].dtype)
+
+        return df
+
+    def compactar(self, parquet_path: str) -> int:
+        """
+        Grava o status do ledger no parquet (uma única reescrita, atômica)
+        e descarta as entradas antigas do ledger
+
+        Args:
+            parquet_path: Caminho para o arquivo parquet
+
+        Returns:
+            Número de normas com status registrado no ledger
+        """
+
+        status = self.get_status()
+        if not status:
+            return 0
+
+        logger.info(f"Compactando status de vetorização de {len(status)} normas no parquet...")
+
+        df = self.aplicar_status(pd.read_parquet(parquet_path))
+
+        tmp_path = Path(parquet_path).with_suffix('.parquet.tmp')
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+
+        # Manter apenas a entrada mais recente de cada norma
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM status WHERE id NOT IN (SELECT MAX(id) FROM status GROUP BY codigo_registro)")
+
+        logger.info("✅ Status de vetorização compactado no parquet")
+        return len(status)
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
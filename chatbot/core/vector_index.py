@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Índice vetorial exato em NumPy para o Chatbot ANTAQ
+Mantém uma cópia dos embeddings da coleção (float32, float16 ou int8),
+mapeada em memória, para busca exata sem o HNSW do ChromaDB
+"""
+
+import os
+import json
+import logging
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# Configurar logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class NumpyVectorIndex:
+    """
+    Cópia dos vetores e metadados de uma coleção, persistida ao lado do ChromaDB
+
+    O ChromaDB continua sendo a fonte da verdade: o índice é reconstruído a
+    partir da coleção sempre que necessário. Os vetores são normalizados,
+    de modo que o produto interno equivale à similaridade de cosseno. Em
+    int8 cada linha tem sua própria escala (quantização simétrica).
+
+    Os metadados escalares viram colunas (numéricas ou categóricas) para
+    que os filtros no formato ``where`` do ChromaDB sejam aplicados como
+    máscaras booleanas.
+
+    Arquivos do diretório:
+        vectors.npy   matriz (n, d) no dtype do índice
+        scales.npy    escala por linha (apenas int8)
+        columns.npz   colunas de metadados (códigos categóricos ou valores numéricos)
+        ids.json      ids dos chunks, na ordem das linhas
+        meta.json     dtype, dimensão, total, backend e vocabulário das colunas
+    """
+
+    DTYPES = ('float32', 'float16', 'int8')
+
+    # Linhas pontuadas por vez (limita a memória de trabalho em float32)
+    SCORE_BLOCK_ROWS = 65536
+
+    def __init__(self, directory: str, dtype: str = 'float32'):
+        """
+        Inicializa o índice (sem carregar os vetores)
+
+        Args:
+            directory: Diretório onde o índice é persistido
+            dtype: Tipo dos vetores armazenados ('float32', 'float16' ou 'int8')
+        """
+
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Tipo de vetor inválido: {dtype} (opções: {', '.join(self.DTYPES)})")
+
+        self.directory = Path(directory)
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._unload()
+
+    @property
+    def loaded(self) -> bool:
+        """Se os vetores estão carregados"""
+        return self.vectors is not None
+
+    @property
+    def count(self) -> int:
+        """Número de vetores no índice"""
+        return len(self.ids)
+
+    def exists(self) -> bool:
+        """Se há um índice persistido no diretório"""
+        return (self.directory / 'meta.json').exists()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """Normaliza as linhas para norma 1"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _quantize(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Converte um bloco de vetores normalizados para o dtype do índice"""
+
+        if self.dtype != 'int8':
+            return matrix.astype(np.dtype(self.dtype)), None
+
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    @staticmethod
+    def _build_columns(metadatas: List[Dict[str, Any]]) -> Tuple[Dict[str, np.ndarray], Dict[str, List[Any]]]:
+        """
+        Converte os metadados dos chunks em colunas
+
+        Campos só com números (exceto booleanos) viram colunas float64 com NaN
+        para ausentes; os demais viram códigos int32 de um vocabulário, com -1
+        para ausentes.
+
+        Returns:
+            Tupla (colunas, vocabulário das colunas categóricas)
+        """
+
+        fields = sorted({key for meta in metadatas for key in meta})
+        columns: Dict[str, np.ndarray] = {}
+        vocabularies: Dict[str, List[Any]] = {}
+
+        for field in fields:
+            values = [meta.get(field) for meta in metadatas]
+            present = [v for v in values if v is not None]
+
+            if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                columns[field] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+                continue
+
+            vocabulary: Dict[Any, int] = {}
+            codes = np.full(len(values), -1, dtype=np.int32)
+            for row, value in enumerate(values):
+                if value is not None:
+                    codes[row] = vocabulary.setdefault(value, len(vocabulary))
+            columns[field] = codes
+            vocabularies[field] = list(vocabulary)
+
+        return columns, vocabularies
+
+    def build(self, collection, embedding_backend: str, page_size: int = 1000) -> int:
+        """
+        Reconstrói o índice a partir da coleção do ChromaDB
+
+        Os vetores são lidos em páginas e gravados diretamente na matriz
+        mapeada em disco; o índice anterior só é substituído ao final.
+
+        Args:
+            collection: Coleção do ChromaDB (fonte da verdade)
+            embedding_backend: Identidade do backend de embedding da coleção
+            page_size: Número de vetores lidos por página
+
+        Returns:
+            Número de vetores indexados
+        """
+
+        total = collection.count()
+        tmp_dir = self.directory.with_name(self.directory.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        vectors = None
+        scales = np.ones(total, dtype=np.float32)
+        ids: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+
+        for offset in range(0, total, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=['embeddings', 'metadatas'])
+            embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+            if len(embeddings) == 0:
+                break
+
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    str(tmp_dir / 'vectors.npy'), mode='w+',
+                    dtype=np.dtype(self.dtype), shape=(total, embeddings.shape[1])
+                )
+
+            quantized, page_scales = self._quantize(self._normalize(embeddings))
+            start = len(ids)
+            vectors[start:start + len(quantized)] = quantized
+            if page_scales is not None:
+                scales[start:start + len(quantized)] = page_scales
+            ids.extend(page['ids'])
+            metadatas.extend(meta or {} for meta in page['metadatas'])
+
+        dimensions = int(vectors.shape[1]) if vectors is not None else 0
+        if vectors is not None:
+            vectors.flush()
+            del vectors
+            # A coleção pode ter encolhido durante a leitura; manter apenas as linhas lidas
+            if len(ids) != total:
+                lidos = np.load(str(tmp_dir / 'vectors.npy'), mmap_mode='r')[:len(ids)]
+                np.save(str(tmp_dir / 'vectors_lidos.npy'), lidos)
+                del lidos
+                os.replace(tmp_dir / 'vectors_lidos.npy', tmp_dir / 'vectors.npy')
+        else:
+            np.save(str(tmp_dir / 'vectors.npy'), np.zeros((0, 0), dtype=np.dtype(self.dtype)))
+
+        if self.dtype == 'int8':
+            np.save(str(tmp_dir / 'scales.npy'), scales[:len(ids)])
+
+        columns, vocabularies = self._build_columns(metadatas)
+        np.savez(str(tmp_dir / 'columns.npz'), **columns)
+
+        with open(tmp_dir / 'ids.json', 'w', encoding='utf-8') as f:
+            json.dump(ids, f)
+
+        meta = {
+            'dtype': self.dtype,
+            'dimensions': dimensions,
+            'count': len(ids),
+            'collection': collection.name,
+            'embedding_backend': embedding_backend,
+            'vocabularies': vocabularies
+        }
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        # Trocar o índice anterior pelo novo
+        with self._lock:
+            self._unload()
+            if self.directory.exists():
+                shutil.rmtree(self.directory)
+            os.replace(tmp_dir, self.directory)
+
+        logger.info(f"✅ Índice {self.dtype} reconstruído: {len(ids)} vetores de {dimensions} dimensões")
+        return len(ids)
+
+    def _unload(self) -> None:
+        """Libera os vetores carregados"""
+        self.vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.columns: Dict[str, np.ndarray] = {}
+        self.ids: List[str] = []
+        self.meta: Dict[str, Any] = {}
+
+    def load(self, embedding_backend: Optional[str] = None) -> bool:
+        """
+        Carrega o índice persistido (vetores mapeados em memória)
+
+        Args:
+            embedding_backend: Se informado, recusa índices de outro backend
+
+        Returns:
+            True se o índice foi carregado
+        """
+
+        if not self.exists():
+            return False
+
+        try:
+            with open(self.directory / 'meta.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+
+            if meta.get('dtype') != self.dtype:
+                logger.warning(f"⚠️ Índice em {self.directory} é {meta.get('dtype')}, esperado {self.dtype}")
+                return False
+
+            if embedding_backend and meta.get('embedding_backend') != embedding_backend:
+                logger.warning(f"⚠️ Índice em {self.directory} foi gerado com outro backend ({meta.get('embedding_backend')})")
+                return False
+
+            vectors = np.load(str(self.directory / 'vectors.npy'), mmap_mode='r')
+            scales = np.load(str(self.directory / 'scales.npy')) if self.dtype == 'int8' else None
+            with np.load(str(self.directory / 'columns.npz')) as data:
+                columns = {field: data[field] for field in data.files}
+            with open(self.directory / 'ids.json', 'r', encoding='utf-8') as f:
+                ids = json.load(f)
+
+            with self._lock:
+                self.vectors, self.scales, self.columns, self.ids, self.meta = vectors, scales, columns, ids, meta
+
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar índice vetorial de {self.directory}: {e}")
+            return False
+
+    def _compare(self, field: str, operator: str, value: Any) -> np.ndarray:
+        """Máscara de uma comparação de metadado ($eq, $ne, $gt, $gte, $lt, $lte, $in, $nin)"""
+
+        column = self.columns.get(field)
+        if column is None:
+            # Campo inexistente: nenhum chunk satisfaz a condição
+            return np.full(len(self.ids), operator in ('$ne', '$nin'), dtype=bool)
+
+        if column.dtype == np.float64:
+            if operator in ('$in', '$nin'):
+                mask = np.isin(column, [float(v) for v in value])
+                return ~mask if operator == '$nin' else mask
+            comparisons = {
+                '$eq': np.equal, '$ne': np.not_equal,
+                '$gt': np.greater, '$gte': np.greater_equal,
+                '$lt': np.less, '$lte': np.less_equal,
+            }
+            with np.errstate(invalid='ignore'):
+                return comparisons[operator](column, float(value))
+
+        vocabulary = self.meta['vocabularies'].get(field, [])
+        codes = {v: i for i, v in enumerate(vocabulary)}
+
+        if operator in ('$eq', '$ne'):
+            mask = column == codes.get(value, -2)
+            return ~mask if operator == '$ne' else mask
+
+        if operator in ('$in', '$nin'):
+            mask = np.isin(column, [codes[v] for v in value if v in codes])
+            return ~mask if operator == '$nin' else mask
+
+        # Comparações de ordem em campos textuais: avaliar sobre o vocabulário
+        comparisons = {
+            '$gt': lambda v: v > value, '$gte': lambda v: v >= value,
+            '$lt': lambda v: v < value, '$lte': lambda v: v <= value,
+        }
+        selected = [i for i, v in enumerate(vocabulary) if type(v) is type(value) and comparisons[operator](v)]
+        return np.isin(column, selected)
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Converte um filtro no formato where do ChromaDB em máscara booleana"""
+
+        mask = np.ones(len(self.ids), dtype=bool)
+
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self._mask(clause)
+            elif key == '$or':
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._mask(clause)
+                mask &= any_mask
+            elif isinstance(condition, dict):
+                for operator, value in condition.items():
+                    mask &= self._compare(key, operator, value)
+            else:
+                mask &= self._compare(key, '$eq', condition)
+
+        return mask
+
+    def search(
+        self,
+        query_embedding: List[float],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Busca exata: pontua os vetores que passam no filtro e retorna os mais similares
+
+        Args:
+            query_embedding: Embedding da consulta
+            n_results: Número de resultados
+            where: Filtro de metadados no formato do ChromaDB
+
+        Returns:
+            Lista de (id do chunk, similaridade de cosseno), da maior para a menor
+        """
+
+        with self._lock:
+            vectors, scales, ids = self.vectors, self.scales, self.ids
+
+        if vectors is None or len(ids) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        # Linhas candidatas (todas, ou as que passam no filtro)
+        rows = np.flatnonzero(self._mask(where)) if where else None
+        total = len(ids) if rows is None else len(rows)
+
+        n_results = min(n_results, total)
+        if n_results <= 0:
+            return []
+
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, self.SCORE_BLOCK_ROWS):
+            if rows is None:
+                block = vectors[start:start + self.SCORE_BLOCK_ROWS]
+            else:
+                block = vectors[rows[start:start + self.SCORE_BLOCK_ROWS]]
+            scores[start:start + len(block)] = np.asarray(block, dtype=np.float32) @ query
+
+        if scales is not None:
+            scores *= scales if rows is None else scales[rows]
+
+        top = np.argpartition(-scores, n_results - 1)[:n_results]
+        top = top[np.argsort(-scores[top])]
+
+        positions = top if rows is None else rows[top]
+        return [(ids[p], float(scores[t])) for t, p in zip(top, positions)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna o tipo, o tamanho e a memória ocupada pelos vetores"""
+
+        with self._lock:
+            vectors = self.vectors
+            count = len(self.ids)
+
+        return {
+            'dtype': self.dtype,
+            'loaded': vectors is not None,
+            'count': count,
+            'dimensions': int(vectors.shape[1]) if vectors is not None and vectors.ndim == 2 else 0,
+            'vector_bytes': int(vectors.nbytes) if vectors is not None else 0
+        }
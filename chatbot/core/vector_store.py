@@ -9,33 +9,137 @@ import numpy as np
 import chromadb
 from chromadb.config import Settings
 import openai
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import json
 import hashlib
 import os
+import shutil
 from pathlib import Path
 import logging
 from tqdm import tqdm
 import tiktoken
 import re
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from .embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from .rate_limiter import RateLimiter
+from .status_ledger import VetorizacaoLedger
+from .chunker import TokenChunker, LegalStructureChunker
+from .collection_stats import CollectionStats
+from .parquet_reader import NormasParquetReader
+from .embeddings import EmbeddingBackend, OpenAIEmbeddingBackend
+from .vector_index import NumpyVectorIndex
+from .lexical_index import LexicalIndex
+from .norma_reference import NormaReferenceIndex
+from .document_store import NormaDocumentStore, chunk_metadata, CHUNK_METADATA_FIELDS, NORMA_FILTER_FIELDS
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Backend usado pelas coleções criadas antes do registro do backend nos metadados
+LEGACY_EMBEDDING_BACKEND = "openai:text-embedding-3-small"
+
+class _VersionSidecars:
+    """
+    Estruturas auxiliares de uma versão da coleção
+    
+    Estatísticas, índices (léxico, de referências e em NumPy), metadados por
+    norma e a coleção de primeiro estágio. A versão ativa e uma versão em
+    construção têm cada uma as suas, de modo que uma reconstrução nunca
+    altera o que as buscas estão lendo.
+    """
+    
+    def __init__(
+        self, 
+        name: str, 
+        persist_directory: Path, 
+        vector_sidecar_dtype: Optional[str], 
+        enable_lexical_index: bool
+    ):
+        """
+        Abre as estruturas auxiliares de uma versão
+        
+        Args:
+            name: Nome real (versionado) da coleção no ChromaDB
+            persist_directory: Diretório onde ficam os arquivos auxiliares
+            vector_sidecar_dtype: Tipo da cópia dos vetores em NumPy (None desativa)
+            enable_lexical_index: Se a versão mantém o índice léxico
+        """
+        
+        self.name = name
+        
+        # Estatísticas agregadas da coleção, mantidas a cada inserção/remoção
+        self.collection_stats = CollectionStats(str(persist_directory / f"{name}_stats.json"))
+        
+        # Cópia dos vetores para busca exata em memória
+        self.vector_index = None
+        self.vector_index_stale = False
+        if vector_sidecar_dtype:
+            self.vector_index = NumpyVectorIndex(str(persist_directory / f"{name}_vectors"), dtype=vector_sidecar_dtype)
+        
+        # Índice léxico (BM25) dos chunks
+        self.lexical_index = None
+        if enable_lexical_index:
+            self.lexical_index = LexicalIndex(str(persist_directory / f"{name}_lexical.db"))
+        
+        # Índice de referências (tipo, número, ano) -> codigo_registro
+        self.reference_index = NormaReferenceIndex(str(persist_directory / f"{name}_referencias.json"))
+        
+        # Metadados por norma (os chunks levam apenas os campos de filtro)
+        self.document_store = NormaDocumentStore(str(persist_directory / f"{name}_normas.db"))
+        
+        # Coleção de primeiro estágio (um vetor por norma), no próprio ChromaDB
+        self.norma_collection = None
+        
+        # Verificações de consistência dos índices: nome -> (revisão do alias, consistente)
+        self.checks: Dict[str, Tuple[int, bool]] = {}
+    
+    def close(self) -> None:
+        """Fecha as conexões com os bancos SQLite"""
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+        self.document_store.close()
+
 class VectorStoreANTAQ:
     """
     Classe para gerenciar o banco vetorial das normas ANTAQ
     """
     
+    # Candidatos por consulta na busca em lote sobre a união das normas do primeiro estágio
+    # (multiplicador de n_results, limitado ao número de consultas)
+    FIRST_STAGE_OVERFETCH = 4
+    
     def __init__(
         self, 
         openai_api_key: str,
         persist_directory: str = "./chroma_db",
         collection_name: str = "normas_antaq",
         chunk_size: int = 600,  # Reduzido para evitar erro de contexto
-        chunk_overlap: int = 100  # Reduzido proporcionalmente
+        chunk_overlap: int = 100,  # Reduzido proporcionalmente
+        embedding_batch_size: int = 256,
+        embedding_batch_tokens: int = 100000,
+        enable_embedding_cache: bool = True,
+        embedding_cache_dir: Optional[str] = None,
+        embedding_cache_size_mb: int = 1024,
+        embedding_workers: int = 4,
+        requests_per_minute: int = 3000,
+        tokens_per_minute: int = 1000000,
+        chunk_processes: int = 1,
+        query_cache_size: int = 1024,
+        query_cache_ttl: int = 3600,
+        embedding_backend: Optional[EmbeddingBackend] = None,
+        embedding_dimensions: Optional[int] = None,
+        vector_sidecar_dtype: Optional[str] = None,
+        search_backend: str = "chroma",
+        enable_lexical_index: bool = True,
+        retrieval_mode: str = "hybrid",
+        collection_gc_grace_seconds: int = 3600,
+        structure_aware_chunking: bool = True,
+        first_stage_normas: int = 30
     ):
         """
         Inicializa o sistema de banco vetorial
@@ -43,9 +147,34 @@ class VectorStoreANTAQ:
         Args:
             openai_api_key: Chave da API OpenAI
             persist_directory: Diretório para persistir o banco
-            collection_name: Nome da coleção no ChromaDB
+            collection_name: Nome lógico (alias) da coleção no ChromaDB
             chunk_size: Tamanho dos chunks de texto
             chunk_overlap: Sobreposição entre chunks
+            embedding_batch_size: Máximo de chunks por requisição de embeddings
+            embedding_batch_tokens: Máximo de tokens por requisição de embeddings
+            enable_embedding_cache: Se deve usar o cache persistente de embeddings
+            embedding_cache_dir: Diretório do cache (padrão: <persist_directory>/embedding_cache)
+            embedding_cache_size_mb: Tamanho máximo do cache de embeddings em MB
+            embedding_workers: Número de threads gerando embeddings em paralelo na ingestão
+            requests_per_minute: Limite de requisições por minuto da API de embeddings
+            tokens_per_minute: Limite de tokens por minuto da API de embeddings
+            chunk_processes: Número de processos para dividir as normas em chunks
+            query_cache_size: Número máximo de embeddings de consultas mantidos em memória
+            query_cache_ttl: Tempo de vida (segundos) dos embeddings de consultas em memória
+            embedding_backend: Backend de embedding (padrão: OpenAI text-embedding-3-small)
+            embedding_dimensions: Dimensão reduzida dos embeddings do backend padrão
+                (ignorada se embedding_backend for informado)
+            vector_sidecar_dtype: Mantém uma cópia dos vetores em NumPy ('float32', 'float16'
+                ou 'int8') para busca exata em memória; None desativa
+            search_backend: 'chroma' (HNSW) ou 'exact' (produto interno sobre a cópia em NumPy)
+            enable_lexical_index: Se deve manter o índice léxico (BM25) dos chunks
+            retrieval_mode: Modo padrão de busca: 'dense', 'lexical' ou 'hybrid' (RRF)
+            collection_gc_grace_seconds: Tempo (segundos) que versões substituídas da
+                coleção são mantidas antes de serem removidas
+            structure_aware_chunking: Se os chunks devem ser alinhados aos artigos da
+                norma (senão, janelas de tokens com sobreposição)
+            first_stage_normas: Número de normas selecionadas no primeiro estágio da
+                busca (um vetor por norma); os chunks são buscados só nelas (0 desativa)
         """
         
         self.openai_api_key = openai_api_key
@@ -57,6 +186,17 @@ class VectorStoreANTAQ:
         self.collection_name = collection_name
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.chunk_processes = max(1, chunk_processes)
+        self.embedding_backend = embedding_backend or OpenAIEmbeddingBackend(
+            "text-embedding-3-small", dimensions=embedding_dimensions
+        )
+        self.embedding_batch_size = max(1, embedding_batch_size)
+        self.embedding_batch_tokens = max(1, embedding_batch_tokens)
+        self.embedding_workers = max(1, embedding_workers)
+        self.max_rate_limit_retries = 8
+        
+        # Limitador compartilhado pelas threads de embedding
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
         
         # Inicializar ChromaDB
         self.client = chromadb.PersistentClient(
@@ -67,8 +207,61 @@ class VectorStoreANTAQ:
             )
         )
         
+        # Cache persistente de embeddings (compartilhado por ingestão e busca)
+        self.embedding_cache = None
+        if enable_embedding_cache:
+            cache_dir = embedding_cache_dir or self.persist_directory / "embedding_cache"
+            self.embedding_cache = EmbeddingCache(str(cache_dir), size_limit_mb=embedding_cache_size_mb)
+        
+        # Cache em memória dos embeddings de consultas
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        
+        # Cópia dos vetores para busca exata em memória (reconstruída a partir do ChromaDB)
+        if search_backend not in ("chroma", "exact"):
+            raise ValueError(f"Backend de busca desconhecido: {search_backend} (opções: chroma, exact)")
+        self.search_backend = search_backend
+        if search_backend == "exact" and not vector_sidecar_dtype:
+            vector_sidecar_dtype = "float32"
+        
+        self.vector_sidecar_dtype = vector_sidecar_dtype
+        
+        # Índice léxico (BM25) dos chunks, combinado com a busca vetorial por RRF
+        if retrieval_mode not in ("dense", "lexical", "hybrid"):
+            raise ValueError(f"Modo de busca desconhecido: {retrieval_mode} (opções: dense, lexical, hybrid)")
+        self.retrieval_mode = retrieval_mode
+        self.rrf_k = 60
+        self.enable_lexical_index = enable_lexical_index
+        
+        # Busca em dois estágios: normas mais próximas e, depois, seus chunks
+        self.first_stage_normas = max(0, first_stage_normas)
+        
+        # A coleção é versionada: o alias aponta para a versão ativa e as
+        # reconstruções são feitas em uma nova versão, trocada ao final
+        self.alias_path = self.persist_directory / f"{collection_name}.alias.json"
+        self.collection_gc_grace_seconds = collection_gc_grace_seconds
+        self._alias_signature: Optional[Tuple[int, int]] = None
+        self._alias_target = collection_name
+        self._alias_revision = 0
+        self._deferred_ledger: Optional[Dict[str, Any]] = None
+        
+        # Handle da coleção reutilizado entre buscas
+        self._collection = None
+        
+        # Serializa a troca de versão e as reconstruções sob demanda entre
+        # threads que compartilham a instância (ex.: sessões do Streamlit)
+        self._lock = threading.RLock()
+        
+        # Estatísticas, índices léxico, de referências e em NumPy da versão ativa
+        self._sidecars: Optional[_VersionSidecars] = None
+        self._bind_sidecars(self._resolve_collection_name())
+        
+        # Ledgers de status de vetorização (um por arquivo parquet)
+        self._status_ledgers: Dict[str, VetorizacaoLedger] = {}
+        
         # Tokenizer para contagem de tokens
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        chunker_class = LegalStructureChunker if structure_aware_chunking else TokenChunker
+        self.chunker = chunker_class(chunk_size, chunk_overlap, "cl100k_base")
         
         logger.info(f"VectorStore inicializado em: {self.persist_directory}")
     
@@ -78,7 +271,7 @@ class VectorStoreANTAQ:
     
     def _chunk_text(self, text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Divide texto em chunks inteligentes
+        Divide texto em chunks de tokens com sobreposição
         
         Args:
             text: Texto para dividir
@@ -87,93 +280,63 @@ class VectorStoreANTAQ:
         Returns:
             Lista de chunks com metadados
         """
+        return self.chunker.chunk(text, metadata)
+    
+    def _iter_documentos(self, reader: NormasParquetReader, df_filtered: pd.DataFrame) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Gera o texto combinado e os metadados de cada norma a vetorizar
         
-        if not text or len(text.strip()) < 50:
-            return []
-        
-        chunks = []
-        
-        # Limpar e normalizar texto
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Dividir por parágrafos primeiro
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+        Args:
+            reader: Leitor do parquet
+            df_filtered: Normas selecionadas para vetorização (resultado da varredura de filtros)
+            
+        Yields:
+            Tuplas (texto completo, metadados)
+        """
         
-        current_chunk = ""
-        current_tokens = 0
+        rows = reader.iter_normas(df_filtered['_posicao'].values)
         
-        for paragraph in paragraphs:
-            paragraph_tokens = self._count_tokens(paragraph)
-            
-            # Se parágrafo é muito grande, dividir por sentenças
-            if paragraph_tokens > self.chunk_size:
-                sentences = re.split(r'[.!?]+', paragraph)
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if not sentence:
-                        continue
-                        
-                    sentence_tokens = self._count_tokens(sentence)
-                    
-                    if current_tokens + sentence_tokens > self.chunk_size and current_chunk:
-                        # Salvar chunk atual
-                        chunks.append({
-                            'text': current_chunk.strip(),
-                            'metadata': {
-                                **metadata,
-                                'chunk_index': len(chunks),
-                                'tokens': current_tokens
-                            }
-                        })
-                        
-                        # Iniciar novo chunk com overlap
-                        overlap_text = self._get_overlap(current_chunk)
-                        current_chunk = overlap_text + " " + sentence
-                        current_tokens = self._count_tokens(current_chunk)
-                    else:
-                        current_chunk += " " + sentence
-                        current_tokens += sentence_tokens
-            else:
-                # Parágrafo normal
-                if current_tokens + paragraph_tokens > self.chunk_size and current_chunk:
-                    chunks.append({
-                        'text': current_chunk.strip(),
-                        'metadata': {
-                            **metadata,
-                            'chunk_index': len(chunks),
-                            'tokens': current_tokens
-                        }
-                    })
-                    
-                    overlap_text = self._get_overlap(current_chunk)
-                    current_chunk = overlap_text + " " + paragraph
-                    current_tokens = self._count_tokens(current_chunk)
-                else:
-                    current_chunk += " " + paragraph
-                    current_tokens += paragraph_tokens
-        
-        # Adicionar último chunk
-        if current_chunk.strip():
-            chunks.append({
-                'text': current_chunk.strip(),
-                'metadata': {
-                    **metadata,
-                    'chunk_index': len(chunks),
-                    'tokens': current_tokens
+        for row in tqdm(rows, total=len(df_filtered), desc="Processando normas"):
+            try:
+                # Preparar metadados
+                metadata = {
+                    'codigo_registro': str(row['codigo_registro']),
+                    'titulo': str(row['titulo']),
+                    'autor': str(row['autor']),
+                    'assunto': str(row['assunto']),
+                    'situacao': str(row['situacao']),
+                    'link_pdf': str(row['link_pdf']),
+                    'tipo_material': str(row['tipo_material']),
+                    'assinatura': row['assinatura'].strftime('%Y-%m-%d') if pd.notna(row['assinatura']) else 'N/A',
+                    'publicacao': row['publicacao'].strftime('%Y-%m-%d') if pd.notna(row['publicacao']) else 'N/A',
+                    'tamanho_pdf': int(row['tamanho_pdf']) if pd.notna(row['tamanho_pdf']) else 0,
+                    'paginas_extraidas': int(row['paginas_extraidas']) if pd.notna(row['paginas_extraidas']) else 0,
+                    'content_hash': NormasParquetReader.content_hash(row),
+                    'fingerprint': NormasParquetReader.fingerprint(row)
                 }
-            })
-        
-        return chunks
-    
-    def _get_overlap(self, text: str) -> str:
-        """Obter texto de overlap do final do chunk"""
-        words = text.split()
-        overlap_words = min(self.chunk_overlap // 4, len(words))  # Aproximação
-        return " ".join(words[-overlap_words:]) if overlap_words > 0 else ""
+                
+                # Ano e epoch numéricos para filtros por intervalo (omitidos se a data faltar)
+                for campo in ('assinatura', 'publicacao'):
+                    if pd.notna(row[campo]):
+                        metadata[f'ano_{campo}'] = int(row[campo].year)
+                        metadata[f'{campo}_ts'] = int(pd.Timestamp(row[campo]).timestamp())
+                
+                # Criar texto combinado para busca
+                texto_completo = f"""
+                TÍTULO: {row['titulo']}
+                ASSUNTO: {row['assunto']}
+                CONTEÚDO: {row['conteudo_pdf']}
+                """.strip()
+                
+                yield texto_completo, metadata
+                
+            except Exception as e:
+                logger.error(f"❌ Erro ao processar norma {row['codigo_registro']}: {e}")
+                continue
     
     def _generate_embedding(self, text: str) -> List[float]:
         """
-        Gera embedding usando OpenAI
+        Gera embedding usando o backend configurado
         
         Args:
             text: Texto para gerar embedding
@@ -182,368 +345,2137 @@ class VectorStoreANTAQ:
             Lista de floats representando o embedding
         """
         
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(self.embedding_backend.identity, text)
+            if cached is not None:
+                return cached
+        
         try:
-            response = openai.embeddings.create(
-                model="text-embedding-3-small",
-                input=text.replace("\n", " ")
-            )
-            return response.data[0].embedding
+            embedding = self.embedding_backend.embed([text])[0]
+            
+            if self.embedding_cache is not None:
+                self.embedding_cache.set(self.embedding_backend.identity, text, embedding)
+            
+            return embedding
         except Exception as e:
             logger.error(f"Erro ao gerar embedding: {e}")
             raise
     
-    def _generate_document_id(self, codigo_registro: str, chunk_index: int) -> str:
-        """Gera ID único para documento"""
-        return f"{codigo_registro}_chunk_{chunk_index}"
+    def _generate_query_embedding(self, query: str) -> List[float]:
+        """
+        Gera o embedding de uma consulta, reutilizando consultas recentes
+        
+        Args:
+            query: Consulta do usuário
+            
+        Returns:
+            Embedding da consulta
+        """
+        
+        embedding = self.query_cache.get(query)
+        if embedding is not None:
+            return embedding
+        
+        start_time = time.perf_counter()
+        embedding = self._generate_embedding(query)
+        self.query_cache.set(query, embedding, latency=time.perf_counter() - start_time)
+        
+        return embedding
     
-    def _atualizar_status_vetorizacao(self, parquet_path: str, codigos_registro: List[str]) -> None:
+    def _open_sidecars(self, name: str) -> _VersionSidecars:
+        """Abre as estruturas auxiliares (estatísticas e índices) de uma versão da coleção"""
+        return _VersionSidecars(name, self.persist_directory, self.vector_sidecar_dtype, self.enable_lexical_index)
+    
+    def _bind_sidecars(self, name: str) -> None:
         """
-        Atualiza o status de vetorização das normas no arquivo parquet
+        Associa as estruturas auxiliares da versão informada às buscas
         
         Args:
-            parquet_path: Caminho para o arquivo parquet
-            codigos_registro: Lista de códigos de registro das normas processadas
+            name: Nome real (versionado) da coleção no ChromaDB
         """
-        try:
-            logger.info(f"Atualizando status de vetorização para {len(codigos_registro)} normas...")
-            
-            # Carregar dados
-            df = pd.read_parquet(parquet_path)
-            
-            # Marcar normas como vetorizadas
-            mask = df['codigo_registro'].isin(codigos_registro)
-            df.loc[mask, 'vetorizado'] = True
-            df.loc[mask, 'ultima_verificacao_vetorizacao'] = datetime.now()
-            
-            # Salvar arquivo atualizado
-            df.to_parquet(parquet_path, index=False)
-            
-            logger.info(f"✅ Status de vetorização atualizado com sucesso!")
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao atualizar status de vetorização: {e}")
-            import traceback
-            traceback.print_exc()
+        
+        if self._sidecars is None or self._sidecars.name != name:
+            self._sidecars = self._open_sidecars(name)
     
-    def load_and_process_data(self, parquet_path: str, force_rebuild: bool = False, sample_size: Optional[int] = None, incremental: bool = True) -> bool:
+    def _activate(self, collection, sidecars: _VersionSidecars) -> None:
+        """Passa a atender as buscas com a versão informada (troca única do handle e das estruturas)"""
+        with self._lock:
+            self._collection = collection
+            self._sidecars = sidecars
+    
+    @property
+    def active_collection_name(self) -> str:
+        """Nome real (versionado) da versão da coleção usada nas buscas"""
+        return self._sidecars.name
+    
+    @property
+    def collection_stats(self) -> CollectionStats:
+        """Estatísticas agregadas da versão ativa"""
+        return self._sidecars.collection_stats
+    
+    @property
+    def vector_index(self) -> Optional[NumpyVectorIndex]:
+        """Cópia dos vetores em NumPy da versão ativa (None se desativada)"""
+        return self._sidecars.vector_index
+    
+    @property
+    def lexical_index(self) -> Optional[LexicalIndex]:
+        """Índice léxico da versão ativa (None se desativado)"""
+        return self._sidecars.lexical_index
+    
+    @property
+    def reference_index(self) -> NormaReferenceIndex:
+        """Índice de referências a normas da versão ativa"""
+        return self._sidecars.reference_index
+    
+    @property
+    def document_store(self) -> NormaDocumentStore:
+        """Metadados por norma da versão ativa"""
+        return self._sidecars.document_store
+    
+    def _sidecar_paths(self, name: str) -> List[Path]:
+        """Arquivos e diretórios auxiliares de uma versão da coleção"""
+        return [
+            self.persist_directory / f"{name}_stats.json",
+            self.persist_directory / f"{name}_vectors",
+            self.persist_directory / f"{name}_lexical.db",
+            self.persist_directory / f"{name}_lexical.db-wal",
+            self.persist_directory / f"{name}_lexical.db-shm",
+            self.persist_directory / f"{name}_referencias.json",
+            self.persist_directory / f"{name}_normas.db",
+            self.persist_directory / f"{name}_normas.db-wal",
+            self.persist_directory / f"{name}_normas.db-shm",
+        ]
+    
+    @staticmethod
+    def _norma_collection_name(name: str) -> str:
+        """Nome da coleção de primeiro estágio (um vetor por norma) de uma versão"""
+        return f"{name}__normas"
+    
+    def _get_norma_collection(self, create: bool = False, sidecars: Optional[_VersionSidecars] = None):
         """
-        Carrega e processa dados do parquet para o banco vetorial
+        Retorna a coleção de primeiro estágio de uma versão
         
         Args:
-            parquet_path: Caminho para o arquivo parquet
-            force_rebuild: Se deve reconstruir o banco mesmo se existir
-            sample_size: Tamanho da amostra para teste
-            incremental: Se deve processar apenas normas não vetorizadas
+            create: Se deve criá-la caso ainda não exista
+            sidecars: Estruturas da versão (padrão: a versão ativa)
             
         Returns:
-            True se processado com sucesso
+            Coleção do ChromaDB (None se não existir)
         """
         
-        try:
-            # Verificar se coleção já existe
-            collection_exists = False
+        sidecars = sidecars or self._sidecars
+        if sidecars.norma_collection is None:
+            name = self._norma_collection_name(sidecars.name)
             try:
-                collection = self.client.get_collection(self.collection_name)
-                collection_exists = True
-                if not force_rebuild:
-                    count = collection.count()
-                    logger.info(f"Coleção já existe com {count} documentos")
-            except:
-                pass
-            
-            if force_rebuild and collection_exists:
-                logger.info("Reconstruindo banco vetorial...")
-                self.client.delete_collection(self.collection_name)
-                collection_exists = False
-            
-            # Criar nova coleção se não existir
-            if not collection_exists:
-                collection = self.client.create_collection(
-                    name=self.collection_name,
-                    metadata={"hnsw:space": "cosine"}
-                )
-            else:
-                collection = self.client.get_collection(self.collection_name)
-            
-            # Carregar dados
-            logger.info(f"Carregando dados de: {parquet_path}")
-            df = pd.read_parquet(parquet_path)
-            
-            # Verificar se coluna vetorizado existe
-            if 'vetorizado' not in df.columns:
-                logger.warning("Coluna 'vetorizado' não encontrada. Adicionando coluna...")
-                df['vetorizado'] = False
-                df['ultima_verificacao_vetorizacao'] = None
-                # Salvar arquivo atualizado
-                df.to_parquet(parquet_path, index=False)
-                logger.info("Arquivo atualizado com coluna 'vetorizado'")
-            
-            # Filtrar apenas normas em vigor com conteúdo
-            df_filtered = df[
-                (df['situacao'] == 'Em vigor') & 
-                (df['conteudo_pdf'].notna()) & 
-                (df['conteudo_pdf'].str.len() > 100)
-            ].copy()
-            
-            # Se modo incremental, filtrar apenas não vetorizadas
-            if incremental and not force_rebuild:
-                df_filtered = df_filtered[~df_filtered['vetorizado']].copy()
-                logger.info(f"Modo incremental: {len(df_filtered)} normas não vetorizadas encontradas")
-            else:
-                logger.info(f"Processando todas as {len(df_filtered)} normas em vigor com conteúdo...")
-            
-            # Aplicar amostra se especificado
-            if sample_size and sample_size < len(df_filtered):
-                df_filtered = df_filtered.sample(n=sample_size, random_state=42).copy()
-                logger.info(f"Usando amostra de {sample_size} normas para teste rápido...")
-            
-            if len(df_filtered) == 0:
-                logger.info("Nenhuma norma para processar!")
-                return True
-            
-            logger.info(f"Processando {len(df_filtered)} normas...")
-            
-            # Processar cada norma individualmente
-            total_chunks = 0
-            normas_processadas = []
-            
-            # Processar cada norma individualmente para garantir persistência
-            for _, row in tqdm(df_filtered.iterrows(), total=len(df_filtered), desc="Processando normas"):
-                try:
-                    # Preparar metadados
-                    metadata = {
-                        'codigo_registro': str(row['codigo_registro']),
-                        'titulo': str(row['titulo']),
-                        'autor': str(row['autor']),
-                        'assunto': str(row['assunto']),
-                        'situacao': str(row['situacao']),
-                        'link_pdf': str(row['link_pdf']),
-                        'tipo_material': str(row['tipo_material']),
-                        'assinatura': row['assinatura'].strftime('%Y-%m-%d') if pd.notna(row['assinatura']) else 'N/A',
-                        'publicacao': row['publicacao'].strftime('%Y-%m-%d') if pd.notna(row['publicacao']) else 'N/A',
-                        'tamanho_pdf': int(row['tamanho_pdf']) if pd.notna(row['tamanho_pdf']) else 0,
-                        'paginas_extraidas': int(row['paginas_extraidas']) if pd.notna(row['paginas_extraidas']) else 0
-                    }
-                    
-                    # Criar texto combinado para busca
-                    texto_completo = f"""
-                    TÍTULO: {row['titulo']}
-                    ASSUNTO: {row['assunto']}
-                    CONTEÚDO: {row['conteudo_pdf']}
-                    """.strip()
-                    
-                    # Dividir em chunks
-                    chunks = self._chunk_text(texto_completo, metadata)
-                    
-                    # Preparar dados para inserção
-                    documents = []
-                    embeddings = []
-                    ids = []
-                    metadatas = []
-                    
-                    for chunk in chunks:
-                        # Gerar embedding
-                        embedding = self._generate_embedding(chunk['text'])
-                        
-                        # Preparar dados para inserção
-                        doc_id = self._generate_document_id(
-                            metadata['codigo_registro'], 
-                            chunk['metadata']['chunk_index']
-                        )
-                        
-                        documents.append(chunk['text'])
-                        embeddings.append(embedding)
-                        ids.append(doc_id)
-                        metadatas.append(chunk['metadata'])
-                        total_chunks += 1
-                    
-                    # Inserir norma individual no banco vetorial
-                    if documents:
-                        collection.add(
-                            documents=documents,
-                            embeddings=embeddings,
-                            ids=ids,
-                            metadatas=metadatas
-                        )
-                    
-                    # Adicionar à lista de normas processadas
-                    normas_processadas.append(row['codigo_registro'])
-                    
-                    # Atualizar status de vetorização individualmente
-                    if incremental:
-                        self._atualizar_status_vetorizacao(parquet_path, [row['codigo_registro']])
-                    
-                    # Log da norma sendo processada
-                    logger.info(f"📄 Processado e salvo: {row['titulo']} (Código: {row['codigo_registro']}) - {len(documents)} chunks")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erro ao processar norma {row['codigo_registro']}: {e}")
-                    continue
-            
-            # Remover a atualização em lote no final, pois já foi feita individualmente
-            
-            logger.info(f"✅ Processamento concluído! {total_chunks} chunks inseridos no banco vetorial")
-            logger.info(f"✅ {len(normas_processadas)} normas marcadas como vetorizadas")
-            
-            # Listar nomes das normas vetorizadas
-            if normas_processadas:
-                logger.info("📋 NORMAS VETORIZADAS NESTE LOTE:")
-                for codigo in normas_processadas:
-                    # Buscar o título da norma no DataFrame
-                    norma_info = df_filtered[df_filtered['codigo_registro'] == codigo]
-                    if not norma_info.empty:
-                        titulo = norma_info.iloc[0]['titulo']
-                        logger.info(f"   • {titulo} (Código: {codigo})")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar dados: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
+                if create:
+                    sidecars.norma_collection = self.client.get_or_create_collection(
+                        name=name, metadata=self._collection_metadata()
+                    )
+                else:
+                    sidecars.norma_collection = self.client.get_collection(name)
+            except Exception:
+                return None
+        return sidecars.norma_collection
     
-    def search(
-        self, 
-        query: str, 
-        n_results: int = 10,
-        filters: Optional[Dict[str, Any]] = None
-    ) -> List[Dict[str, Any]]:
+    def _read_alias(self) -> Dict[str, Any]:
+        """Lê o arquivo de alias (vazio se ainda não existir)"""
+        
+        if not self.alias_path.exists():
+            return {}
+        
+        with open(self.alias_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write_alias(self, data: Dict[str, Any]) -> None:
+        """Grava o arquivo de alias (escrita atômica)"""
+        
+        tmp_path = self.alias_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.alias_path)
+    
+    def _resolve_collection_name(self) -> str:
         """
-        Busca semântica no banco vetorial
+        Resolve o alias para o nome real da coleção ativa
         
-        Args:
-            query: Consulta do usuário
-            n_results: Número de resultados
-            filters: Filtros de metadados
-            
-        Returns:
-            Lista de resultados ranqueados
+        O arquivo só é relido quando muda (cada gravação cria um novo arquivo,
+        com outro inode). Coleções criadas antes do versionamento (sem alias)
+        usam o próprio nome lógico.
         """
         
         try:
-            collection = self.client.get_collection(self.collection_name)
-            
-            # Gerar embedding da consulta
-            query_embedding = self._generate_embedding(query)
-            
-            # Preparar filtros
-            where = {}
-            if filters:
-                for key, value in filters.items():
-                    if value is not None:
-                        where[key] = value
-            
-            # Realizar busca
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where if where else None,
-                include=['documents', 'metadatas', 'distances']
-            )
-            
-            # Formatar resultados
-            formatted_results = []
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'similarity': 1 - results['distances'][0][i],  # Converter distância para similaridade
-                    'distance': results['distances'][0][i]
-                })
-            
-            return formatted_results
-            
-        except Exception as e:
-            logger.error(f"Erro na busca: {e}")
-            return []
+            stat = self.alias_path.stat()
+        except FileNotFoundError:
+            self._alias_signature = None
+            self._alias_target = self.collection_name
+            self._alias_revision = 0
+            return self._alias_target
+        
+        signature = (stat.st_mtime_ns, stat.st_ino)
+        if signature != self._alias_signature:
+            alias = self._read_alias()
+            self._alias_target = alias.get('collection', self.collection_name)
+            self._alias_revision = alias.get('revision', 0)
+            self._alias_signature = signature
+        
+        return self._alias_target
     
-    def get_collection_stats(self) -> Dict[str, Any]:
-        """Obtém estatísticas da coleção"""
+    def _bump_revision(self) -> None:
+        """
+        Avança a revisão da versão ativa, gravada no alias
+        
+        Chamado a cada alteração da coleção ativa (normas gravadas ou
+        removidas), inclusive as que mantêm o número de chunks: respostas
+        em cache de qualquer processo deixam de valer.
+        """
+        
+        alias = self._read_alias()
+        self._write_alias({
+            **alias,
+            'collection': alias.get('collection', self.active_collection_name),
+            'revision': alias.get('revision', 0) + 1,
+            'updated_at': datetime.now().isoformat()
+        })
+        self._resolve_collection_name()
+    
+    def _new_collection_name(self) -> str:
+        """Gera o nome de uma nova versão da coleção"""
+        
+        base = f"{self.collection_name}__v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        existing = {c if isinstance(c, str) else c.name for c in self.client.list_collections()}
+        
+        name, suffix = base, 1
+        while name in existing:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        return name
+    
+    def _promote_collection(self, name: str, previous: Optional[str]) -> None:
+        """
+        Aponta o alias para uma nova versão da coleção (troca atômica)
+        
+        A versão anterior é marcada como aposentada e removida pela coleta
+        de lixo após o período de carência.
+        
+        Args:
+            name: Nova versão da coleção
+            previous: Versão substituída (None se não havia coleção)
+        """
+        
+        alias = self._read_alias()
+        retired = alias.get('retired', [])
+        
+        if previous and previous != name:
+            retired.append({'collection': previous, 'retired_at': datetime.now().isoformat()})
+        
+        self._write_alias({
+            'collection': name,
+            'revision': alias.get('revision', 0) + 1,
+            'updated_at': datetime.now().isoformat(),
+            'retired': retired
+        })
+        self._resolve_collection_name()
+        logger.info(f"🔀 Alias '{self.collection_name}' aponta para '{name}'")
+    
+    def _drop_collection_version(self, name: str) -> None:
+        """Remove uma versão da coleção e suas estruturas auxiliares"""
+        
         try:
-            collection = self.client.get_collection(self.collection_name)
-            count = collection.count()
-            
-            # Obter todos os metadados para análise completa
-            all_data = collection.get(limit=count, include=['metadatas'])
-            
-            # Análise dos metadados
-            autores = {}
-            assuntos = {}
-            anos = {}
-            tipos_normas = {}
-            situacoes = {}
-            normas_unicas = set()
-            
-            for meta in all_data['metadatas']:
-                # Contagem de normas únicas
-                codigo_registro = meta.get('codigo_registro', '')
-                if codigo_registro:
-                    normas_unicas.add(codigo_registro)
-                
-                # Análise de autores
-                autor = meta.get('autor', 'Desconhecido')
-                autores[autor] = autores.get(autor, 0) + 1
-                
-                # Análise de assuntos
-                assunto = meta.get('assunto', 'Desconhecido')
-                assuntos[assunto] = assuntos.get(assunto, 0) + 1
-                
-                # Análise de anos
-                if meta.get('assinatura'):
-                    ano = meta['assinatura'][:4]
-                    anos[ano] = anos.get(ano, 0) + 1
-                
-                # Análise de tipos de normas
-                titulo = meta.get('titulo', '')
-                if titulo:
-                    titulo_upper = titulo.upper()
-                    if 'RESOLUÇÃO' in titulo_upper:
-                        tipo = 'Resolução'
-                    elif 'PORTARIA' in titulo_upper:
-                        tipo = 'Portaria'
-                    elif 'TERMO DE AUTORIZAÇÃO' in titulo_upper:
-                        tipo = 'Termo de Autorização'
-                    elif 'INSTRUÇÃO NORMATIVA' in titulo_upper:
-                        tipo = 'Instrução Normativa'
-                    elif 'DELIBERAÇÃO' in titulo_upper:
-                        tipo = 'Deliberação'
-                    elif 'ACÓRDÃO' in titulo_upper:
-                        tipo = 'Acórdão'
-                    else:
-                        tipo = 'Outros'
-                    
-                    tipos_normas[tipo] = tipos_normas.get(tipo, 0) + 1
-                
-                # Análise de situações
-                situacao = meta.get('situacao', 'Desconhecida')
-                situacoes[situacao] = situacoes.get(situacao, 0) + 1
-            
-            return {
-                'total_chunks': count,
-                'total_normas_unicas': len(normas_unicas),
-                'top_autores': dict(list(sorted(autores.items(), key=lambda x: x[1], reverse=True))[:10]),
-                'top_assuntos': dict(list(sorted(assuntos.items(), key=lambda x: x[1], reverse=True))[:10]),
-                'distribuicao_anos': dict(sorted(anos.items())),
-                'tipos_normas': dict(sorted(tipos_normas.items(), key=lambda x: x[1], reverse=True)),
-                'situacoes': dict(sorted(situacoes.items(), key=lambda x: x[1], reverse=True))
-            }
-            
+            self.client.delete_collection(name)
         except Exception as e:
-            logger.error(f"Erro ao obter estatísticas: {e}")
-            return {'error': str(e)}
+            logger.warning(f"⚠️ Não foi possível remover a coleção '{name}': {e}")
+        
+        try:
+            self.client.delete_collection(self._norma_collection_name(name))
+        except Exception:
+            pass
+        
+        for path in self._sidecar_paths(name):
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.exists():
+                path.unlink()
     
-    def get_vetorizacao_stats(self, parquet_path: str) -> Dict[str, Any]:
+    def garbage_collect_collections(self, grace_period_seconds: Optional[int] = None) -> List[str]:
         """
-        Obtém estatísticas de vetorização do arquivo parquet
+        Remove as versões aposentadas da coleção após o período de carência
         
         Args:
-            parquet_path: Caminho para o arquivo parquet
+            grace_period_seconds: Período de carência (padrão: collection_gc_grace_seconds)
             
         Returns:
-            Dicionário com estatísticas de vetorização
+            Nomes das versões removidas
         """
-        try:
-            df = pd.read_parquet(parquet_path)
+        
+        grace = self.collection_gc_grace_seconds if grace_period_seconds is None else grace_period_seconds
+        alias = self._read_alias()
+        if not alias.get('retired'):
+            return []
+        
+        now = datetime.now()
+        removed, kept = [], []
+        for entry in alias['retired']:
+            retired_at = datetime.fromisoformat(entry['retired_at'])
+            if (now - retired_at).total_seconds() >= grace and entry['collection'] != alias.get('collection'):
+                self._drop_collection_version(entry['collection'])
+                removed.append(entry['collection'])
+            else:
+                kept.append(entry)
+        
+        if removed:
+            self._write_alias({**alias, 'retired': kept})
+            logger.info(f"🗑️ Versões antigas da coleção removidas: {', '.join(removed)}")
+        
+        return removed
+    
+    def _get_collection(self):
+        """
+        Retorna o handle da versão ativa da coleção
+        
+        O handle é reutilizado entre buscas e trocado quando o alias passa a
+        apontar para outra versão (ex.: após uma reconstrução em outro processo).
+        """
+        
+        with self._lock:
+            name = self._resolve_collection_name()
+            if name != self.active_collection_name:
+                self._collection = None
+                self._bind_sidecars(name)
+            
+            if self._collection is None:
+                collection = self.client.get_collection(self.active_collection_name)
+                self._validate_embedding_backend(collection)
+                self._collection = collection
+            return self._collection
+    
+    def get_collection(self):
+        """Retorna a versão ativa da coleção (resolvendo o alias)"""
+        return self._get_collection()
+    
+    def get_collection_version(self) -> str:
+        """
+        Identificador da versão ativa da coleção
+        
+        Combina o nome da versão (trocado a cada reconstrução) com a revisão
+        do alias, avançada a cada gravação ou remoção de normas.
+        """
+        with self._lock:
+            self._get_collection()
+            return f"{self.active_collection_name}:{self._alias_revision}"
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Gera o embedding de uma consulta (com cache de consultas recentes)"""
+        return self._generate_query_embedding(query)
+    
+    def _collection_metadata(self) -> Dict[str, Any]:
+        """Metadados gravados na criação da coleção"""
+        metadata = {
+            "hnsw:space": "cosine",
+            "embedding_backend": self.embedding_backend.identity
+        }
+        if self.embedding_backend.dimensions:
+            metadata["embedding_dimensions"] = self.embedding_backend.dimensions
+        return metadata
+    
+    def _validate_embedding_backend(self, collection) -> None:
+        """
+        Recusa coleções criadas com outro backend de embedding
+        
+        Raises:
+            ValueError: Se o backend da coleção difere do configurado
+        """
+        
+        stored = (collection.metadata or {}).get("embedding_backend", LEGACY_EMBEDDING_BACKEND)
+        if stored != self.embedding_backend.identity:
+            raise ValueError(
+                f"Coleção '{collection.name}' foi criada com o backend '{stored}', "
+                f"mas o backend configurado é '{self.embedding_backend.identity}'. "
+                f"Use o mesmo backend ou reconstrua a coleção (force_rebuild=True)."
+            )
+    
+    def _iter_embedding_batches(self, token_counts: List[int]) -> List[List[int]]:
+        """
+        Agrupa índices de textos em lotes respeitando os limites de itens e tokens
+        
+        Args:
+            token_counts: Quantidade de tokens de cada texto
+            
+        Returns:
+            Lista de lotes, cada um com os índices dos textos
+        """
+        
+        batches = []
+        current_batch = []
+        current_tokens = 0
+        
+        for index, tokens in enumerate(token_counts):
+            if current_batch and (
+                len(current_batch) >= self.embedding_batch_size or
+                current_tokens + tokens > self.embedding_batch_tokens
+            ):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            
+            current_batch.append(index)
+            current_tokens += tokens
+        
+        if current_batch:
+            batches.append(current_batch)
+        
+        return batches
+    
+    @staticmethod
+    def _get_retry_after(error: Exception) -> Optional[float]:
+        """Extrai o cabeçalho retry-after de um erro 429, se disponível"""
+        try:
+            return float(error.response.headers.get('retry-after'))
+        except Exception:
+            return None
+    
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        """
+        Gera embeddings para um lote de textos em uma única chamada ao backend
+        
+        Args:
+            texts: Textos do lote
+            tokens: Total de tokens do lote (usado pelo limitador de taxa)
+            
+        Returns:
+            Embeddings na mesma ordem dos textos
+        """
+        
+        # Backends locais não têm cota a respeitar
+        if not self.embedding_backend.remote:
+            return self.embedding_backend.embed(texts)
+        
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                embeddings = self.embedding_backend.embed(texts)
+                self.rate_limiter.report_success()
+                return embeddings
+            except openai.RateLimitError as e:
+                if attempt == self.max_rate_limit_retries:
+                    raise
+                self.rate_limiter.report_rate_limit(self._get_retry_after(e))
+    
+    def _embed_batch_with_split(self, texts: List[str], token_counts: List[int]) -> List[Optional[List[float]]]:
+        """
+        Gera embeddings de um lote, dividindo-o ao meio em caso de falha
+        
+        Args:
+            texts: Textos do lote
+            token_counts: Tokens de cada texto
+            
+        Returns:
+            Embeddings na mesma ordem dos textos (None para textos que falharam isoladamente)
+        """
+        
+        try:
+            return self._embed_batch(texts, sum(token_counts))
+        except Exception as e:
+            if len(texts) == 1:
+                logger.error(f"Erro ao gerar embedding: {e}")
+                return [None]
+            
+            middle = len(texts) // 2
+            logger.warning(f"⚠️ Falha no lote de {len(texts)} textos ({e}). Dividindo em {middle} + {len(texts) - middle}...")
+            return (
+                self._embed_batch_with_split(texts[:middle], token_counts[:middle]) +
+                self._embed_batch_with_split(texts[middle:], token_counts[middle:])
+            )
+    
+    def _generate_embeddings_batch(
+        self, 
+        texts: List[str], 
+        token_counts: Optional[List[int]] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Gera embeddings para vários textos agrupando-os em requisições em lote
+        
+        Args:
+            texts: Textos para gerar embeddings
+            token_counts: Tokens de cada texto (calculados se não informados)
+            
+        Returns:
+            Embeddings na mesma ordem dos textos (None para textos que falharam)
+        """
+        
+        if token_counts is None:
+            token_counts = [self._count_tokens(text) for text in texts]
+        
+        # Consultar o cache antes de chamar a API
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.get_many(self.embedding_backend.identity, texts)
+        else:
+            embeddings = [None] * len(texts)
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+        
+        for batch in self._iter_embedding_batches([token_counts[i] for i in missing]):
+            batch_indices = [missing[i] for i in batch]
+            batch_texts = [texts[i] for i in batch_indices]
+            batch_embeddings = self._embed_batch_with_split(batch_texts, [token_counts[i] for i in batch_indices])
+            
+            if self.embedding_cache is not None:
+                self.embedding_cache.set_many(self.embedding_backend.identity, batch_texts, batch_embeddings)
+            
+            for index, embedding in zip(batch_indices, batch_embeddings):
+                embeddings[index] = embedding
+        
+        return embeddings
+    
+    def _generate_document_id(self, codigo_registro: str, chunk_index: int) -> str:
+        """Gera ID único para documento"""
+        return f"{codigo_registro}_chunk_{chunk_index}"
+    
+    def _get_status_ledger(self, parquet_path: str) -> VetorizacaoLedger:
+        """Retorna o ledger de status de vetorização associado ao parquet"""
+        key = str(Path(parquet_path).resolve())
+        if key not in self._status_ledgers:
+            self._status_ledgers[key] = VetorizacaoLedger.for_parquet(parquet_path)
+        return self._status_ledgers[key]
+    
+    def _atualizar_status_vetorizacao(self, parquet_path: str, codigos_registro: List[str]) -> None:
+        """
+        Registra o status de vetorização das normas no ledger do parquet
+        
+        O parquet em si só é reescrito uma vez por execução, na compactação
+        feita ao final de load_and_process_data.
+        
+        Args:
+            parquet_path: Caminho para o arquivo parquet
+            codigos_registro: Lista de códigos de registro das normas processadas
+        """
+        try:
+            self._get_status_ledger(parquet_path).registrar(codigos_registro, vetorizado=True)
+        except Exception as e:
+            logger.error(f"❌ Erro ao atualizar status de vetorização: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def _norma_text(self, norma: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Texto que representa a norma inteira na coleção de primeiro estágio
+        
+        Título, assunto, autor e tipo, seguidos do início do texto (chunks
+        iniciais até chunk_size tokens), onde ficam a ementa e os primeiros
+        artigos.
+        
+        Returns:
+            Tupla (texto, tokens)
+        """
+        
+        metadata = norma['metadata']
+        header = (
+            f"TÍTULO: {metadata['titulo']}\n"
+            f"ASSUNTO: {metadata['assunto']}\n"
+            f"AUTOR: {metadata['autor']}\n"
+            f"TIPO: {metadata['tipo_material']}"
+        )
+        
+        parts, tokens = [header], self._count_tokens(header)
+        leading_tokens = 0
+        for chunk in norma['chunks']:
+            if leading_tokens and leading_tokens + chunk['metadata']['tokens'] > self.chunk_size:
+                break
+            parts.append(chunk['text'])
+            leading_tokens += chunk['metadata']['tokens']
+        
+        return "\n\n".join(parts), tokens + leading_tokens
+    
+    def _embed_pending_normas(self, pending: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Gera embeddings de um lote de normas (executado pelas threads de embedding)
+        
+        Args:
+            pending: Normas acumuladas com seus chunks
+            
+        Returns:
+            Dados prontos para inserção no banco vetorial
+        """
+        
+        texts = [chunk['text'] for norma in pending for chunk in norma['chunks']]
+        token_counts = [chunk['metadata']['tokens'] for norma in pending for chunk in norma['chunks']]
+        
+        # Texto próprio de cada norma (primeiro estágio), no mesmo lote que os chunks
+        norma_texts = [self._norma_text(norma) for norma in pending]
+        embeddings = self._generate_embeddings_batch(
+            texts + [text for text, _ in norma_texts],
+            token_counts + [tokens for _, tokens in norma_texts]
+        )
+        norma_vectors = embeddings[len(texts):]
+        
+        prepared = {
+            'documents': [],
+            'embeddings': [],
+            'ids': [],
+            'metadatas': [],
+            'normas': [],
+            'norma_embeddings': [],
+            'falhas': []
+        }
+        
+        position = 0
+        for norma, norma_vector in zip(pending, norma_vectors):
+            norma_embeddings = embeddings[position:position + len(norma['chunks'])]
+            position += len(norma['chunks'])
+            
+            # Uma norma só é inserida se todos os seus chunks (e o texto da norma) tiverem embedding
+            if norma_vector is None or any(embedding is None for embedding in norma_embeddings):
+                logger.error(f"❌ Erro ao processar norma {norma['codigo_registro']}: falha ao gerar embeddings")
+                prepared['falhas'].append(norma['codigo_registro'])
+                continue
+            
+            for chunk, embedding in zip(norma['chunks'], norma_embeddings):
+                prepared['documents'].append(chunk['text'])
+                prepared['embeddings'].append(embedding)
+                prepared['ids'].append(self._generate_document_id(
+                    chunk['metadata']['codigo_registro'], 
+                    chunk['metadata']['chunk_index']
+                ))
+                prepared['metadatas'].append(chunk_metadata(chunk['metadata']))
+            
+            prepared['normas'].append(norma)
+            prepared['norma_embeddings'].append(norma_vector)
+        
+        return prepared
+    
+    def _write_embedded_normas(
+        self, 
+        collection, 
+        sidecars: _VersionSidecars, 
+        prepared: Dict[str, Any], 
+        parquet_path: str, 
+        incremental: bool
+    ) -> Tuple[int, List[str]]:
+        """
+        Insere no banco vetorial um lote de normas já com embeddings (executado pela thread de escrita)
+        
+        As normas são gravadas com upsert: chunks de uma versão anterior da
+        norma são substituídos e os que sobrarem (ex.: _chunk_N além do novo
+        total de chunks) são removidos. Regravar o mesmo lote é idempotente.
+        
+        Args:
+            collection: Coleção do ChromaDB
+            sidecars: Estruturas auxiliares da mesma versão da coleção
+            prepared: Dados retornados por _embed_pending_normas
+            parquet_path: Caminho para o arquivo parquet
+            incremental: Se deve atualizar o status de vetorização
+            
+        Returns:
+            Tupla (chunks inseridos, códigos das normas processadas)
+        """
+        
+        codigos = [norma['codigo_registro'] for norma in prepared['normas']]
+        
+        if prepared['documents']:
+            # Chunks já gravados destas normas (versão anterior ou execução interrompida)
+            existing = collection.get(
+                where={'codigo_registro': {'$in': codigos}},
+                include=['metadatas']
+            )
+            new_ids = set(prepared['ids'])
+            orphan_ids = [chunk_id for chunk_id in existing['ids'] if chunk_id not in new_ids]
+            
+            collection.upsert(
+                documents=prepared['documents'],
+                embeddings=prepared['embeddings'],
+                ids=prepared['ids'],
+                metadatas=prepared['metadatas']
+            )
+            if orphan_ids:
+                collection.delete(ids=orphan_ids)
+                logger.info(f"🗑️ {len(orphan_ids)} chunks obsoletos removidos")
+            
+            # Campos da norma gravados uma única vez, fora dos chunks
+            normas = [(norma['metadata'], len(norma['chunks'])) for norma in prepared['normas']]
+            sidecars.collection_stats.remove(sidecars.document_store.join(existing['metadatas']))
+            sidecars.document_store.upsert(normas)
+            sidecars.document_store.set_artigos({
+                norma['codigo_registro']: [
+                    (artigo, chunk['metadata']['chunk_index'])
+                    for chunk in norma['chunks'] for artigo in chunk['metadata'].get('artigos', [])
+                ]
+                for norma in prepared['normas']
+            })
+            sidecars.collection_stats.add_normas(normas)
+            sidecars.collection_stats.save()
+            sidecars.vector_index_stale = True
+            if sidecars.lexical_index is not None:
+                sidecars.lexical_index.remove(orphan_ids)
+                sidecars.lexical_index.add(prepared['ids'], prepared['documents'], prepared['metadatas'])
+            sidecars.reference_index.remove(codigos)
+            sidecars.reference_index.add(norma['metadata'] for norma in prepared['normas'])
+            sidecars.reference_index.save()
+            self._get_norma_collection(create=True, sidecars=sidecars).upsert(
+                ids=codigos,
+                embeddings=prepared['norma_embeddings'],
+                metadatas=[chunk_metadata(norma['metadata']) for norma in prepared['normas']]
+            )
+            
+            # Coleção ativa alterada (uma nova versão ganha revisão ao ser ativada)
+            if sidecars is self._sidecars:
+                self._bump_revision()
+        
+        for norma in prepared['normas']:
+            logger.info(f"📄 Processado e salvo: {norma['titulo']} (Código: {norma['codigo_registro']}) - {len(norma['chunks'])} chunks")
+        
+        # Hash do conteúdo vetorizado (detecção de alterações)
+        conteudos = {
+            norma['codigo_registro']: (norma['content_hash'], len(norma['chunks']), norma['metadata']['fingerprint'])
+            for norma in prepared['normas']
+        }
+        
+        if self._deferred_ledger is not None:
+            # Reconstrução em nova versão: registrar apenas quando ela for ativada
+            self._deferred_ledger['conteudos'].update(conteudos)
+            if incremental:
+                self._deferred_ledger['vetorizados'].extend(codigos)
+        else:
+            if conteudos:
+                self._get_status_ledger(parquet_path).registrar_conteudo(conteudos)
+            
+            # Atualizar status de vetorização do lote
+            if incremental and codigos:
+                self._atualizar_status_vetorizacao(parquet_path, codigos)
+        
+        return len(prepared['documents']), codigos
+    
+    def _submit_pending(self, executor: ThreadPoolExecutor, pending: List[Dict[str, Any]]) -> Tuple[Any, List[str]]:
+        """Envia um lote de normas às threads de embedding; retorna (future, códigos do lote)"""
+        return executor.submit(self._embed_pending_normas, pending), [norma['codigo_registro'] for norma in pending]
+    
+    def _run_writer(
+        self, 
+        collection, 
+        sidecars: _VersionSidecars, 
+        futures: "queue.Queue", 
+        parquet_path: str, 
+        incremental: bool, 
+        results: Dict[str, Any]
+    ) -> None:
+        """
+        Thread única de escrita: consome os lotes na ordem de submissão e grava no ChromaDB
+        
+        Args:
+            collection: Coleção do ChromaDB
+            sidecars: Estruturas auxiliares da mesma versão da coleção
+            futures: Fila de (future, códigos do lote) das threads de embedding (None encerra a thread)
+            parquet_path: Caminho para o arquivo parquet
+            incremental: Se deve atualizar o status de vetorização
+            results: Dicionário onde são acumulados os totais e as normas com falha
+        """
+        
+        while True:
+            item = futures.get()
+            if item is None:
+                break
+            
+            future, codigos_lote = item
+            try:
+                prepared = future.result()
+                falhas = prepared['falhas']
+                chunks_inseridos, codigos = self._write_embedded_normas(
+                    collection, sidecars, prepared, parquet_path, incremental
+                )
+                results['total_chunks'] += chunks_inseridos
+                results['normas_processadas'].extend(codigos)
+                results['titulos'].update((norma['codigo_registro'], norma['titulo']) for norma in prepared['normas'])
+            except Exception as e:
+                logger.error(f"❌ Erro ao gravar lote de {len(codigos_lote)} normas: {e}")
+                falhas = codigos_lote
+            
+            if falhas:
+                self._registrar_falhas(parquet_path, falhas, results)
+    
+    def _registrar_falhas(self, parquet_path: str, codigos: List[str], results: Dict[str, Any]) -> None:
+        """
+        Registra normas que não puderam ser vetorizadas
+        
+        As normas entram em results['falhas'] e, fora de uma reconstrução
+        (que é descartada quando há falhas), recebem no ledger o status
+        não vetorizado, para serem reprocessadas na próxima execução.
+        """
+        
+        results['falhas'].extend(codigos)
+        if self._deferred_ledger is not None:
+            return
+        
+        try:
+            self._get_status_ledger(parquet_path).registrar(codigos, vetorizado=False)
+        except Exception as e:
+            logger.error(f"❌ Erro ao registrar falhas de vetorização: {e}")
+    
+    def _validate_collection_build(self, collection, sidecars: _VersionSidecars, expected_chunks: int) -> None:
+        """
+        Valida uma nova versão da coleção antes de ativá-la
+        
+        Verifica o total de chunks, a consistência do índice léxico e uma
+        consulta de teste: o vetor de um chunk deve recuperar o próprio chunk.
+        
+        Raises:
+            ValueError: Se alguma verificação falhar
+        """
+        
+        count = collection.count()
+        if count == 0 or count != expected_chunks:
+            raise ValueError(f"Nova versão com {count} chunks (esperados {expected_chunks})")
+        
+        if sidecars.lexical_index is not None and sidecars.lexical_index.count() != count:
+            raise ValueError(f"Índice léxico com {sidecars.lexical_index.count()} chunks (esperados {count})")
+        
+        if sidecars.document_store.total_chunks() != count:
+            raise ValueError(f"Metadados de normas cobrindo {sidecars.document_store.total_chunks()} chunks (esperados {count})")
+        
+        norma_collection = self._get_norma_collection(sidecars=sidecars)
+        if norma_collection is None or norma_collection.count() != sidecars.document_store.count():
+            raise ValueError(f"Coleção de primeiro estágio incompleta (esperadas {sidecars.document_store.count()} normas)")
+        
+        sample = collection.get(limit=1, include=['embeddings'])
+        results = collection.query(
+            query_embeddings=[sample['embeddings'][0]],
+            n_results=min(5, count),
+            include=['distances']
+        )
+        if sample['ids'][0] not in results['ids'][0]:
+            raise ValueError("Consulta de teste não recuperou o chunk de referência")
+        
+        logger.info(f"✅ Nova versão validada: {count} chunks")
+    
+    def _finish_collection_build(
+        self, 
+        collection, 
+        sidecars: _VersionSidecars, 
+        previous_name: str, 
+        expected_chunks: int, 
+        parquet_path: str
+    ) -> None:
+        """Valida a nova versão, grava o status adiado no ledger e troca o alias e as estruturas das buscas"""
+        
+        self._validate_collection_build(collection, sidecars, expected_chunks)
+        
+        # Deixar o índice em NumPy pronto antes de expor a nova versão
+        if sidecars.vector_index is not None:
+            self._build_vector_index(collection, sidecars)
+        
+        deferred, self._deferred_ledger = self._deferred_ledger, None
+        if deferred:
+            self._get_status_ledger(parquet_path).registrar_conteudo(deferred['conteudos'])
+            self._atualizar_status_vetorizacao(parquet_path, deferred['vetorizados'])
+        
+        with self._lock:
+            self._promote_collection(sidecars.name, previous_name)
+            self._activate(collection, sidecars)
+        
+        self.garbage_collect_collections()
+    
+    def _abandon_collection_build(self, sidecars: _VersionSidecars, previous_name: str) -> None:
+        """Descarta uma versão em construção (as buscas nunca deixaram de usar a versão ativa)"""
+        
+        logger.warning(f"⚠️ Reconstrução não concluída; mantendo a versão '{previous_name}'")
+        
+        self._deferred_ledger = None
+        sidecars.close()
+        self._drop_collection_version(sidecars.name)
+    
+    def load_and_process_data(self, parquet_path: str, force_rebuild: bool = False, sample_size: Optional[int] = None, incremental: bool = True) -> bool:
+        """
+        Carrega e processa dados do parquet para o banco vetorial
+        
+        Args:
+            parquet_path: Caminho para o arquivo parquet
+            force_rebuild: Se deve reconstruir o banco mesmo se existir
+            sample_size: Tamanho da amostra para teste
+            incremental: Se deve processar apenas normas não vetorizadas
+            
+        Returns:
+            True se processado com sucesso
+        """
+        
+        current_name = self._resolve_collection_name()
+        build = None
+        
+        try:
+            # Verificar se coleção já existe (versão ativa do alias)
+            collection_exists = False
+            try:
+                collection = self.client.get_collection(current_name)
+                collection_exists = True
+                if not force_rebuild:
+                    count = collection.count()
+                    logger.info(f"Coleção já existe com {count} documentos")
+            except:
+                pass
+            
+            if force_rebuild or not collection_exists:
+                # Criar uma nova versão da coleção, com handles e estruturas próprios.
+                # Numa reconstrução, a versão ativa continua atendendo as buscas até
+                # a nova ser validada
+                build_name = self._new_collection_name()
+                if collection_exists:
+                    logger.info(f"Reconstruindo banco vetorial na nova versão '{build_name}'...")
+                
+                collection = self.client.create_collection(
+                    name=build_name,
+                    metadata=self._collection_metadata()
+                )
+                sidecars = self._open_sidecars(build_name)
+                sidecars.collection_stats.reset()
+                sidecars.collection_stats.save()
+                if sidecars.lexical_index is not None:
+                    sidecars.lexical_index.clear()
+                sidecars.reference_index.clear()
+                sidecars.reference_index.save()
+                sidecars.document_store.clear()
+                
+                if collection_exists:
+                    # O ledger só é atualizado quando a nova versão for ativada
+                    self._deferred_ledger = {'vetorizados': [], 'conteudos': {}}
+                    build = sidecars
+                else:
+                    # Primeira coleção: não há versão anterior a preservar
+                    with self._lock:
+                        self._promote_collection(build_name, None)
+                        self._activate(collection, sidecars)
+            else:
+                # Não misturar vetores de backends diferentes na mesma coleção
+                self._validate_embedding_backend(collection)
+                with self._lock:
+                    self._bind_sidecars(current_name)
+                    self._collection = collection
+                    sidecars = self._sidecars
+            
+            # Carregar apenas as colunas de filtro; o texto é lido depois, em lotes
+            logger.info(f"Carregando dados de: {parquet_path}")
+            reader = NormasParquetReader(parquet_path)
+            df = reader.scan_filtros(com_fingerprint=True)
+            
+            # Status de vetorização = coluna do parquet + entradas do ledger ainda não compactadas
+            status_ledger = self._get_status_ledger(parquet_path)
+            df = status_ledger.aplicar_status(df)
+            
+            # Filtrar apenas normas em vigor com conteúdo
+            df_filtered = df[
+                (df['situacao'] == 'Em vigor') & 
+                (df['tamanho_conteudo'] > 100)
+            ].copy()
+            
+            # Se modo incremental, filtrar as normas não vetorizadas e as alteradas desde a vetorização
+            if incremental and not force_rebuild:
+                codigos = df_filtered['codigo_registro'].astype(str)
+                stored_hash = codigos.map(status_ledger.get_hashes())
+                
+                # Só as normas com impressão digital (metadados + tamanho do texto) diferente da
+                # registrada têm o texto lido e o hash recalculado
+                verificar = stored_hash.notna() & (codigos.map(status_ledger.get_fingerprints()) != df_filtered['fingerprint'])
+                legadas = df_filtered['vetorizado'] & stored_hash.isna()
+                hashes = reader.content_hashes(df_filtered.loc[verificar | legadas, '_posicao'].values)
+                current_hash = codigos.map(hashes)
+                alteradas = verificar & (current_hash != stored_hash)
+                
+                # Normas vetorizadas antes do registro de hashes: adotar o hash atual sem revetorizar
+                if legadas.any():
+                    status_ledger.registrar_conteudo({
+                        codigo: (hashes[codigo], None, fingerprint)
+                        for codigo, fingerprint in zip(codigos[legadas], df_filtered.loc[legadas, 'fingerprint'])
+                    })
+                
+                # Impressão digital mudou, mas o conteúdo não: registrar a nova para não recalcular o hash
+                inalteradas = verificar & ~alteradas
+                if inalteradas.any():
+                    status_ledger.atualizar_fingerprints(dict(zip(codigos[inalteradas], df_filtered.loc[inalteradas, 'fingerprint'])))
+                
+                novas = ~df_filtered['vetorizado']
+                df_filtered = df_filtered[novas | alteradas].copy()
+                logger.info(
+                    f"Modo incremental: {int((novas & ~alteradas).sum())} normas não vetorizadas e "
+                    f"{int(alteradas.sum())} alteradas desde a vetorização"
+                )
+            else:
+                logger.info(f"Processando todas as {len(df_filtered)} normas em vigor com conteúdo...")
+            
+            # Aplicar amostra se especificado
+            if sample_size and sample_size < len(df_filtered):
+                df_filtered = df_filtered.sample(n=sample_size, random_state=42).sort_values('_posicao')
+                logger.info(f"Usando amostra de {sample_size} normas para teste rápido...")
+            
+            if len(df_filtered) == 0:
+                logger.info("Nenhuma norma para processar!")
+                self.ensure_indexes()
+                return True
+            
+            logger.info(f"Processando {len(df_filtered)} normas...")
+            
+            # Acumular normas em lotes (limitados por tokens e itens). Os lotes são
+            # embedados por um pool de threads e gravados, em ordem, por uma única
+            # thread de escrita no ChromaDB.
+            results = {'total_chunks': 0, 'normas_processadas': [], 'titulos': {}, 'falhas': []}
+            futures: "queue.Queue" = queue.Queue(maxsize=self.embedding_workers * 2)
+            executor = ThreadPoolExecutor(max_workers=self.embedding_workers, thread_name_prefix="embedding")
+            writer = threading.Thread(
+                target=self._run_writer,
+                args=(collection, sidecars, futures, parquet_path, incremental, results),
+                name="chroma-writer"
+            )
+            writer.start()
+            
+            pending: List[Dict[str, Any]] = []
+            pending_chunks = 0
+            pending_tokens = 0
+            
+            try:
+                # Chunks gerados em ordem (opcionalmente por um pool de processos)
+                documentos_chunks = self.chunker.chunk_many(
+                    self._iter_documentos(reader, df_filtered),
+                    processes=self.chunk_processes
+                )
+                
+                for (_, metadata), chunks in documentos_chunks:
+                    chunk_tokens = sum(chunk['metadata']['tokens'] for chunk in chunks)
+                    
+                    # Enviar o lote acumulado antes de ultrapassar o orçamento
+                    if pending and (
+                        pending_chunks + len(chunks) > self.embedding_batch_size or
+                        pending_tokens + chunk_tokens > self.embedding_batch_tokens
+                    ):
+                        futures.put(self._submit_pending(executor, pending))
+                        pending, pending_chunks, pending_tokens = [], 0, 0
+                    
+                    pending.append({
+                        'codigo_registro': metadata['codigo_registro'],
+                        'titulo': metadata['titulo'],
+                        'content_hash': metadata['content_hash'],
+                        'metadata': metadata,
+                        'chunks': chunks
+                    })
+                    pending_chunks += len(chunks)
+                    pending_tokens += chunk_tokens
+                
+                if pending:
+                    futures.put(self._submit_pending(executor, pending))
+            finally:
+                # Aguardar a gravação de todos os lotes
+                futures.put(None)
+                writer.join()
+                executor.shutdown(wait=True)
+            
+            total_chunks = results['total_chunks']
+            normas_processadas = results['normas_processadas']
+            falhas = results['falhas']
+            
+            # Uma versão nova só é ativada se todas as normas foram gravadas
+            if falhas and build is not None:
+                raise ValueError(f"{len(falhas)} normas não puderam ser vetorizadas na nova versão")
+            
+            # Reconstrução: validar a nova versão e trocar o alias
+            if build is not None:
+                self._finish_collection_build(collection, build, current_name, total_chunks, parquet_path)
+                build = None
+            
+            # Gravar o status no parquet uma única vez por execução
+            if incremental and normas_processadas:
+                status_ledger.compactar(parquet_path)
+            
+            logger.info(f"✅ Processamento concluído! {total_chunks} chunks inseridos no banco vetorial")
+            logger.info(f"✅ {len(normas_processadas)} normas marcadas como vetorizadas")
+            
+            if self.embedding_cache is not None:
+                cache_stats = self.embedding_cache.get_stats()
+                logger.info(f"💾 Cache de embeddings: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas ({cache_stats['hit_rate']:.1%})")
+            
+            # Listar nomes das normas vetorizadas
+            if normas_processadas:
+                logger.info("📋 NORMAS VETORIZADAS NESTE LOTE:")
+                titulos = results['titulos']
+                for codigo in normas_processadas:
+                    if codigo in titulos:
+                        logger.info(f"   • {titulos[codigo]} (Código: {codigo})")
+            
+            # Cópia dos vetores em NumPy e demais índices auxiliares desatualizados
+            self.ensure_indexes()
+            
+            if falhas:
+                logger.error(f"❌ {len(falhas)} normas não puderam ser vetorizadas: {', '.join(falhas[:20])}")
+                return False
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar dados: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+        
+        finally:
+            # Reconstrução interrompida ou reprovada: descartar a nova versão
+            if build is not None:
+                self._abandon_collection_build(build, current_name)
+    
+    @staticmethod
+    def _build_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Converte os filtros de metadados no formato where do ChromaDB (None se vazio)"""
+        
+        clauses = []
+        for key, value in (filters or {}).items():
+            if value is None:
+                continue
+            if key == '$and':
+                clauses.extend(value)
+            elif isinstance(value, dict) and len(value) > 1:
+                # O ChromaDB aceita um operador por campo: intervalos viram cláusulas separadas
+                clauses.extend({key: {operator: operand}} for operator, operand in value.items())
+            else:
+                clauses.append({key: value})
+        
+        if not clauses:
+            return None
+        
+        # O ChromaDB exige $and para combinar mais de um campo
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+    
+    def _translate_norma_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Traduz filtros sobre campos que só existem na norma (autor, assunto, título...)
+        
+        Os chunks levam apenas os campos de CHUNK_METADATA_FIELDS; os demais
+        filtros são resolvidos nos metadados por norma e viram uma condição
+        codigo_registro $in sobre as normas encontradas.
+        
+        Args:
+            filters: Filtros de metadados
+            
+        Returns:
+            Filtros equivalentes sobre os campos dos chunks ({} sem filtros;
+            None se nenhuma norma os atende)
+        """
+        
+        norma_filters = {
+            key: value for key, value in (filters or {}).items()
+            if not key.startswith('$') and key not in CHUNK_METADATA_FIELDS and value is not None
+        }
+        if not norma_filters:
+            return filters or {}
+        
+        codigos = self.document_store.find_codigos(norma_filters)
+        if not codigos:
+            logger.info(f"🔎 Nenhuma norma atende aos filtros {norma_filters}")
+            return None
+        
+        # Um filtro por codigo_registro já informado continua valendo, combinado por $and
+        translated = {key: value for key, value in filters.items() if key not in norma_filters}
+        if 'codigo_registro' in translated:
+            translated['$and'] = list(translated.get('$and', [])) + [{'codigo_registro': translated.pop('codigo_registro')}]
+        translated['codigo_registro'] = {'$in': codigos}
+        return translated
+    
+    @staticmethod
+    def date_range_filter(inicio: Any = None, fim: Any = None, campo: str = 'assinatura') -> Dict[str, Any]:
+        """
+        Monta um filtro por intervalo de datas
+        
+        O resultado pode ser combinado com outros filtros:
+        search(query, filters={'situacao': 'Em vigor', **date_range_filter(2019, 2021)})
+        
+        Args:
+            inicio: Ano (int), data ou 'AAAA-MM-DD' inicial, inclusive (None = sem limite)
+            fim: Ano (int), data ou 'AAAA-MM-DD' final, inclusive (None = sem limite)
+            campo: 'assinatura' ou 'publicacao'
+            
+        Returns:
+            Filtro sobre o epoch da data ({} se o intervalo for aberto nos dois lados)
+        """
+        
+        if campo not in ('assinatura', 'publicacao'):
+            raise ValueError(f"Campo de data desconhecido: {campo} (opções: assinatura, publicacao)")
+        
+        def epoch(valor: Any, fim_do_ano: bool) -> int:
+            if isinstance(valor, int):
+                valor = f"{valor}-12-31" if fim_do_ano else f"{valor}-01-01"
+            return int(pd.Timestamp(valor).timestamp())
+        
+        condicao = {}
+        if inicio is not None:
+            condicao['$gte'] = epoch(inicio, False)
+        if fim is not None:
+            condicao['$lte'] = epoch(fim, True)
+        
+        return {f'{campo}_ts': condicao} if condicao else {}
+    
+    def _search_dense(
+        self, 
+        collection, 
+        query_embedding: List[float], 
+        n_results: int, 
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Busca vetorial (HNSW do ChromaDB ou exata em NumPy)"""
+        return self._search_dense_many(collection, [query_embedding], n_results, where)[0]
+    
+    def _search_dense_many(
+        self, 
+        collection, 
+        query_embeddings: List[List[float]], 
+        n_results: int, 
+        where: Optional[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        """Busca vetorial de várias consultas (uma única chamada ao ChromaDB)"""
+        
+        # Busca exata em memória (sem perda de recall do HNSW); sem uma cópia
+        # consistente dos vetores, a busca segue pelo HNSW do ChromaDB
+        vector_index = self._get_vector_index(collection) if self.search_backend == "exact" else None
+        if vector_index is not None:
+            return [
+                self._search_exact(collection, vector_index, query_embedding, n_results, where)
+                for query_embedding in query_embeddings
+            ]
+        
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=['documents', 'metadatas', 'distances']
+        )
+        
+        # Formatar resultados
+        all_results = []
+        for q in range(len(query_embeddings)):
+            formatted_results = []
+            for i in range(len(results['documents'][q])):
+                formatted_results.append({
+                    'id': results['ids'][q][i],
+                    'document': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'similarity': 1 - results['distances'][q][i],  # Converter distância para similaridade
+                    'distance': results['distances'][q][i]
+                })
+            all_results.append(formatted_results)
+        
+        return all_results
+    
+    def _search_mode(self, collection, mode: Optional[str]) -> str:
+        """
+        Modo de busca efetivo
+        
+        Sem índice léxico, ou com um índice inconsistente com a coleção, a
+        busca é apenas densa (o índice não é reconstruído durante a busca).
+        """
+        
+        mode = mode or self.retrieval_mode
+        if mode == 'dense':
+            return mode
+        
+        lexical_index = self.lexical_index
+        if lexical_index is None or not self._index_consistent(
+            'lexical',
+            lambda: lexical_index.count() == collection.count(),
+            "Índice léxico ausente ou desatualizado; buscando só por similaridade vetorial."
+        ):
+            return 'dense'
+        return mode
+    
+    def _search_lexical(
+        self, 
+        collection, 
+        query: str, 
+        n_results: int, 
+        where: Optional[Dict[str, Any]], 
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca léxica (BM25), sem chamada à API de embeddings
+        
+        Se o embedding da consulta for informado, a similaridade de cada
+        resultado é o cosseno com o vetor do chunk; caso contrário, é o
+        score BM25 relativo ao melhor resultado.
+        """
+        
+        # Com filtros, buscar mais candidatos: parte deles será descartada
+        candidates = max(n_results * 5, 50) if where else n_results
+        scored = self.lexical_index.search(query, candidates)
+        if not scored:
+            return []
+        
+        include = ['documents', 'metadatas'] + (['embeddings'] if query_embedding is not None else [])
+        found = collection.get(ids=[chunk_id for chunk_id, _ in scored], where=where, include=include)
+        
+        by_id = {chunk_id: i for i, chunk_id in enumerate(found['ids'])}
+        best_score = scored[0][1] or 1.0
+        
+        if query_embedding is not None and found['ids']:
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            vectors = np.asarray(found['embeddings'], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+            norms[norms == 0] = 1.0
+            similarities = vectors @ query_vector / norms
+        
+        formatted_results = []
+        for chunk_id, score in scored:
+            if chunk_id not in by_id:
+                continue
+            i = by_id[chunk_id]
+            similarity = float(similarities[i]) if query_embedding is not None else score / best_score
+            formatted_results.append({
+                'id': chunk_id,
+                'document': found['documents'][i],
+                'metadata': found['metadatas'][i],
+                'similarity': similarity,
+                'distance': 1 - similarity,
+                'bm25_score': score
+            })
+            if len(formatted_results) >= n_results:
+                break
+        
+        return formatted_results
+    
+    def _index_consistent(self, name: str, check, warning: str) -> bool:
+        """
+        Verifica se um índice auxiliar da versão ativa está consistente com a coleção
+        
+        A verificação é feita uma vez por revisão do alias; as buscas nunca
+        reconstroem índices (isso fica para ensure_indexes, chamado na
+        ingestão e nos scripts de manutenção).
+        
+        Args:
+            name: Nome do índice
+            check: Função sem argumentos que retorna se o índice está consistente
+            warning: Mensagem registrada quando não está
+        """
+        
+        with self._lock:
+            sidecars, revision = self._sidecars, self._alias_revision
+            cached = sidecars.checks.get(name)
+            if cached is None or cached[0] != revision:
+                consistent = bool(check())
+                if not consistent:
+                    logger.warning(f"⚠️ {warning} Execute ensure_indexes() (ou um script de manutenção) para reconstruí-lo.")
+                cached = sidecars.checks[name] = (revision, consistent)
+        return cached[1]
+    
+    def _first_stage_consistent(self, sidecars: _VersionSidecars) -> bool:
+        """Se a coleção de primeiro estágio tem um vetor para cada norma armazenada"""
+        
+        norma_collection = self._get_norma_collection(sidecars=sidecars)
+        try:
+            return norma_collection is not None and norma_collection.count() == sidecars.document_store.count()
+        except Exception:
+            # Handle invalidado (coleção removida): obter novamente na próxima verificação
+            sidecars.norma_collection = None
+            return False
+    
+    def _get_first_stage(self, collection):
+        """
+        Retorna a coleção de primeiro estágio, se estiver consistente com as normas armazenadas
+        
+        Returns:
+            Coleção do ChromaDB (None se a busca em dois estágios estiver desativada
+            ou se a coleção estiver desatualizada: a busca segue em um estágio)
+        """
+        
+        if not self.first_stage_normas:
+            return None
+        
+        sidecars = self._sidecars
+        if not self._index_consistent(
+            'first_stage',
+            lambda: self._first_stage_consistent(sidecars),
+            "Coleção de primeiro estágio ausente ou desatualizada; buscando em um estágio."
+        ):
+            return None
+        
+        return self._get_norma_collection(sidecars=sidecars)
+    
+    @staticmethod
+    def _restrict_where(where: Optional[Dict[str, Any]], codigos: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        """Acrescenta ao filtro where a restrição às normas informadas (None = sem restrição)"""
+        if not codigos:
+            return where
+        condicao = {'codigo_registro': {'$in': list(codigos)}}
+        return {'$and': [where, condicao]} if where else condicao
+    
+    def _first_stage_normas(
+        self, 
+        collection, 
+        query_embeddings: List[List[float]], 
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Optional[List[str]]]:
+        """
+        Primeiro estágio da busca: as normas mais próximas de cada consulta
+        
+        Os filtros sobre campos da norma também são aplicados às normas; se o
+        primeiro estágio estiver indisponível ou não retornar normas, a busca
+        segue sem restrição.
+        
+        Returns:
+            Códigos das normas selecionadas para cada consulta (None = sem restrição)
+        """
+        
+        norma_collection = self._get_first_stage(collection)
+        if norma_collection is None or norma_collection.count() == 0:
+            return [None] * len(query_embeddings)
+        
+        norma_where = self._build_where({
+            key: value for key, value in (filters or {}).items() if key in NORMA_FILTER_FIELDS
+        })
+        results = norma_collection.query(
+            query_embeddings=query_embeddings,
+            n_results=min(self.first_stage_normas, norma_collection.count()),
+            where=norma_where,
+            include=['distances']
+        )
+        
+        return [codigos or None for codigos in results['ids']]
+    
+    def _search_dense_first_stage(
+        self, 
+        collection, 
+        query_embeddings: List[List[float]], 
+        n_results: int, 
+        where: Optional[Dict[str, Any]], 
+        normas: List[Optional[List[str]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Segundo estágio de várias consultas, cada uma restrita às suas normas
+        
+        As consultas restritas são buscadas em uma única chamada sobre a
+        união das normas candidatas e os resultados de cada uma são filtrados
+        pelas suas próprias normas; só a consulta que ficar com menos de
+        n_results resultados após o filtro é refeita individualmente.
+        
+        Args:
+            collection: Coleção do ChromaDB
+            query_embeddings: Embeddings das consultas
+            n_results: Número de resultados por consulta
+            where: Filtro where comum a todas as consultas
+            normas: Normas de cada consulta (retorno de _first_stage_normas)
+            
+        Returns:
+            Uma lista de resultados por consulta
+        """
+        
+        all_results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        
+        livres = [i for i, codigos in enumerate(normas) if codigos is None]
+        if livres:
+            found = self._search_dense_many(collection, [query_embeddings[i] for i in livres], n_results, where)
+            for i, results in zip(livres, found):
+                all_results[i] = results
+        
+        restritas = [i for i, codigos in enumerate(normas) if codigos is not None]
+        if not restritas:
+            return all_results
+        
+        uniao = sorted(set(codigo for i in restritas for codigo in normas[i]))
+        candidates = n_results * min(len(restritas), self.FIRST_STAGE_OVERFETCH)
+        found = self._search_dense_many(
+            collection, [query_embeddings[i] for i in restritas], candidates, self._restrict_where(where, uniao)
+        )
+        
+        for i, results in zip(restritas, found):
+            proprias = set(normas[i])
+            filtered = [result for result in results if result['metadata']['codigo_registro'] in proprias][:n_results]
+            
+            # Resultados das normas de outras consultas ocuparam os candidatos: buscar só nas próprias
+            if len(filtered) < n_results and len(results) >= candidates:
+                filtered = self._search_dense(collection, query_embeddings[i], n_results, self._restrict_where(where, normas[i]))
+            all_results[i] = filtered
+        
+        return all_results
+    
+    def build_norma_index(self, page_size: int = 100) -> int:
+        """
+        Reconstrói a coleção de primeiro estágio a partir das normas armazenadas
+        
+        Cada norma recebe o embedding do seu texto próprio (_norma_text), o
+        mesmo gerado na vetorização, montado com os metadados da norma e os
+        chunks iniciais já gravados. Normas que não estão mais armazenadas
+        são removidas da coleção.
+        
+        Args:
+            page_size: Número de normas por lote de embeddings
+            
+        Returns:
+            Número de normas indexadas
+        """
+        
+        with self._lock:
+            collection, sidecars = self._get_collection(), self._sidecars
+        sidecars.norma_collection = None
+        norma_collection = self._get_norma_collection(create=True, sidecars=sidecars)
+        
+        def pages() -> Iterator[List[Dict[str, Any]]]:
+            page = []
+            for metadata, _ in sidecars.document_store.iter_normas(page_size):
+                page.append(metadata)
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+        
+        total = 0
+        indexadas = set()
+        for page in tqdm(pages(), desc="Reconstruindo primeiro estágio"):
+            codigos = [str(metadata['codigo_registro']) for metadata in page]
+            found = collection.get(
+                where={'codigo_registro': {'$in': codigos}},
+                include=['documents', 'metadatas']
+            )
+            
+            chunks: Dict[str, List[Dict[str, Any]]] = {codigo: [] for codigo in codigos}
+            for document, metadata in zip(found['documents'], found['metadatas']):
+                chunks[metadata['codigo_registro']].append({'text': document, 'metadata': metadata})
+            for lista in chunks.values():
+                lista.sort(key=lambda chunk: chunk['metadata'].get('chunk_index', 0))
+            
+            norma_texts = [
+                self._norma_text({'metadata': metadata, 'chunks': chunks[str(metadata['codigo_registro'])]})
+                for metadata in page
+            ]
+            embeddings = self._generate_embeddings_batch(
+                [text for text, _ in norma_texts],
+                [tokens for _, tokens in norma_texts]
+            )
+            
+            ids, vectors, metadatas = [], [], []
+            for metadata, embedding in zip(page, embeddings):
+                if embedding is None:
+                    logger.error(f"❌ Falha ao gerar o embedding da norma {metadata['codigo_registro']}")
+                    continue
+                ids.append(str(metadata['codigo_registro']))
+                vectors.append(embedding)
+                metadatas.append(chunk_metadata(metadata))
+            
+            if ids:
+                norma_collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas)
+            indexadas.update(ids)
+            total += len(ids)
+        
+        # Remover normas que não estão mais armazenadas
+        orfas = [codigo for codigo in norma_collection.get(include=[])['ids'] if codigo not in indexadas]
+        if orfas:
+            norma_collection.delete(ids=orfas)
+        
+        self._bump_revision()
+        logger.info(f"✅ Coleção de primeiro estágio reconstruída com {total} normas")
+        return total
+    
+    def ensure_indexes(self) -> Dict[str, int]:
+        """
+        Reconstrói os índices auxiliares da versão ativa que estiverem inconsistentes
+        
+        Chamado ao final da ingestão e pelos scripts de manutenção; as buscas
+        apenas verificam os índices e, se necessário, seguem sem eles.
+        
+        Returns:
+            Dicionário índice -> número de itens reconstruídos (vazio se nada mudou)
+        """
+        
+        rebuilt = {}
+        with self._lock:
+            collection, sidecars = self._get_collection(), self._sidecars
+        
+        if self.first_stage_normas and not self._first_stage_consistent(sidecars):
+            logger.info("🔧 Coleção de primeiro estágio inconsistente com as normas armazenadas")
+            rebuilt['first_stage'] = self.build_norma_index()
+        
+        if sidecars.lexical_index is not None and sidecars.lexical_index.count() != collection.count():
+            logger.info("🔧 Índice léxico inconsistente com a coleção")
+            rebuilt['lexical'] = self.rebuild_lexical_index()
+        
+        if sidecars.vector_index is not None and not self._vector_index_consistent(collection, sidecars):
+            logger.info("🔧 Cópia dos vetores em NumPy inconsistente com a coleção")
+            rebuilt['vector'] = self._build_vector_index(collection, sidecars)
+        
+        return rebuilt
+    
+    def _join_normas(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Completa os metadados dos resultados com os campos da norma (após a busca)"""
+        
+        if results:
+            metadatas = self.document_store.join([result['metadata'] for result in results])
+            for result, metadata in zip(results, metadatas):
+                result['metadata'] = metadata
+        
+        return results
+    
+    def _fuse_rrf(self, result_lists: List[List[Dict[str, Any]]], n_results: int) -> List[Dict[str, Any]]:
+        """
+        Combina listas de resultados por reciprocal-rank fusion
+        
+        Cada resultado soma 1 / (k + posição) em cada lista em que aparece.
+        """
+        
+        fused: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for rank, result in enumerate(results, 1):
+                entry = fused.setdefault(result['id'], {**result, 'rrf_score': 0.0})
+                entry['rrf_score'] += 1.0 / (self.rrf_k + rank)
+                if 'bm25_score' in result:
+                    entry['bm25_score'] = result['bm25_score']
+        
+        return sorted(fused.values(), key=lambda x: x['rrf_score'], reverse=True)[:n_results]
+    
+    def search(
+        self, 
+        query: str, 
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca no banco vetorial (semântica, léxica ou híbrida)
+        
+        Args:
+            query: Consulta do usuário
+            n_results: Número de resultados
+            filters: Filtros de metadados (campos só da norma, como autor e assunto,
+                são resolvidos nos metadados por norma)
+            mode: 'dense', 'lexical' ou 'hybrid' (padrão: retrieval_mode da instância)
+            
+        Returns:
+            Lista de resultados ranqueados
+        """
+        
+        try:
+            collection = self._get_collection()
+            mode = self._search_mode(collection, mode)
+            filters = self._translate_norma_filters(filters)
+            if filters is None:
+                return []
+            where = self._build_where(filters)
+            
+            # Busca léxica: responde sem gerar embedding da consulta
+            if mode == 'lexical':
+                return self._join_normas(self._search_lexical(collection, query, n_results, where))
+            
+            # Gerar embedding da consulta (com cache de consultas recentes)
+            query_embedding = self._generate_query_embedding(query)
+            
+            # Primeiro estágio: buscar os chunks só nas normas mais próximas
+            normas = self._first_stage_normas(collection, [query_embedding], filters)[0]
+            dense_where = self._restrict_where(where, normas)
+            
+            if mode == 'dense':
+                return self._join_normas(self._search_dense(collection, query_embedding, n_results, dense_where))
+            
+            # Híbrida: candidatos das duas buscas combinados por RRF; o primeiro estágio
+            # restringe só a busca densa (a léxica acha normas citadas literalmente)
+            candidates = max(n_results * 2, 20)
+            dense_results = self._search_dense(collection, query_embedding, candidates, dense_where)
+            lexical_results = self._search_lexical(collection, query, candidates, where, query_embedding)
+            
+            return self._join_normas(self._fuse_rrf([dense_results, lexical_results], n_results))
+            
+        except Exception as e:
+            logger.error(f"Erro na busca: {e}")
+            # O handle pode ter sido invalidado (ex.: coleção recriada); obter novamente na próxima busca
+            self._collection = None
+            return []
+    
+    def _generate_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """
+        Gera os embeddings de várias consultas em lote
+        
+        Consultas já presentes no cache de consultas recentes não são
+        reenviadas; as demais são agrupadas em requisições em lote.
+        
+        Args:
+            queries: Consultas do usuário
+            
+        Returns:
+            Embeddings na mesma ordem das consultas
+        """
+        
+        embeddings = [self.query_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if not missing:
+            return embeddings
+        
+        start_time = time.perf_counter()
+        generated = self._generate_embeddings_batch(missing)
+        latency = (time.perf_counter() - start_time) / len(missing)
+        
+        by_query = {}
+        for query, embedding in zip(missing, generated):
+            if embedding is None:
+                raise RuntimeError(f"Falha ao gerar embedding da consulta: {query[:50]}")
+            self.query_cache.set(query, embedding, latency=latency)
+            by_query[query] = embedding
+        
+        return [embedding if embedding is not None else by_query[query] for query, embedding in zip(queries, embeddings)]
+    
+    def search_many(
+        self, 
+        queries: List[str], 
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca várias consultas de uma vez (avaliação offline e processamento em lote)
+        
+        Os embeddings das consultas são gerados em requisições em lote e a
+        busca vetorial é feita em uma única chamada ao ChromaDB (com a busca
+        em dois estágios, uma chamada em cada estágio; veja
+        _search_dense_first_stage).
+        
+        Args:
+            queries: Consultas do usuário
+            n_results: Número de resultados por consulta
+            filters: Filtros de metadados (aplicados a todas as consultas; veja search())
+            mode: 'dense', 'lexical' ou 'hybrid' (padrão: retrieval_mode da instância)
+            
+        Returns:
+            Uma lista de resultados por consulta, no mesmo formato de search()
+        """
+        
+        if not queries:
+            return []
+        
+        try:
+            collection = self._get_collection()
+            mode = self._search_mode(collection, mode)
+            filters = self._translate_norma_filters(filters)
+            if filters is None:
+                return [[] for _ in queries]
+            where = self._build_where(filters)
+            
+            if mode == 'lexical':
+                all_results = [self._search_lexical(collection, query, n_results, where) for query in queries]
+            else:
+                query_embeddings = self._generate_query_embeddings(queries)
+                
+                # Primeiro estágio em uma única chamada; cada consulta passa a ter suas próprias normas
+                normas = self._first_stage_normas(collection, query_embeddings, filters)
+                candidates = n_results if mode == 'dense' else max(n_results * 2, 20)
+                dense_results = self._search_dense_first_stage(collection, query_embeddings, candidates, where, normas)
+                
+                if mode == 'dense':
+                    all_results = dense_results
+                else:
+                    all_results = [
+                        self._fuse_rrf([
+                            dense,
+                            self._search_lexical(collection, query, candidates, where, query_embedding)
+                        ], n_results)
+                        for query, query_embedding, dense in zip(queries, query_embeddings, dense_results)
+                    ]
+            
+            # Uma única leitura dos metadados das normas para todas as consultas
+            self._join_normas([result for results in all_results for result in results])
+            return all_results
+            
+        except Exception as e:
+            logger.error(f"Erro na busca em lote: {e}")
+            self._collection = None
+            return [[] for _ in queries]
+    
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """
+        Obtém estatísticas da coleção
+        
+        Os agregados são mantidos incrementalmente; só são recalculados se
+        ainda não existirem ou estiverem inconsistentes com a coleção.
+        """
+        try:
+            collection = self._get_collection()
+            count = collection.count()
+            
+            if not self.collection_stats.loaded or self.collection_stats.total_chunks != count:
+                logger.warning("⚠️ Estatísticas da coleção ausentes ou desatualizadas. Recalculando...")
+                self.recompute_collection_stats()
+            
+            return self.collection_stats.as_dict()
+            
+        except Exception as e:
+            logger.error(f"Erro ao obter estatísticas: {e}")
+            return {'error': str(e)}
+    
+    def recompute_collection_stats(self, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Recalcula as estatísticas da coleção
+        
+        Usa os metadados por norma quando eles cobrem todos os chunks;
+        coleções anteriores a eles são lidas do ChromaDB em páginas.
+        
+        Args:
+            page_size: Número de chunks (ou normas) lidos por página (limita a memória usada)
+            
+        Returns:
+            Estatísticas recalculadas
+        """
+        
+        collection = self._get_collection()
+        total = collection.count()
+        
+        self.collection_stats.reset()
+        
+        if self.document_store.total_chunks() == total:
+            self.collection_stats.add_normas(self.document_store.iter_normas(page_size))
+        else:
+            for offset in tqdm(range(0, total, page_size), desc="Recalculando estatísticas"):
+                page = collection.get(limit=page_size, offset=offset, include=['metadatas'])
+                self.collection_stats.add(self.document_store.join(page['metadatas']))
+        
+        self.collection_stats.save()
+        logger.info(f"✅ Estatísticas recalculadas para {self.collection_stats.total_chunks} chunks")
+        
+        return self.collection_stats.as_dict()
+    
+    def rebuild_lexical_index(self, page_size: int = 1000) -> int:
+        """
+        Reconstrói o índice léxico lendo o texto dos chunks em páginas
+        
+        Args:
+            page_size: Número de chunks lidos por página
+            
+        Returns:
+            Número de chunks indexados
+        """
+        
+        if self.lexical_index is None:
+            raise ValueError("Índice léxico desativado (enable_lexical_index=False)")
+        
+        with self._lock:
+            collection, sidecars = self._get_collection(), self._sidecars
+            # Buscas concorrentes não usam o índice enquanto ele é regravado
+            sidecars.checks['lexical'] = (self._alias_revision, False)
+        total = collection.count()
+        
+        sidecars.lexical_index.clear()
+        for offset in tqdm(range(0, total, page_size), desc="Reconstruindo índice léxico"):
+            page = collection.get(limit=page_size, offset=offset, include=['documents', 'metadatas'])
+            sidecars.lexical_index.add(page['ids'], page['documents'], page['metadatas'])
+        
+        self._bump_revision()
+        logger.info(f"✅ Índice léxico reconstruído com {total} chunks")
+        return total
+    
+    def rebuild_reference_index(self, page_size: int = 1000) -> int:
+        """
+        Reconstrói o índice de referências
+        
+        Usa os metadados por norma quando eles cobrem todos os chunks (uma
+        leitura por norma); coleções anteriores a eles são lidas do ChromaDB
+        em páginas.
+        
+        Args:
+            page_size: Número de chunks (ou normas) lidos por página
+            
+        Returns:
+            Número de normas indexadas
+        """
+        
+        collection = self._get_collection()
+        total = collection.count()
+        
+        self.reference_index.clear()
+        if self.document_store.total_chunks() == total:
+            self.reference_index.add(metadata for metadata, _ in self.document_store.iter_normas(page_size))
+        else:
+            for offset in tqdm(range(0, total, page_size), desc="Reconstruindo índice de referências"):
+                page = collection.get(limit=page_size, offset=offset, include=['metadatas'])
+                self.reference_index.add(self.document_store.join(page['metadatas']))
+        
+        self.reference_index.save()
+        logger.info(f"✅ Índice de referências reconstruído com {len(self.reference_index)} normas")
+        return len(self.reference_index)
+    
+    def find_normas_by_reference(self, query: str) -> List[str]:
+        """
+        Resolve referências explícitas a normas ("Resolução nº 2240/2011") na consulta
+        
+        Args:
+            query: Consulta do usuário
+            
+        Returns:
+            Códigos de registro das normas referenciadas (vazio se nenhuma)
+        """
+        
+        try:
+            if not self.reference_index.loaded:
+                self.rebuild_reference_index()
+            return self.reference_index.resolve(query)
+        except Exception as e:
+            logger.error(f"Erro ao resolver referências: {e}")
+            return []
+    
+    def search_normas(
+        self, 
+        query: str, 
+        codigos_registro: List[str], 
+        n_results: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        artigos: Optional[List[str]] = None,
+        mode: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca restrita às normas informadas (referenciadas na consulta)
+        
+        Os chunks são ranqueados pela mesma busca de search(), com os escores
+        reais. Os chunks dos artigos citados vêm primeiro, ordenados pela
+        similaridade com a consulta; o restante é completado pela busca.
+        
+        Args:
+            query: Consulta do usuário
+            codigos_registro: Códigos das normas
+            n_results: Número máximo de chunks
+            filters: Filtros de metadados adicionais
+            artigos: Artigos citados ("5", "10-A"), localizados pelo índice de
+                artigos; se nenhum for encontrado, busca na norma toda
+            mode: 'dense', 'lexical' ou 'hybrid' (padrão: retrieval_mode da instância)
+            
+        Returns:
+            Lista de resultados no mesmo formato de search()
+        """
+        
+        if not codigos_registro:
+            return []
+        
+        # Restringir às normas citadas (também no primeiro estágio); um filtro
+        # por codigo_registro já informado continua valendo, combinado por $and
+        filtros = dict(filters or {})
+        if 'codigo_registro' in filtros:
+            filtros['$and'] = list(filtros.get('$and', [])) + [{'codigo_registro': filtros.pop('codigo_registro')}]
+        filtros['codigo_registro'] = {'$in': [str(c) for c in codigos_registro]}
+        
+        try:
+            # Artigos citados: chunks indicados pelo índice de artigos, com a similaridade real
+            results = []
+            if artigos:
+                localizados = self.document_store.find_artigos(codigos_registro, artigos)
+                if localizados:
+                    results = self._score_chunks(
+                        query,
+                        [self._generate_document_id(codigo, chunk_index) for codigo, chunk_index in localizados],
+                        self._build_where(filtros)
+                    )[:n_results]
+                else:
+                    logger.info(f"📑 Artigos {artigos} não indexados; buscando na norma inteira")
+            
+            if len(results) < n_results:
+                vistos = {result['id'] for result in results}
+                for result in self.search(query, n_results, filters=filtros, mode=mode):
+                    if result['id'] not in vistos and len(results) < n_results:
+                        results.append(result)
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Erro na busca nas normas referenciadas: {e}")
+            self._collection = None
+            return []
+    
+    def _score_chunks(self, query: str, ids: List[str], where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Calcula a similaridade da consulta com os chunks informados (maior primeiro)"""
+        
+        collection = self._get_collection()
+        found = collection.get(ids=ids, where=where, include=['documents', 'metadatas', 'embeddings'])
+        if not found['ids']:
+            return []
+        
+        query_vector = np.asarray(self._generate_query_embedding(query), dtype=np.float32)
+        vectors = np.asarray(found['embeddings'], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        norms[norms == 0] = 1.0
+        similarities = vectors @ query_vector / norms
+        
+        results = [
+            {
+                'id': chunk_id,
+                'document': document,
+                'metadata': metadata,
+                'similarity': float(similarity),
+                'distance': 1 - float(similarity)
+            }
+            for chunk_id, document, metadata, similarity in zip(
+                found['ids'], found['documents'], found['metadatas'], similarities
+            )
+        ]
+        results.sort(key=lambda x: x['similarity'], reverse=True)
+        return self._join_normas(results)
+    
+    def delete_normas(self, codigos_registro: List[str]) -> int:
+        """
+        Remove da coleção todos os chunks das normas informadas
+        
+        Args:
+            codigos_registro: Códigos das normas a remover
+            
+        Returns:
+            Número de chunks removidos
+        """
+        
+        if not codigos_registro:
+            return 0
+        
+        collection = self._get_collection()
+        existing = collection.get(
+            where={'codigo_registro': {'$in': [str(c) for c in codigos_registro]}},
+            include=['metadatas']
+        )
+        
+        if not existing['ids']:
+            return 0
+        
+        collection.delete(ids=existing['ids'])
+        self.collection_stats.remove(self.document_store.join(existing['metadatas']))
+        self.collection_stats.save()
+        self.document_store.remove(codigos_registro)
+        self._sidecars.vector_index_stale = True
+        if self.lexical_index is not None:
+            self.lexical_index.remove(existing['ids'])
+        self.reference_index.remove(codigos_registro)
+        self.reference_index.save()
+        norma_collection = self._get_norma_collection()
+        if norma_collection is not None:
+            norma_collection.delete(ids=[str(c) for c in codigos_registro])
+        self._bump_revision()
+        
+        logger.info(f"🗑️ {len(existing['ids'])} chunks removidos de {len(codigos_registro)} normas")
+        return len(existing['ids'])
+    
+    def build_vector_index(self) -> int:
+        """
+        Reconstrói a cópia dos vetores em NumPy a partir da coleção
+        
+        Returns:
+            Número de vetores indexados
+        """
+        
+        if self.vector_index is None:
+            raise ValueError("Índice em NumPy desativado (vector_sidecar_dtype=None)")
+        
+        with self._lock:
+            collection, sidecars = self._get_collection(), self._sidecars
+        return self._build_vector_index(collection, sidecars)
+    
+    def _build_vector_index(self, collection, sidecars: _VersionSidecars) -> int:
+        """Reconstrói a cópia dos vetores em NumPy de uma versão (ativa ou em construção)"""
+        
+        count = sidecars.vector_index.build(collection, self.embedding_backend.identity)
+        sidecars.vector_index.load(self.embedding_backend.identity)
+        sidecars.vector_index_stale = False
+        
+        # Versão ativa: buscas (também de outros processos) voltam a verificar o índice
+        if sidecars is self._sidecars:
+            self._bump_revision()
+        return count
+    
+    def _vector_index_consistent(self, collection, sidecars: _VersionSidecars) -> bool:
+        """
+        Se a cópia dos vetores em NumPy corresponde à coleção
+        
+        Um índice desatualizado na memória é recarregado do disco (pode ter
+        sido reconstruído por outro processo) antes da comparação.
+        """
+        
+        vector_index = sidecars.vector_index
+        if sidecars.vector_index_stale or not vector_index.exists():
+            return False
+        
+        count = collection.count()
+        if not vector_index.loaded or vector_index.count != count:
+            vector_index.load(self.embedding_backend.identity)
+        return vector_index.loaded and vector_index.count == count
+    
+    def _get_vector_index(self, collection) -> Optional[NumpyVectorIndex]:
+        """Retorna o índice em NumPy carregado (None se ausente ou desatualizado; não é reconstruído na busca)"""
+        
+        sidecars = self._sidecars
+        if sidecars.vector_index is None or not self._index_consistent(
+            'vector',
+            lambda: self._vector_index_consistent(collection, sidecars),
+            "Índice em NumPy ausente ou desatualizado; buscando pelo HNSW do ChromaDB."
+        ):
+            return None
+        return sidecars.vector_index
+    
+    def _search_exact(
+        self, 
+        collection, 
+        vector_index: NumpyVectorIndex, 
+        query_embedding: List[float], 
+        n_results: int, 
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca exata na cópia dos vetores em NumPy
+        
+        Documentos e metadados continuam vindo do ChromaDB.
+        
+        Returns:
+            Lista de resultados no mesmo formato de search()
+        """
+        
+        scored = vector_index.search(query_embedding, n_results, where)
+        if not scored:
+            return []
+        
+        found = collection.get(
+            ids=[chunk_id for chunk_id, _ in scored],
+            include=['documents', 'metadatas']
+        )
+        by_id = {
+            chunk_id: (document, metadata)
+            for chunk_id, document, metadata in zip(found['ids'], found['documents'], found['metadatas'])
+        }
+        
+        formatted_results = []
+        for chunk_id, similarity in scored:
+            if chunk_id not in by_id:
+                continue
+            document, metadata = by_id[chunk_id]
+            formatted_results.append({
+                'id': chunk_id,
+                'document': document,
+                'metadata': metadata,
+                'similarity': similarity,
+                'distance': 1 - similarity
+            })
+        
+        return formatted_results
+    
+    def get_vector_index_stats(self) -> Dict[str, Any]:
+        """Obtém o tipo, o tamanho e a memória da cópia dos vetores em NumPy"""
+        if self.vector_index is None:
+            return {'enabled': False}
+        
+        return {'enabled': True, **self.vector_index.get_stats()}
+    
+    def get_query_cache_stats(self) -> Dict[str, Any]:
+        """Obtém estatísticas do cache de embeddings de consultas (taxa de acerto e latência economizada)"""
+        return self.query_cache.get_stats()
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Obtém estatísticas do cache de embeddings (acertos, falhas e tamanho)"""
+        if self.embedding_cache is None:
+            return {'enabled': False}
+        
+        return {'enabled': True, **self.embedding_cache.get_stats()}
+    
+    def get_vetorizacao_stats(self, parquet_path: str) -> Dict[str, Any]:
+        """
+        Obtém estatísticas de vetorização do arquivo parquet
+        
+        Args:
+            parquet_path: Caminho para o arquivo parquet
+            
+        Returns:
+            Dicionário com estatísticas de vetorização
+        """
+        try:
+            # Apenas colunas de filtro e o tamanho do conteúdo (sem carregar os textos)
+            df = NormasParquetReader(parquet_path).scan_filtros()
+            
+            # Status vigente = coluna do parquet + entradas do ledger ainda não compactadas
+            ledger_path = VetorizacaoLedger.path_for_parquet(parquet_path)
+            if ledger_path.exists():
+                df = self._get_status_ledger(parquet_path).aplicar_status(df)
             
             # Verificar se coluna vetorizado existe
             if 'vetorizado' not in df.columns:
@@ -560,8 +2492,7 @@ class VectorStoreANTAQ:
             # Normas em vigor com conteúdo
             normas_em_vigor = df[
                 (df['situacao'] == 'Em vigor') & 
-                (df['conteudo_pdf'].notna()) & 
-                (df['conteudo_pdf'].str.len() > 100)
+                (df['tamanho_conteudo'] > 100)
             ]
             
             normas_em_vigor_vetorizadas = normas_em_vigor['vetorizado'].sum()
@@ -569,6 +2500,8 @@ class VectorStoreANTAQ:
             
             # Última verificação
             ultima_verificacao = df['ultima_verificacao_vetorizacao'].max() if 'ultima_verificacao_vetorizacao' in df.columns else None
+            if pd.isna(ultima_verificacao):
+                ultima_verificacao = None
             
             return {
                 'total_normas': total_normas,
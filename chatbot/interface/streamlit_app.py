@@ -14,9 +14,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import time
 import random
+import itertools
 
 # Adicionar diretório do projeto ao path
 current_dir = Path(__file__).parent
@@ -33,7 +34,14 @@ sys.path.insert(0, str(project_root))
 # Importações dos módulos do chatbot
 from chatbot.core.vector_store import VectorStoreANTAQ
 from chatbot.core.rag_system import RAGSystemANTAQ
-from chatbot.config.config import OPENAI_API_KEY, OPENAI_MODEL, CHROMA_PERSIST_DIRECTORY, DATA_PATH
+from chatbot.core.embeddings import create_embedding_backend
+from chatbot.config.config import (
+    OPENAI_API_KEY, OPENAI_MODEL, CHROMA_PERSIST_DIRECTORY, DATA_PATH,
+    EMBEDDING_BACKEND, EMBEDDING_BACKEND_OPTIONS, VECTOR_SIDECAR_DTYPE, SEARCH_BACKEND,
+    RETRIEVAL_MODE, COLLECTION_GC_GRACE_SECONDS, FIRST_STAGE_NORMAS,
+    ENABLE_CACHE, CACHE_TTL, ANSWER_CACHE_SIZE_MB, ANSWER_CACHE_SIMILARITY, MAX_CONTEXT_LENGTH,
+    HISTORY_MAX_TOKENS, HISTORY_SUMMARY_MODEL
+)
 
 # Configuração da página
 st.set_page_config(
@@ -69,6 +77,41 @@ def load_css():
 # Carregar estilos CSS
 load_css()
 
+@st.cache_resource(show_spinner=False)
+def load_engine() -> Tuple[VectorStoreANTAQ, RAGSystemANTAQ]:
+    """
+    Banco vetorial e sistema RAG compartilhados por todas as sessões do processo
+    
+    O cliente do ChromaDB, os índices e os caches são carregados uma única
+    vez; o histórico de cada usuário fica em st.session_state.
+    """
+    
+    vector_store = VectorStoreANTAQ(
+        openai_api_key=OPENAI_API_KEY,
+        persist_directory=str(CHROMA_PERSIST_DIRECTORY),
+        embedding_backend=create_embedding_backend(EMBEDDING_BACKEND, **EMBEDDING_BACKEND_OPTIONS),
+        vector_sidecar_dtype=VECTOR_SIDECAR_DTYPE,
+        search_backend=SEARCH_BACKEND,
+        retrieval_mode=RETRIEVAL_MODE,
+        collection_gc_grace_seconds=COLLECTION_GC_GRACE_SECONDS,
+        first_stage_normas=FIRST_STAGE_NORMAS
+    )
+    
+    rag_system = RAGSystemANTAQ(
+        openai_api_key=OPENAI_API_KEY,
+        vector_store=vector_store,
+        model=OPENAI_MODEL,
+        max_context_length=MAX_CONTEXT_LENGTH,
+        enable_cache=ENABLE_CACHE,
+        cache_ttl=CACHE_TTL,
+        cache_size_mb=ANSWER_CACHE_SIZE_MB,
+        cache_similarity_threshold=ANSWER_CACHE_SIMILARITY,
+        history_max_tokens=HISTORY_MAX_TOKENS,
+        history_summary_model=HISTORY_SUMMARY_MODEL
+    )
+    
+    return vector_store, rag_system
+
 class ChatbotANTAQApp:
     """Classe principal da aplicação Streamlit"""
     
@@ -89,6 +132,10 @@ class ChatbotANTAQApp:
         if 'messages' not in st.session_state:
             st.session_state.messages = []
             
+        # Histórico da conversa desta sessão (o sistema RAG é compartilhado e não guarda estado)
+        if 'conversation_history' not in st.session_state:
+            st.session_state.conversation_history = []
+            
         if 'system_initialized' not in st.session_state:
             st.session_state.system_initialized = False
             
@@ -219,6 +266,13 @@ class ChatbotANTAQApp:
                             st.write(f"• Total de registros: {stats.get('total_chunks', 'N/A'):,}")
                             st.write(f"• Normas únicas: {stats.get('total_normas_unicas', 'N/A'):,}")
                             
+                            query_cache_stats = st.session_state.vector_store.get_query_cache_stats()
+                            st.write(f"• Cache de consultas: {query_cache_stats['hit_rate']:.0%} de acerto ({query_cache_stats['estimated_saved_ms']:,.0f} ms economizados)")
+                            
+                            answer_cache_stats = st.session_state.rag_system.get_cache_stats() if st.session_state.rag_system else {'enabled': False}
+                            if answer_cache_stats['enabled']:
+                                st.write(f"• Cache de respostas: {answer_cache_stats['hit_rate']:.0%} de acerto ({answer_cache_stats['entries']:,} entradas)")
+                            
                             # Tipos de normas
                             if 'tipos_normas' in stats and stats['tipos_normas']:
                                 st.write("**📋 Tipos de Normas:**")
@@ -259,15 +313,12 @@ class ChatbotANTAQApp:
         try:
             with st.spinner("🔄 Inicializando sistema..."):
                 
-                # Inicializar vector store
-                st.session_state.vector_store = VectorStoreANTAQ(
-                    openai_api_key=OPENAI_API_KEY,
-                    persist_directory=str(CHROMA_PERSIST_DIRECTORY)
-                )
+                # Banco vetorial e sistema RAG compartilhados entre as sessões
+                st.session_state.vector_store, st.session_state.rag_system = load_engine()
                 
                 # Verificar se o ChromaDB já tem dados
                 try:
-                    collection = st.session_state.vector_store.client.get_collection(st.session_state.vector_store.collection_name)
+                    collection = st.session_state.vector_store.get_collection()
                     doc_count = collection.count()
                     if doc_count > 0:
                         st.success(f"✅ ChromaDB carregado com {doc_count} documentos")
@@ -278,13 +329,6 @@ class ChatbotANTAQApp:
                     st.warning(f"⚠️ Erro ao verificar ChromaDB: {str(e)}")
                     st.info("ℹ️ Continuando sem verificação de dados...")
                 
-                # Inicializar RAG system
-                st.session_state.rag_system = RAGSystemANTAQ(
-                    openai_api_key=OPENAI_API_KEY,
-                    vector_store=st.session_state.vector_store,
-                    model=OPENAI_MODEL
-                )
-                
                 st.session_state.system_initialized = True
                 st.success("✅ Sistema inicializado com sucesso!")
                 
@@ -388,16 +432,32 @@ class ChatbotANTAQApp:
             # Atualizar estatísticas
             st.session_state.total_queries += 1
             
-            # Processar consulta
+            # Processar consulta (a resposta é exibida à medida que é gerada)
             with st.chat_message("assistant"):
+                events = st.session_state.rag_system.query_stream(
+                    user_query=query,
+                    n_results=st.session_state.max_results,
+                    history=st.session_state.conversation_history,
+                    model=st.session_state.model_choice
+                )
+                
+                # A busca ocorre antes do primeiro evento
                 with st.spinner("🤔 Analisando sua pergunta..."):
-                    result = st.session_state.rag_system.query(
-                        user_query=query,
-                        n_results=st.session_state.max_results
-                    )
+                    first_event = next(events)
+                
+                response_placeholder = st.empty()
+                response_text = ""
+                result = first_event
+                
+                for event in itertools.chain([first_event], events):
+                    if event['type'] == 'token':
+                        response_text += event['content']
+                        response_placeholder.markdown(response_text + "▌")
+                    elif event['type'] == 'done':
+                        result = event
                 
-                # Exibir resposta
-                st.markdown(result['response'])
+                # Exibir resposta final
+                response_placeholder.markdown(result['response'])
                 
                 # Mostrar fontes se habilitado
                 if st.session_state.show_sources and result.get('sources'):
@@ -450,8 +510,7 @@ class ChatbotANTAQApp:
     def clear_chat(self):
         """Limpa o histórico do chat"""
         st.session_state.messages = []
-        if st.session_state.rag_system:
-            st.session_state.rag_system.clear_history()
+        st.session_state.conversation_history = []
         st.success("🗑️ Chat limpo com sucesso!")
     
     def export_chat(self):
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular as estatísticas agregadas da coleção vetorial
+e reconstruir os índices auxiliares inconsistentes
+"""
+
+import os
+import sys
+
+# Adicionar o diretório raiz ao path para importações corretas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.insert(0, project_root)
+
+def recalcular_estatisticas_colecao():
+    """
+    Recalcula as estatísticas da coleção lendo os metadados em páginas
+    """
+
+    # Importar configurações do config
+    try:
+        from chatbot.config.config import OPENAI_API_KEY, CHROMA_PERSIST_DIRECTORY
+        from chatbot.core.vector_store import VectorStoreANTAQ
+    except ImportError as e:
+        print(f"❌ Erro ao importar configurações do chatbot: {e}")
+        return False
+
+    vs = VectorStoreANTAQ(OPENAI_API_KEY, persist_directory=str(CHROMA_PERSIST_DIRECTORY))
+
+    try:
+        stats = vs.recompute_collection_stats()
+        reconstruidos = vs.ensure_indexes()
+    except Exception as e:
+        print(f"❌ Erro ao recalcular estatísticas: {e}")
+        return False
+
+    for indice, total in reconstruidos.items():
+        print(f"🔧 Índice '{indice}' reconstruído: {total:,} itens")
+
+    print(f"\n📊 ESTATÍSTICAS DA COLEÇÃO:")
+    print(f"   Total chunks: {stats['total_chunks']:,}")
+    print(f"   Normas únicas: {stats['total_normas_unicas']:,}")
+    for tipo, count in stats['tipos_normas'].items():
+        print(f"   {tipo}: {count:,}")
+
+    return True
+
+if __name__ == "__main__":
+    print("📊 RECÁLCULO DAS ESTATÍSTICAS DA COLEÇÃO")
+    print("=" * 50)
+
+    success = recalcular_estatisticas_colecao()
+
+    if success:
+        print("\n✅ Estatísticas recalculadas!")
+    else:
+        print("\n❌ Recálculo falhou!")
@@ -5,8 +5,16 @@ Script para verificar o status atual da vetorização
 
 import pandas as pd
 import os
+import sys
 from datetime import datetime
 
+# Adicionar o diretório raiz ao path para importações corretas
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+sys.path.insert(0, project_root)
+
+from chatbot.core.status_ledger import VetorizacaoLedger
+
 def verificar_status_vetorizacao():
     """
     Verifica o status atual da vetorização das normas
@@ -23,6 +31,14 @@ def verificar_status_vetorizacao():
     # Carregar dados
     df = pd.read_parquet(arquivo_parquet)
     
+    # Aplicar status registrado no ledger (ainda não compactado no parquet)
+    ledger_path = VetorizacaoLedger.path_for_parquet(arquivo_parquet)
+    if ledger_path.exists():
+        print(f"📒 Aplicando ledger de vetorização: {ledger_path}")
+        ledger = VetorizacaoLedger(str(ledger_path))
+        df = ledger.aplicar_status(df)
+        ledger.close()
+    
     print(f"📊 Shape: {df.shape}")
     print(f"📋 Colunas: {df.columns.tolist()}")
     
@@ -20,20 +20,45 @@ def vetorizar_base_completa():
     
     # Importar configurações do config
     try:
-        from chatbot.config.config import OPENAI_API_KEY
+        from chatbot.config.config import (
+            OPENAI_API_KEY, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_TOKENS,
+            ENABLE_EMBEDDING_CACHE, EMBEDDING_CACHE_SIZE_MB, EMBEDDING_WORKERS,
+            EMBEDDING_REQUESTS_PER_MINUTE, EMBEDDING_TOKENS_PER_MINUTE, CHUNK_PROCESSES,
+            EMBEDDING_BACKEND, EMBEDDING_BACKEND_OPTIONS, VECTOR_SIDECAR_DTYPE, SEARCH_BACKEND,
+            RETRIEVAL_MODE, COLLECTION_GC_GRACE_SECONDS, STRUCTURE_AWARE_CHUNKING,
+            FIRST_STAGE_NORMAS
+        )
         from chatbot.core.vector_store import VectorStoreANTAQ
+        from chatbot.core.embeddings import create_embedding_backend
     except ImportError as e:
         print(f"❌ Erro ao importar configurações do chatbot: {e}")
         print("   Verifique se o arquivo chatbot/config/config.py existe")
         return False
     
-    if not OPENAI_API_KEY:
+    if not OPENAI_API_KEY and EMBEDDING_BACKEND == 'openai':
         print("❌ OPENAI_API_KEY não encontrada no settings.py")
         return False
     
     # Inicializar vector store
     print("🚀 Inicializando VectorStore...")
-    vs = VectorStoreANTAQ(OPENAI_API_KEY)
+    vs = VectorStoreANTAQ(
+        OPENAI_API_KEY,
+        embedding_batch_size=EMBEDDING_BATCH_SIZE,
+        embedding_batch_tokens=EMBEDDING_BATCH_TOKENS,
+        enable_embedding_cache=ENABLE_EMBEDDING_CACHE,
+        embedding_cache_size_mb=EMBEDDING_CACHE_SIZE_MB,
+        embedding_workers=EMBEDDING_WORKERS,
+        requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+        chunk_processes=CHUNK_PROCESSES,
+        structure_aware_chunking=STRUCTURE_AWARE_CHUNKING,
+        embedding_backend=create_embedding_backend(EMBEDDING_BACKEND, **EMBEDDING_BACKEND_OPTIONS),
+        vector_sidecar_dtype=VECTOR_SIDECAR_DTYPE,
+        search_backend=SEARCH_BACKEND,
+        retrieval_mode=RETRIEVAL_MODE,
+        collection_gc_grace_seconds=COLLECTION_GC_GRACE_SECONDS,
+        first_stage_normas=FIRST_STAGE_NORMAS
+    )
     
     # Caminho para o arquivo parquet
     parquet_path = "shared/data/normas_antaq_completo.parquet"
@@ -62,6 +87,10 @@ def vetorizar_base_completa():
     # Verificar se já está tudo vetorizado
     if stats_inicial['normas_em_vigor_nao_vetorizadas'] == 0:
         print("\n✅ Todas as normas em vigor já estão vetorizadas!")
+        # Reconstruir índices auxiliares ausentes ou desatualizados (as buscas não os reconstroem)
+        reconstruidos = vs.ensure_indexes()
+        for indice, total in reconstruidos.items():
+            print(f"   🔧 Índice '{indice}' reconstruído: {total:,} itens")
         return True
     
     # Confirmar com o usuário
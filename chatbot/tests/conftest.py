@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Configuração comum dos testes do Chatbot ANTAQ
+Os testes rodam sem rede: embeddings por hashing e, se o arquivo BPE do
+tiktoken não puder ser baixado, uma codificação byte a byte
+"""
+
+import pytest
+import tiktoken
+
+def _byte_encoding() -> tiktoken.Encoding:
+    """Codificação do tiktoken com um token por byte (não depende de download)"""
+    return tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={}
+    )
+
+@pytest.fixture(autouse=True, scope="session")
+def offline_tokenizer():
+    """Usa cl100k_base quando disponível; senão, a codificação byte a byte"""
+
+    try:
+        tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        encoding = _byte_encoding()
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setattr(tiktoken, "get_encoding", lambda name: encoding)
+            monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model: encoding)
+            yield encoding
+        return
+
+    yield tiktoken.get_encoding("cl100k_base")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de respostas
+"""
+
+import pytest
+
+from chatbot.core.answer_cache import AnswerCache
+
+RESPOSTA = {'response': 'A cabotagem é regulada pela Resolução 10.', 'sources': []}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnswerCache(str(tmp_path / "respostas"), similarity_threshold=0.9)
+    yield cache
+    cache.close()
+
+def test_chave_depende_de_consulta_contexto_e_parametros(cache):
+    chave = cache.make_key("O que é cabotagem?", 'gpt', n_results=5)
+
+    assert cache.make_key("  o que é   CABOTAGEM? ", 'gpt', n_results=5) == chave
+    assert cache.make_key("O que é cabotagem?", 'gpt', n_results=10) != chave
+    assert cache.make_key("O que é cabotagem?", 'outro', n_results=5) != chave
+    assert cache.make_key("O que é cabotagem?", 'gpt', [('user', 'Oi')], n_results=5) != chave
+
+def test_lookup_exato_dispensa_o_embedding(cache):
+    chave = cache.make_key("O que é cabotagem?", 'gpt')
+    cache.set(chave, RESPOSTA, 'v1')
+    chamadas = []
+
+    valor, nivel, embedding = cache.lookup(chave, 'v1', 'escopo', lambda: chamadas.append(1) or [1.0, 0.0])
+
+    assert (valor, nivel, embedding) == (RESPOSTA, 'exact', None)
+    assert chamadas == []
+    assert cache.get_stats()['exact_hits'] == 1
+
+def test_lookup_semantico_e_falha(cache):
+    escopo = cache.make_scope('gpt', n_results=5)
+    cache.set(cache.make_key("O que é cabotagem?", 'gpt'), RESPOSTA, 'v1', embedding=[1.0, 0.0], scope=escopo)
+
+    valor, nivel, embedding = cache.lookup(cache.make_key("Defina cabotagem", 'gpt'), 'v1', escopo, lambda: [0.99, 0.05])
+    assert nivel == 'semantic'
+    assert valor['response'] == RESPOSTA['response'] and valor['similarity'] >= 0.9
+    assert embedding == [0.99, 0.05]
+
+    valor, nivel, embedding = cache.lookup(cache.make_key("O que é praticagem?", 'gpt'), 'v1', escopo, lambda: [0.0, 1.0])
+    assert (valor, nivel, embedding) == (None, None, [0.0, 1.0])
+
+    stats = cache.get_stats()
+    assert (stats['exact_hits'], stats['semantic_hits'], stats['misses']) == (0, 1, 1)
+
+def test_nova_versao_descarta_respostas_anteriores(cache):
+    chave = cache.make_key("O que é cabotagem?", 'gpt')
+    cache.set(chave, RESPOSTA, 'v1')
+
+    assert cache.get(chave, 'v2') is None
+    assert cache.get(chave, 'v1') is None
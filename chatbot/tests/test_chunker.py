@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Testes da divisão de textos em chunks
+"""
+
+import re
+
+from chatbot.core.chunker import TokenChunker, LegalStructureChunker
+
+TEXTO = " ".join(
+    f"O operador portuário deverá cumprir a obrigação número {i} desta norma. "
+    f"Fica vedado o descumprimento dos prazos fixados pela ANTAQ."
+    for i in range(60)
+)
+
+def test_token_chunker_respeita_tamanho_e_sobreposicao(offline_tokenizer):
+    chunker = TokenChunker(chunk_size=80, chunk_overlap=20)
+    chunks = chunker.chunk(TEXTO, {'codigo_registro': '1'})
+
+    assert len(chunks) > 1
+    assert [chunk['metadata']['chunk_index'] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert chunk['metadata']['codigo_registro'] == '1'
+        assert 0 < chunk['metadata']['tokens'] <= 80
+
+    # Chunks consecutivos compartilham o final do anterior
+    for anterior, seguinte in zip(chunks, chunks[1:]):
+        assert anterior['text'][-15:] in seguinte['text']
+
+def test_token_chunker_prefere_fim_de_sentenca(offline_tokenizer):
+    texto = " ".join(f"Fica vedado o item {i}." for i in range(200))
+    chunks = TokenChunker(chunk_size=80, chunk_overlap=20).chunk(texto, {})
+
+    assert len(chunks) > 1
+    assert all(chunk['text'].endswith('.') for chunk in chunks)
+
+def test_token_chunker_cobre_todo_o_texto(offline_tokenizer):
+    chunks = TokenChunker(chunk_size=50, chunk_overlap=10).chunk(TEXTO, {})
+    juntos = " ".join(chunk['text'] for chunk in chunks)
+
+    assert all(palavra in juntos for palavra in TEXTO.split())
+
+def test_token_chunker_ignora_textos_curtos(offline_tokenizer):
+    assert TokenChunker().chunk("  curto  ", {}) == []
+    assert TokenChunker().chunk("", {}) == []
+
+def test_token_chunker_normaliza_espacos(offline_tokenizer):
+    chunks = TokenChunker(chunk_size=500).chunk("Art. 1º   Texto\n\n com   espaços\trepetidos " * 5, {})
+
+    assert len(chunks) == 1
+    assert not re.search(r'\s{2,}', chunks[0]['text'])
+
+def test_chunk_many_mantem_a_ordem(offline_tokenizer):
+    chunker = TokenChunker(chunk_size=80, chunk_overlap=20)
+    documentos = [(f"Documento {i}. " + TEXTO, {'codigo_registro': str(i)}) for i in range(5)]
+
+    resultados = list(chunker.chunk_many(documentos))
+
+    assert [documento for documento, _ in resultados] == documentos
+    for (_, metadata), chunks in resultados:
+        assert chunks and all(chunk['metadata']['codigo_registro'] == metadata['codigo_registro'] for chunk in chunks)
+
+NORMA = (
+    "RESOLUÇÃO Nº 10-ANTAQ. Dispõe sobre o operador portuário. "
+    "Art. 1º Esta norma se aplica aos operadores portuários. "
+    "Art. 2º O operador deverá observar o disposto no art. 1º. § 1º O prazo é de 30 dias. § 2º O prazo é contado em dias úteis. "
+    "Art. 3º Ficam revogadas as disposições em contrário. "
+    "ANEXO I Tabela de valores. Art. 1º Valor da tarifa."
+)
+
+def test_legal_chunker_alinha_chunks_aos_artigos(offline_tokenizer):
+    chunks = LegalStructureChunker(chunk_size=60, chunk_overlap=10).chunk(NORMA, {'codigo_registro': '1'})
+
+    corpo = [chunk for chunk in chunks if 'anexo' not in chunk['metadata']]
+    anexo = [chunk for chunk in chunks if 'anexo' in chunk['metadata']]
+
+    # A citação "no art. 1º" dentro do art. 2º não abre um novo dispositivo
+    artigos = [artigo for chunk in corpo for artigo in chunk['metadata'].get('artigos', [])]
+    assert list(dict.fromkeys(artigos)) == ['1', '2', '3']
+    assert [chunk['metadata']['anexo'] for chunk in anexo] == ['I']
+    assert anexo[0]['text'].startswith('ANEXO I')
+    assert anexo[0]['metadata']['artigos'] == ['1']
+
+    for chunk in chunks:
+        assert chunk['metadata']['codigo_registro'] == '1'
+        assert chunk['metadata']['tokens'] <= 60
+        if chunk['metadata'].get('artigos'):
+            assert chunk['metadata']['artigo'] == int(chunk['metadata']['artigos'][0])
+            assert chunk['metadata']['artigo_fim'] == int(chunk['metadata']['artigos'][-1])
+
+def test_legal_chunker_agrupa_artigos_curtos(offline_tokenizer):
+    chunks = LegalStructureChunker(chunk_size=2000).chunk(NORMA, {})
+
+    # Corpo da norma em um chunk e o anexo em outro
+    assert len(chunks) == 2
+    assert chunks[0]['metadata']['artigos'] == ['1', '2', '3']
+    assert chunks[1]['text'].startswith('ANEXO I')
+
+def test_legal_chunker_codifica_a_norma_uma_vez(offline_tokenizer):
+    chunker = LegalStructureChunker(chunk_size=40, chunk_overlap=8)
+    encode = chunker.tokenizer.encode
+    chamadas = []
+    chunker.tokenizer = type('Contador', (), {
+        'encode': lambda self, text: chamadas.append(text) or encode(text),
+        '__getattr__': lambda self, name: getattr(offline_tokenizer, name),
+    })()
+
+    chunks = chunker.chunk(NORMA, {})
+
+    assert len(chamadas) == 1
+    for chunk in chunks:
+        assert abs(chunk['metadata']['tokens'] - len(encode(chunk['text']))) <= 1
+
+def test_legal_chunker_divide_artigo_longo_com_sobreposicao(offline_tokenizer):
+    paragrafos = " ".join(f"§ {i}º O operador deverá observar a regra {i}." for i in range(1, 30))
+    texto = f"Art. 1º Disposições gerais. {paragrafos} Art. 2º Fim da norma."
+    chunker = LegalStructureChunker(chunk_size=60, chunk_overlap=10)
+
+    chunks = chunker.chunk(texto, {})
+    partes = [chunk for chunk in chunks if chunk['metadata'].get('artigos') == ['1']]
+
+    assert len(partes) > 1
+    assert all(chunk['metadata']['tokens'] <= 60 for chunk in chunks)
+    # Cada parte começa com o final da anterior (chunk_overlap tokens)
+    for anterior, seguinte in zip(partes, partes[1:]):
+        assert seguinte['text'][:5] in anterior['text']
+    juntos = " ".join(chunk['text'] for chunk in chunks)
+    assert all(f"regra {i}." in juntos for i in range(1, 30))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Testes do índice léxico (BM25)
+"""
+
+import pytest
+
+from chatbot.core.lexical_index import LexicalIndex, tokenize
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    yield index
+    index.close()
+
+def test_tokenize_remove_acentos_e_stopwords():
+    assert tokenize("A Navegação de Cabotagem") == ['navegacao', 'cabotagem']
+
+def test_tokenize_numeros_de_normas():
+    assert tokenize("Resolução nº 2.240/2011") == ['resolucao', '2240/2011', '2240', '2011']
+
+def test_busca_ordena_por_bm25(index):
+    index.add(
+        ['a', 'b', 'c'],
+        ['tarifa portuária', 'tarifa tarifa portuária', 'navegação interior'],
+        [{'codigo_registro': '1'}, {'codigo_registro': '2'}, {'codigo_registro': '3'}]
+    )
+
+    resultados = index.search("tarifa", 10)
+
+    assert [chunk_id for chunk_id, _ in resultados] == ['b', 'a']
+    assert resultados[0][1] > resultados[1][1] > 0
+
+def test_reindexar_e_remover(index):
+    index.add(['a'], ['tarifa portuária'], [{'codigo_registro': '1'}])
+    index.add(['a'], ['navegação interior'], [{'codigo_registro': '1'}])
+
+    assert index.count() == 1
+    assert index.search("tarifa") == []
+    assert [chunk_id for chunk_id, _ in index.search("navegacao")] == ['a']
+
+    index.remove(['a'])
+    assert index.count() == 0
+    assert index.search("navegacao") == []
+
+def test_postings_limitados_por_termo(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"), max_postings_per_term=3)
+    documentos = ["antaq " * (i % 5 + 1) + ("tarifa" if i == 7 else "") for i in range(20)]
+    index.add([f"c{i}" for i in range(20)], documentos, [{'codigo_registro': str(i)} for i in range(20)])
+
+    resultados = index.search("antaq tarifa", 10)
+
+    # Termo raro: posting lido; termo comum: só os 3 de maior tf
+    assert resultados[0][0] == 'c7'
+    assert len(resultados) <= 4
+    index.close()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Testes da extração e resolução de referências a normas
+"""
+
+import pytest
+
+from chatbot.core.norma_reference import NormaReferenceIndex, extrair_artigos, extrair_referencias
+
+@pytest.mark.parametrize('texto, esperado', [
+    ("Resolução nº 2.240/2011", [('Resolução', '2240', 2011)]),
+    ("RESOLUÇÃO Nº 2240-ANTAQ, DE 4 DE OUTUBRO DE 2011", [('Resolução', '2240', 2011)]),
+    ("Portaria 5 de 2019", [('Portaria', '5', 2019)]),
+    ("Resolução Normativa nº 18/17", [('Resolução Normativa', '18', 2017)]),
+    ("nº 2240/2011 da ANTAQ", [(None, '2240', 2011)]),
+    ("Lei 12.815/2013 e Decreto 8.033/2013", [('Lei', '12815', 2013), ('Decreto', '8033', 2013)]),
+])
+def test_extrair_referencias(texto, esperado):
+    assert extrair_referencias(texto) == esperado
+
+@pytest.mark.parametrize('texto', [
+    "publicada em 04/10/2011",
+    "o que mudou em 10/2011?",
+    "prazo de 30 dias",
+])
+def test_datas_e_numeros_soltos_nao_sao_referencias(texto):
+    assert extrair_referencias(texto) == []
+
+def test_extrair_artigos():
+    assert extrair_artigos("o que dizem os arts. 3º e 4º e o artigo 10-A?") == ['3', '4', '10-A']
+
+def test_indice_resolve_referencias(tmp_path):
+    index = NormaReferenceIndex(str(tmp_path / "referencias.json"))
+    index.add([
+        {'codigo_registro': '1', 'titulo': 'RESOLUÇÃO Nº 2240-ANTAQ, DE 4 DE OUTUBRO DE 2011'},
+        {'codigo_registro': '2', 'titulo': 'RESOLUÇÃO NORMATIVA Nº 18-ANTAQ', 'assinatura': '2017-12-21'},
+        {'codigo_registro': '3', 'titulo': 'PORTARIA Nº 18/2019'},
+        {'codigo_registro': '4', 'titulo': 'Norma sem número'},
+        {'codigo_registro': '5', 'titulo': 'RESOLUÇÃO Nº 18-ANTAQ, DE 2 DE MAIO DE 2003'},
+    ])
+    index.save()
+
+    assert index.resolve("Resolução 2.240/2011") == ['1']
+    assert index.resolve("resolução 18/2017") == ['2']
+    assert sorted(index.lookup(None, '18')) == ['2', '3', '5']
+    # Sem ano, só referências que casam com uma única norma
+    assert index.resolve("Resolução 18") == []
+    assert index.resolve("Resolução 2240") == ['1']
+    assert index.resolve("publicada em 04/10/2011") == []
+
+    # Persistido e recarregado
+    assert NormaReferenceIndex(str(tmp_path / "referencias.json")).resolve("Portaria 18") == ['3']
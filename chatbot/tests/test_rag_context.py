@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Testes da montagem do contexto do prompt dentro do orçamento de tokens
+"""
+
+from chatbot.core.rag_system import RAGSystemANTAQ
+
+def _rag(max_context_length: int) -> RAGSystemANTAQ:
+    return RAGSystemANTAQ("sem-chave", vector_store=None, enable_cache=False, max_context_length=max_context_length)
+
+def _resultado(codigo: str, indice: int, texto: str, relevancia: float) -> dict:
+    return {
+        'id': f"{codigo}_chunk_{indice}",
+        'document': texto,
+        'similarity': relevancia,
+        'relevance_score': relevancia,
+        'metadata': {'codigo_registro': codigo, 'titulo': f"RESOLUÇÃO Nº {codigo}", 'chunk_index': indice},
+    }
+
+def test_contexto_respeita_o_orcamento(offline_tokenizer):
+    rag = _rag(400)
+    resultados = [
+        _resultado(str(i), 0, f"Art. {i}º O operador portuário observará a regra {i}. " * 12, 1 - i / 10)
+        for i in range(6)
+    ]
+
+    contexto, stats = rag._format_context(resultados)
+
+    assert stats['context_tokens'] <= 400
+    assert len(rag.tokenizer.encode(contexto)) == stats['context_tokens']
+    assert stats['context_chunks'] + stats['context_chunks_dropped'] == len(resultados)
+    assert stats['context_chunks_dropped'] > 0
+    # Entram os mais relevantes
+    assert contexto.startswith("DOCUMENTO 1: RESOLUÇÃO Nº 0")
+
+def test_chunks_consecutivos_sao_unidos_sem_repetir_a_sobreposicao(offline_tokenizer):
+    rag = _rag(8000)
+    resultados = [
+        _resultado('1', 1, "prazo de trinta dias. Art. 2º Fica vedada a cobrança.", 0.8),
+        _resultado('1', 0, "Art. 1º O operador terá o prazo de trinta dias.", 0.9),
+        _resultado('1', 5, "Art. 9º Esta resolução entra em vigor.", 0.7),
+    ]
+
+    contexto, stats = rag._format_context(resultados)
+
+    assert stats['context_chunks'] == 3
+    assert contexto.count("DOCUMENTO") == 1
+    assert "Art. 1º O operador terá o prazo de trinta dias. Art. 2º Fica vedada a cobrança." in contexto
+    assert contexto.count("prazo de trinta dias") == 1
+    assert rag.OMISSION_MARKER + "Art. 9º" in contexto
+
+def test_chunk_que_nao_cabe_e_truncado(offline_tokenizer):
+    rag = _rag(300)
+    resultados = [_resultado('1', 0, "O operador portuário observará as regras. " * 40, 1.0)]
+
+    contexto, stats = rag._format_context(resultados)
+
+    assert stats['context_chunks_truncated'] == 1
+    assert stats['context_tokens'] <= 300
+    assert contexto.endswith(rag.OMISSION_MARKER.rstrip())
+
+def test_contexto_vazio(offline_tokenizer):
+    contexto, stats = _rag(100)._format_context([])
+
+    assert contexto == "Nenhum documento relevante encontrado."
+    assert stats['context_chunks'] == 0
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testes do ledger de status de vetorização
+"""
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from chatbot.core.status_ledger import VetorizacaoLedger
+
+@pytest.fixture
+def parquet(tmp_path):
+    caminho = tmp_path / "normas.parquet"
+    pd.DataFrame({
+        'codigo_registro': ['1', '2', '3'],
+        'vetorizado': [False, False, True],
+        'ultima_verificacao_vetorizacao': pd.to_datetime([None, None, '2020-01-01'])
+    }).to_parquet(caminho, index=False)
+    return str(caminho)
+
+def test_status_vigente_e_o_mais_recente(parquet):
+    ledger = VetorizacaoLedger.for_parquet(parquet)
+    ledger.registrar(['1', '2'], vetorizado=True, timestamp=datetime(2024, 1, 1))
+    ledger.registrar(['2'], vetorizado=False, timestamp=datetime(2024, 1, 2))
+
+    status = ledger.get_status()
+
+    assert status['1'] == {'vetorizado': True, 'timestamp': datetime(2024, 1, 1)}
+    assert status['2'] == {'vetorizado': False, 'timestamp': datetime(2024, 1, 2)}
+    ledger.close()
+
+@pytest.mark.parametrize('unidade', ['s', 'ms', 'us', 'ns'])
+def test_aplicar_status_preserva_a_unidade_da_coluna(parquet, unidade):
+    ledger = VetorizacaoLedger.for_parquet(parquet)
+    ledger.registrar(['1'], vetorizado=True)
+
+    df = pd.read_parquet(parquet)
+    df['ultima_verificacao_vetorizacao'] = df['ultima_verificacao_vetorizacao'].astype(f'datetime64[{unidade}]')
+    resultado = ledger.aplicar_status(df)
+
+    assert resultado['vetorizado'].tolist() == [True, False, True]
+    assert resultado['ultima_verificacao_vetorizacao'].dtype == df['ultima_verificacao_vetorizacao'].dtype
+    assert resultado['ultima_verificacao_vetorizacao'].notna().tolist() == [True, False, True]
+    ledger.close()
+
+def test_compactar_grava_o_parquet_e_descarta_entradas_antigas(parquet):
+    ledger = VetorizacaoLedger.for_parquet(parquet)
+    ledger.registrar(['1'], vetorizado=False)
+    ledger.registrar(['1', '2'], vetorizado=True)
+
+    assert ledger.compactar(parquet) == 2
+
+    df = pd.read_parquet(parquet)
+    assert df['vetorizado'].tolist() == [True, True, True]
+    assert ledger._conn.execute("SELECT COUNT(*) FROM status").fetchone()[0] == 2
+    ledger.close()
+
+def test_conteudo_e_impressao_digital(parquet):
+    ledger = VetorizacaoLedger.for_parquet(parquet)
+    ledger.registrar_conteudo({'1': ('hash-1', 3, 'fp-1'), '2': ('hash-2', None, None)})
+    ledger.atualizar_fingerprints({'2': 'fp-2'})
+
+    assert ledger.get_hashes() == {'1': 'hash-1', '2': 'hash-2'}
+    assert ledger.get_fingerprints() == {'1': 'fp-1', '2': 'fp-2'}
+    ledger.close()
+
+def test_ledger_reaberto_mantem_o_registro(parquet):
+    ledger = VetorizacaoLedger.for_parquet(parquet)
+    ledger.registrar(['3'], vetorizado=False)
+    ledger.close()
+
+    assert VetorizacaoLedger.for_parquet(parquet).get_status()['3']['vetorizado'] is False
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Testes do índice vetorial NumPy (busca exata e filtros where)
+"""
+
+import chromadb
+import numpy as np
+import pytest
+
+from chatbot.core.vector_index import NumpyVectorIndex
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.create_collection("normas", metadata={'hnsw:space': 'cosine'})
+    rng = np.random.default_rng(0)
+    collection.add(
+        ids=[f"c{i}" for i in range(40)],
+        embeddings=rng.normal(size=(40, 16)).tolist(),
+        metadatas=[
+            {
+                'codigo_registro': str(i % 8),
+                'ano_assinatura': 2005 + i % 12,
+                'tipo_material': 'Resolução' if i % 3 else 'Portaria',
+                **({'artigo': i % 5} if i % 2 else {}),
+            }
+            for i in range(40)
+        ]
+    )
+    return collection
+
+@pytest.mark.parametrize('dtype', ['float32', 'float16', 'int8'])
+def test_busca_exata_igual_a_do_chromadb(tmp_path, collection, dtype):
+    index = NumpyVectorIndex(str(tmp_path / f"index_{dtype}"), dtype=dtype)
+    assert index.build(collection, 'hashing', page_size=7) == 40
+    assert index.load('hashing')
+
+    consulta = np.random.default_rng(1).normal(size=16).tolist()
+    esperado = collection.query(query_embeddings=[consulta], n_results=5)['ids'][0]
+
+    assert [chunk_id for chunk_id, _ in index.search(consulta, 5)] == esperado
+    assert not NumpyVectorIndex(str(tmp_path / f"index_{dtype}"), dtype=dtype).load('openai')
+
+@pytest.mark.parametrize('where', [
+    {'codigo_registro': '3'},
+    {'codigo_registro': {'$ne': '3'}},
+    {'codigo_registro': {'$in': ['1', '2', 'inexistente']}},
+    {'ano_assinatura': {'$gte': 2010}},
+    {'$and': [{'ano_assinatura': {'$gt': 2008}}, {'ano_assinatura': {'$lte': 2012}}]},
+    {'$or': [{'tipo_material': 'Portaria'}, {'artigo': {'$lt': 2}}]},
+    {'artigo': {'$nin': [1, 3]}},
+    {'campo_inexistente': 'x'},
+])
+def test_filtro_where_igual_ao_do_chromadb(tmp_path, collection, where):
+    index = NumpyVectorIndex(str(tmp_path / "index"))
+    index.build(collection, 'hashing')
+    index.load()
+
+    esperado = set(collection.get(where=where)['ids'])
+    filtrados = {index.ids[i] for i in np.flatnonzero(index._mask(where))}
+
+    assert filtrados == esperado
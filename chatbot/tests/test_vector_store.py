@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Testes de ponta a ponta do banco vetorial, sem rede
+Ingestão -> alteração incremental -> reconstrução -> busca, com embeddings por hashing
+"""
+
+import shutil
+
+import pandas as pd
+import pytest
+
+from chatbot.core.embeddings import HashingEmbeddingBackend
+from chatbot.core.status_ledger import VetorizacaoLedger
+from chatbot.core.vector_store import VectorStoreANTAQ
+
+TEMAS = {
+    '1001': ('Cabotagem', "A empresa de navegação de cabotagem deverá manter frota própria registrada."),
+    '1002': ('Tarifas portuárias', "A autoridade portuária publicará a tabela de tarifas portuárias anualmente."),
+    '1003': ('Dragagem', "Os serviços de dragagem do canal de acesso dependem de licença ambiental."),
+    '1004': ('Praticagem', "O serviço de praticagem é obrigatório nas zonas definidas pela autoridade marítima."),
+    '1005': ('Arrendamento', "O contrato de arrendamento de área portuária terá prazo de vinte e cinco anos."),
+    '1006': ('Navegação interior', "A navegação interior de travessia exige autorização da agência reguladora."),
+}
+
+def _norma(codigo: str, assunto: str, frase: str, ano: int, situacao: str = 'Em vigor') -> dict:
+    corpo = " ".join(
+        f"Art. {artigo}º {frase} Parágrafo único. O descumprimento do art. {artigo}º sujeita o infrator a multa."
+        for artigo in range(1, 6)
+    )
+    return {
+        'codigo_registro': codigo,
+        'titulo': f"RESOLUÇÃO Nº {codigo}-ANTAQ, DE 1 DE MARÇO DE {ano}",
+        'autor': 'ANTAQ',
+        'assunto': assunto,
+        'situacao': situacao,
+        'link_pdf': f"http://exemplo/{codigo}.pdf",
+        'tipo_material': 'Norma',
+        'assinatura': pd.Timestamp(f"{ano}-03-01"),
+        'publicacao': pd.Timestamp(f"{ano}-03-10"),
+        'tamanho_pdf': 1000,
+        'paginas_extraidas': 2,
+        'conteudo_pdf': corpo,
+    }
+
+def _salvar(caminho, normas):
+    pd.DataFrame(normas).to_parquet(caminho, index=False)
+
+class ContadorBackend(HashingEmbeddingBackend):
+    """Backend por hashing que registra os textos embedados"""
+
+    def __init__(self, falhar_com: str = None):
+        super().__init__(dimensions=128)
+        self.textos = []
+        self.falhar_com = falhar_com
+
+    def embed(self, texts):
+        if self.falhar_com and any(self.falhar_com in text for text in texts):
+            raise RuntimeError("falha simulada na API de embeddings")
+        self.textos.extend(texts)
+        return super().embed(texts)
+
+@pytest.fixture
+def normas():
+    normas = [
+        _norma(codigo, assunto, frase, 2010 + i)
+        for i, (codigo, (assunto, frase)) in enumerate(TEMAS.items())
+    ]
+    normas.append(_norma('1007', 'Revogada', "Norma revogada sobre cabotagem.", 2009, situacao='Revogada'))
+    return normas
+
+@pytest.fixture
+def parquet(tmp_path, normas):
+    caminho = tmp_path / "normas.parquet"
+    _salvar(caminho, normas)
+    return str(caminho)
+
+def _store(tmp_path, backend=None, **kwargs) -> VectorStoreANTAQ:
+    return VectorStoreANTAQ(
+        "sem-chave",
+        persist_directory=str(tmp_path / "chroma"),
+        chunk_size=200,
+        chunk_overlap=20,
+        enable_embedding_cache=False,
+        embedding_backend=backend or ContadorBackend(),
+        embedding_workers=2,
+        collection_gc_grace_seconds=0,
+        first_stage_normas=3,
+        **kwargs
+    )
+
+def _codigos(resultados):
+    return [resultado['metadata']['codigo_registro'] for resultado in resultados]
+
+def test_ingestao_incremental_reconstrucao_e_busca(tmp_path, parquet, normas):
+    backend = ContadorBackend()
+    store = _store(tmp_path, backend)
+
+    # Ingestão: só normas em vigor
+    assert store.load_and_process_data(parquet) is True
+    status = VetorizacaoLedger.for_parquet(parquet).get_status()
+    assert sorted(status) == sorted(TEMAS)
+    assert all(item['vetorizado'] for item in status.values())
+    assert store.document_store.count() == len(TEMAS)
+
+    for modo in ('dense', 'lexical', 'hybrid'):
+        assert _codigos(store.search("praticagem obrigatória", 3, mode=modo))[0] == '1004'
+
+    # Execução incremental sem alterações: nenhum embedding novo
+    embedados = len(backend.textos)
+    versao_cache = store.get_collection_version()
+    assert store.load_and_process_data(parquet) is True
+    assert len(backend.textos) == embedados
+    assert store.get_collection_version() == versao_cache
+
+    # Alterar o texto de uma norma: só ela é revetorizada
+    leitor = _store(tmp_path)
+    chunks = store.get_collection_stats()['total_chunks']
+    normas[2]['conteudo_pdf'] = normas[2]['conteudo_pdf'].replace('dragagem', 'derrocagem')
+    _salvar(parquet, normas)
+    assert store.load_and_process_data(parquet) is True
+    # Mesmo número de chunks, mas a versão usada pelo cache de respostas muda (também em outra instância)
+    assert store.get_collection_stats()['total_chunks'] == chunks
+    assert store.get_collection_version() != versao_cache
+    assert leitor.get_collection_version() == store.get_collection_version()
+    novos = backend.textos[embedados:]
+    assert novos and all('derrocagem' in texto or 'Dragagem' in texto for texto in novos)
+    assert _codigos(store.search("derrocagem", 3, mode='lexical'))[:1] == ['1003']
+    assert all('dragagem do canal' not in resultado['document']
+               for resultado in store.search("dragagem canal", 10, mode='lexical'))
+
+    # Reconstrução: nova versão ativada por trás do alias, com o mesmo conteúdo
+    versao = store.active_collection_name
+    total = store._get_collection().count()
+    assert store.load_and_process_data(parquet, force_rebuild=True) is True
+    assert store.active_collection_name != versao
+    assert store._get_collection().count() == total
+    assert _codigos(store.search("tarifas portuárias", 3))[0] == '1002'
+
+    # Outra instância lê a versão ativa
+    assert _codigos(_store(tmp_path).search("arrendamento de área portuária", 3))[0] == '1005'
+
+def test_falha_de_lote_e_registrada_e_reprocessada(tmp_path, parquet):
+    store = _store(tmp_path, ContadorBackend(falhar_com='praticagem'), embedding_batch_size=4)
+
+    assert store.load_and_process_data(parquet) is False
+    status = VetorizacaoLedger.for_parquet(parquet).get_status()
+    assert status['1004']['vetorizado'] is False
+    assert store.document_store.count() < len(TEMAS)
+
+    store.embedding_backend.falhar_com = None
+    assert store.load_and_process_data(parquet) is True
+    assert all(item['vetorizado'] for item in VetorizacaoLedger.for_parquet(parquet).get_status().values())
+    assert store.document_store.count() == len(TEMAS)
+
+def test_reconstrucao_com_falha_mantem_a_versao_ativa(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+    versao = store.active_collection_name
+
+    store.embedding_backend.falhar_com = 'cabotagem'
+    assert store.load_and_process_data(parquet, force_rebuild=True) is False
+    assert store.active_collection_name == versao
+
+    store.embedding_backend.falhar_com = None
+    assert _codigos(store.search("cabotagem frota própria", 3))[0] == '1001'
+
+def test_buscas_durante_a_reconstrucao_usam_a_versao_ativa(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+    versao = store.active_collection_name
+    total = store.get_collection_stats()['total_chunks']
+
+    # Uma busca feita enquanto a nova versão é gravada (no primeiro lote de embeddings;
+    # a própria busca também gera um embedding)
+    durante = []
+    embed = store.embedding_backend.embed
+    def embed_com_busca(texts):
+        if store._deferred_ledger is not None and not durante:
+            durante.append(None)
+            durante[0] = (
+                store.active_collection_name,
+                store.get_collection_stats()['total_chunks'],
+                _codigos(store.search("praticagem obrigatória", 3, mode='hybrid'))[:1],
+            )
+        return embed(texts)
+    store.embedding_backend.embed = embed_com_busca
+
+    assert store.load_and_process_data(parquet, force_rebuild=True) is True
+    assert durante == [(versao, total, ['1004'])]
+    assert store.active_collection_name != versao
+    assert store.get_collection_stats()['total_chunks'] == total
+
+@pytest.mark.parametrize('modo', ['dense', 'hybrid', 'lexical'])
+def test_search_many_igual_a_search(tmp_path, parquet, modo):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+
+    consultas = ["cabotagem", "tarifas portuárias", "licença ambiental dragagem", "praticagem"]
+    em_lote = store.search_many(consultas, 4, mode=modo)
+    individuais = [store.search(consulta, 4, mode=modo) for consulta in consultas]
+
+    # Chunks de mesmo escore podem empatar em qualquer ordem: compara escores e o primeiro resultado (entre os empatados)
+    chave = 'bm25_score' if modo == 'lexical' else 'similarity' if modo == 'dense' else 'rrf_score'
+    for lote, individual in zip(em_lote, individuais):
+        empatados = {r['id'] for r in individual if r[chave] == pytest.approx(individual[0][chave])}
+        if len(empatados) < len(individual):
+            assert lote[0]['id'] in empatados
+        assert [r[chave] for r in lote] == pytest.approx([r[chave] for r in individual])
+
+def test_filtros_de_metadados_e_datas(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+
+    filtro = store.date_range_filter(2012, 2013)
+    resultados = store.search("autoridade portuária", 10, filters=filtro, mode='dense')
+
+    assert resultados
+    assert {resultado['metadata']['ano_assinatura'] for resultado in resultados} <= {2012, 2013}
+
+    resultados = store.search("multa", 10, filters={'codigo_registro': '1006'}, mode='hybrid')
+    assert set(_codigos(resultados)) == {'1006'}
+
+def test_fusao_rrf(tmp_path):
+    store = _store(tmp_path)
+    densa = [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]
+    lexica = [{'id': 'c', 'bm25_score': 2.0}, {'id': 'a', 'bm25_score': 1.0}]
+
+    fundidos = store._fuse_rrf([densa, lexica], 3)
+
+    assert [item['id'] for item in fundidos] == ['a', 'c', 'b']
+    assert fundidos[0]['rrf_score'] == pytest.approx(1 / (store.rrf_k + 1) + 1 / (store.rrf_k + 2))
+    assert fundidos[1]['bm25_score'] == 2.0
+
+def test_busca_nas_normas_referenciadas(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+
+    resultados = store.search_normas("licença ambiental", ['1002', '1003'], 4, mode='dense')
+    assert resultados and set(_codigos(resultados)) <= {'1002', '1003'}
+    assert _codigos(resultados)[0] == '1003'
+    # Escores reais da busca, não um valor fixo
+    similaridades = [resultado['similarity'] for resultado in resultados]
+    assert similaridades == sorted(similaridades, reverse=True) and max(similaridades) < 1.0
+
+    # Artigo citado: seus chunks vêm primeiro, também com a similaridade real
+    resultados = store.search_normas("frota própria", ['1001'], 6, artigos=['3'], mode='dense')
+    assert set(_codigos(resultados)) == {'1001'}
+    assert resultados[0]['metadata'].get('artigo') == 3
+    assert resultados[0]['similarity'] < 1.0
+
+def test_primeiro_estagio_nao_e_reconstruido_na_busca(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+    norma_collection = store._get_norma_collection()
+    original = norma_collection.get(include=['embeddings'])
+    vetores = dict(zip(original['ids'], original['embeddings']))
+
+    # Coleção de primeiro estágio perdida: a busca segue em um estágio, sem reconstruí-la
+    store.client.delete_collection(norma_collection.name)
+    leitor = _store(tmp_path)
+    assert _codigos(leitor.search("praticagem obrigatória", 3, mode='dense'))[0] == '1004'
+    assert leitor._get_norma_collection() is None
+
+    # Manutenção: os vetores voltam a ser os do texto próprio de cada norma
+    assert store.ensure_indexes() == {'first_stage': len(TEMAS)}
+    reconstruida = store._get_norma_collection(create=True).get(include=['embeddings'])
+    for codigo, vetor in zip(reconstruida['ids'], reconstruida['embeddings']):
+        assert vetor == pytest.approx(vetores[codigo], abs=1e-5)
+    assert store.ensure_indexes() == {}
+    assert leitor._get_first_stage(leitor._get_collection()) is not None
+
+def test_indice_lexico_nao_e_reconstruido_na_busca(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+    total = store._get_collection().count()
+    store.lexical_index.clear()
+
+    # Índice léxico vazio: a busca híbrida/léxica segue só com a busca densa
+    leitor = _store(tmp_path)
+    resultados = leitor.search("praticagem obrigatória", 3, mode='lexical')
+    assert _codigos(resultados)[0] == '1004'
+    assert all('bm25_score' not in resultado for resultado in resultados)
+    assert leitor.lexical_index.count() == 0
+
+    assert store.ensure_indexes() == {'lexical': total}
+    assert 'bm25_score' in leitor.search("praticagem obrigatória", 3, mode='lexical')[0]
+
+def test_indice_numpy_nao_e_reconstruido_na_busca(tmp_path, parquet):
+    store = _store(tmp_path, search_backend='exact')
+    assert store.load_and_process_data(parquet) is True
+    total = store._get_collection().count()
+    shutil.rmtree(store.vector_index.directory)
+
+    # Sem a cópia dos vetores, a busca exata segue pelo HNSW do ChromaDB
+    leitor = _store(tmp_path, search_backend='exact')
+    assert _codigos(leitor.search("praticagem obrigatória", 3, mode='dense'))[0] == '1004'
+    assert not leitor.vector_index.loaded and not leitor.vector_index.exists()
+
+    assert store.ensure_indexes() == {'vector': total}
+    assert _codigos(leitor.search("praticagem obrigatória", 3, mode='dense'))[0] == '1004'
+    assert leitor.vector_index.loaded and leitor.vector_index.count == total
+
+def test_filtros_sobre_campos_da_norma(tmp_path, parquet):
+    store = _store(tmp_path)
+    assert store.load_and_process_data(parquet) is True
+
+    # Campos que só existem na norma viram codigo_registro $in
+    for modo in ('dense', 'lexical', 'hybrid'):
+        resultados = store.search("autoridade portuária", 10, filters={'assunto': 'Praticagem'}, mode=modo)
+        assert resultados and set(_codigos(resultados)) == {'1004'}
+
+    filtros = {'assunto': {'$in': ['Dragagem', 'Cabotagem']}, 'codigo_registro': {'$ne': '1001'}}
+    assert set(_codigos(store.search("multa", 10, filters=filtros))) == {'1003'}
+    assert store.search("multa", 10, filters={'autor': 'Outro órgão'}) == []
+    assert store.search_many(["multa", "frota"], 5, filters={'autor': 'Outro órgão'}) == [[], []]
+    assert len(store.document_store.find_codigos({'autor': 'ANTAQ'})) == len(TEMAS)
+
+    # Índice de referências reconstruído a partir dos metadados por norma
+    store.reference_index.clear()
+    assert store.rebuild_reference_index() == len(TEMAS)
+    assert store.find_normas_by_reference("Resolução 1005/2014") == ['1005']